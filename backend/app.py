@@ -17,12 +17,14 @@ extra_configuration = {
     "vpc_id": environment_configuration.get("VPC_ID"),
     "account_id": environment_configuration.get('ACCOUNT_ID'),
     "KB_DOCS_S3_BUCKET_NAME": environment_configuration.get('KB_DOCS_S3_BUCKET_NAME'),
+    "SOW_UPLOAD_PREFIX": environment_configuration.get('SOW_UPLOAD_PREFIX', "source_sow/"),
     "cdk_region": environment_configuration.get('REGION'),
     "tags": environment_configuration.get('STACK-TAGS'),
     "AGENT_FOUNDATION_MODEL": environment_configuration.get("AGENT_FOUNDATION_MODEL"),
     "WORKSPACE_NAME": environment_configuration.get('WORKSPACE_NAME'),
     "KB_CONFIGURATION": environment_configuration.get('KB_CONFIGURATION'),
     "BEDROCK_REGION_NAME": environment_configuration.get('BEDROCK_REGION_NAME'),
+    "BEDROCK_RATE_LIMITS": environment_configuration.get('BEDROCK_RATE_LIMITS', {}),
     "PROJECT_AGENT_NAME": environment_configuration.get('PROJECT_AGENT_NAME'),
     "AI_FACTORY_REGION_NAME": environment_configuration.get('REGION'),
     "EMBEDDING_MODEL_ID": ["amazon.titan-embed-text-v2:0"],
@@ -0,0 +1,44 @@
+"""
+Measures the cost of building a boto3 client on every call, as the Lambdas did, against a lookup in the
+shared client registry (`lambdas.aws_clients`). No request is sent to AWS.
+
+Usage (from the backend folder):
+    python benchmarks/bench_aws_clients.py --iterations 50 --services s3 bedrock-runtime bedrock-agent
+"""
+import argparse
+import os
+import sys
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_ROOT, "code", "services"))
+
+
+def measure(function, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--services", nargs="+", default=["s3", "bedrock-runtime", "bedrock-agent"])
+    arguments = parser.parse_args()
+    region = os.environ.setdefault("AWS_REGION", "us-east-1")
+
+    import boto3
+    from lambdas import aws_clients
+
+    print(f"{'service':<20} {'boto3.client (ms)':>18} {'Session().client (ms)':>22} {'registry (ms)':>14}")
+    for service in arguments.services:
+        default_session_client = measure(lambda: boto3.client(service, region_name=region), arguments.iterations)
+        new_session_client = measure(lambda: boto3.Session().client(service, region_name=region), arguments.iterations)
+        aws_clients.get_client(service)  # the first call pays the creation once per container
+        registry_lookup = measure(lambda: aws_clients.get_client(service), arguments.iterations)
+        print(f"{service:<20} {default_session_client:>18.3f} {new_session_client:>22.3f} {registry_lookup:>14.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold start budget of the agent tools Lambda: imports the handler module in a fresh interpreter with
+`-X importtime`, prints the slowest imports (cumulative time per module) and fails when
+
+- the total init time is above the budget, or
+- a dependency that must stay deferred (PyMuPDF, python-docx, Pillow) is imported at init.
+
+Usage (from the backend folder):
+    python benchmarks/bench_cold_start.py --budget-ms 800 --runs 5 --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS_ROOT = os.path.join(BACKEND_ROOT, "code", "services", "lambdas", "multi_agent_handlers")
+HANDLER_MODULE = "agent_tools.sow_reader"
+DEFERRED_MODULES = ["fitz", "pymupdf", "docx", "PIL"]
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_once(module):
+    """Imports `module` in a fresh interpreter, returns {module: (self_us, cumulative_us, depth)}."""
+    environment = {**os.environ, "PYTHONPATH": TOOLS_ROOT}
+    environment.setdefault("AWS_REGION", "us-east-1")
+    environment.setdefault("AWS_DEFAULT_REGION", environment["AWS_REGION"])
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=environment, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=HANDLER_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("COLD_START_BUDGET_MS", "800")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    arguments = parser.parse_args()
+
+    runs = [import_once(arguments.module) for _ in range(arguments.runs)]
+    totals_ms = [run[arguments.module][1] / 1000 for run in runs]
+    # The median run is the one reported, the first run also pays the .pyc compilation
+    median_run = runs[totals_ms.index(sorted(totals_ms)[len(totals_ms) // 2])]
+
+    print(f"{'module':<50} {'self (ms)':>10} {'cumulative (ms)':>16}")
+    slowest = sorted(median_run.items(), key=lambda item: item[1][1], reverse=True)[:arguments.top]
+    for name, (self_us, cumulative_us, depth) in slowest:
+        print(f"{name:<50} {self_us / 1000:>10.1f} {cumulative_us / 1000:>16.1f}")
+
+    median_ms = statistics.median(totals_ms)
+    print(f"\nInit time of {arguments.module}: median {median_ms:.1f} ms, min {min(totals_ms):.1f} ms, "
+          f"max {max(totals_ms):.1f} ms over {arguments.runs} runs (budget {arguments.budget_ms:.0f} ms)")
+
+    failures = []
+    eager_modules = [module for module in DEFERRED_MODULES if module in median_run]
+    if eager_modules:
+        failures.append(f"deferred dependencies imported at init: {eager_modules}")
+    if median_ms > arguments.budget_ms:
+        failures.append(f"init time {median_ms:.1f} ms is above the {arguments.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
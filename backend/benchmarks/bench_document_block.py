@@ -0,0 +1,175 @@
+"""
+Compares the local extraction path of the agent tools (PyMuPDF text + one vision call per image) with the
+document block mode (the PDF pages sent to the model as Converse `document` blocks) on a synthetic SoW.
+
+Bedrock is replaced by a stub that sleeps a simulated model latency and reports a token usage derived from
+the request, so the comparison measures the Lambda side: CPU time of the process, total latency, number of
+model calls and tokens, for `get_document_from_s3` followed by `analyse_images_documents`.
+
+Usage (from the backend folder):
+    python benchmarks/bench_document_block.py --pages 10 30 --base-latency-ms 300 --ms-per-output-token 10
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_ROOT, "code", "services", "lambdas", "multi_agent_handlers"))
+
+LOREM = ("The supplier will deliver the migration of the workloads to AWS, including the landing zone, "
+         "the CI/CD pipelines and the observability stack, according to the milestones below. ")
+SECTIONS = ["EXECUTIVE SUMMARY", "SCOPE OF WORK", "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM",
+            "SUMMARY OF MILESTONES & DELIVERABLES", "INVESTMENT"]
+# Claude bills a PDF page read from a document block as its text plus an image of the page
+PAGE_IMAGE_TOKENS = 1600
+
+
+def _diagram(seed):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (800, 500), "white")
+    draw = ImageDraw.Draw(image)
+    for box in range(6):
+        left = 40 + box * 120
+        draw.rectangle([left, 60 + (seed * 37 + box * 53) % 300, left + 90, 140 + (seed * 37 + box * 53) % 300],
+                       outline="navy", width=3)
+    for offset in range(0, 800, 9):
+        draw.line([offset, 480, (offset * (seed + 3)) % 800, 499], fill=(offset % 255, (40 * seed) % 255, 90))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_synthetic_sow(pages, lines_per_page=40, diagram_every=3):
+    """SoW like PDF: a section header every few pages, text lines and a distinct diagram every `diagram_every` pages."""
+    import fitz
+
+    document = fitz.open()
+    for page_number in range(1, pages + 1):
+        page = document.new_page()
+        lines = []
+        section = (page_number - 1) * len(SECTIONS) // pages
+        if page_number == 1 or section != (page_number - 2) * len(SECTIONS) // pages:
+            lines.append(SECTIONS[section])
+        lines += [f"{page_number}.{line} {LOREM}"[:110] for line in range(lines_per_page - len(lines))]
+        page.insert_text((36, 48), "\n".join(lines), fontsize=8)
+        if page_number >= 3 and page_number % diagram_every == 0:
+            page.insert_image(fitz.Rect(72, 420, 520, 700), stream=_diagram(page_number))
+    pdf_bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+class InMemoryS3Client:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def head_object(self, Bucket, Key):
+        return {"ETag": '"%s"' % abs(hash(self.objects[Key]))}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        return {"Body": io.BytesIO(self.objects[Key]), "ContentLength": len(self.objects[Key])}
+
+
+class StubBedrockClient:
+    """Stand-in of bedrock-runtime: simulated latency and token usage, thread safe counters."""
+
+    def __init__(self, base_latency_ms, ms_per_output_token, image_output_tokens=150):
+        self.base_latency_ms = base_latency_ms
+        self.ms_per_output_token = ms_per_output_token
+        self.image_output_tokens = image_output_tokens
+        self.totals = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+        self._lock = threading.Lock()
+
+    def _record(self, input_tokens, output_tokens):
+        with self._lock:
+            self.totals["calls"] += 1
+            self.totals["input_tokens"] += input_tokens
+            self.totals["output_tokens"] += output_tokens
+        time.sleep((self.base_latency_ms + output_tokens * self.ms_per_output_token) / 1000)
+
+    def invoke_model(self, body, modelId, **kwargs):
+        from agent_tools.rate_limiter import estimate_request_tokens
+
+        request_body = json.loads(body)
+        input_tokens = estimate_request_tokens(request_body) - request_body.get("max_tokens", 0)
+        self._record(input_tokens, self.image_output_tokens)
+        answer = {"content": [{"type": "text", "text": "An AWS architecture diagram. " * 20}],
+                  "usage": {"input_tokens": input_tokens, "output_tokens": self.image_output_tokens}}
+        return {"body": io.BytesIO(json.dumps(answer).encode("utf-8"))}
+
+    def converse(self, modelId, messages, inferenceConfig):
+        import fitz
+
+        content = messages[0]["content"]
+        document = fitz.open(stream=content[0]["document"]["source"]["bytes"], filetype="pdf")
+        text = "\n".join(page.get_text() for page in document)
+        figures = sum(len(page.get_images()) for page in document)
+        input_tokens = document.page_count * PAGE_IMAGE_TOKENS + (len(text) + len(content[1]["text"])) // 4
+        document.close()
+        output_tokens = min(inferenceConfig["maxTokens"], len(text) // 4 + figures * self.image_output_tokens)
+        self._record(input_tokens, output_tokens)
+        return {"output": {"message": {"role": "assistant", "content": [{"text": text[:output_tokens * 4]}]}},
+                "usage": {"inputTokens": input_tokens, "outputTokens": output_tokens},
+                "metrics": {"latencyMs": self.base_latency_ms}, "stopReason": "end_turn"}
+
+
+def run_path(mode, pdf_bytes, bedrock, workdir):
+    """Both tool functions on a cold container (empty caches), returns the Lambda side measures."""
+    from agent_tools import document_block, tools_utils
+    from agent_tools.extraction_cache import ExtractionCache
+    from agent_tools.image_dedup import DescriptionMemo
+
+    s3 = InMemoryS3Client({"sow.pdf": pdf_bytes})
+    tools_utils.s3_client = s3
+    tools_utils.extraction_cache = ExtractionCache(s3, tmp_dir=os.path.join(workdir, mode), use_s3_sidecar=False)
+    tools_utils.image_descriptions_cache = ExtractionCache(s3, tmp_dir=os.path.join(workdir, mode),
+                                                           use_s3_sidecar=False)
+    tools_utils.description_memo = DescriptionMemo(os.path.join(workdir, f"{mode}.sqlite3"))
+    tools_utils.get_bedrock_client = lambda: bedrock
+    document_block.DOCUMENT_BLOCK_FUNCTIONS = (
+        {"get_document_from_s3", "analyse_images_documents"} if mode == "document_block" else set())
+
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    text = tools_utils.read_s3_url("s3://bucket/sow.pdf")
+    images = tools_utils.describe_document_images("s3://bucket/sow.pdf")
+    return {
+        "cpu_ms": (time.process_time() - cpu_started) * 1000,
+        "wall_ms": (time.perf_counter() - wall_started) * 1000,
+        "response_chars": len(text) + len(json.dumps(images)),
+        **bedrock.totals,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 30])
+    parser.add_argument("--base-latency-ms", type=float, default=300)
+    parser.add_argument("--ms-per-output-token", type=float, default=10)
+    args = parser.parse_args()
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["AWS_REGION"])
+    os.environ.setdefault("LLM_MODEL_AGENT", "anthropic.claude-3-sonnet-20240229-v1:0")
+    os.environ.setdefault("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image, return its type and details.")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    print(f"{'pages':>6} {'mode':>15} {'CPU (ms)':>9} {'wall (ms)':>10} {'calls':>6} {'input tok':>10} "
+          f"{'output tok':>11} {'response chars':>15}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            pdf_bytes = build_synthetic_sow(pages)
+            for mode in ("local", "document_block"):
+                bedrock = StubBedrockClient(args.base_latency_ms, args.ms_per_output_token)
+                result = run_path(mode, pdf_bytes, bedrock, os.path.join(workdir, str(pages)))
+                print(f"{pages:>6} {mode:>15} {result['cpu_ms']:>9.1f} {result['wall_ms']:>10.1f} "
+                      f"{result['calls']:>6} {result['input_tokens']:>10} {result['output_tokens']:>11} "
+                      f"{result['response_chars']:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline recall/latency tuning of the HNSW parameters of the knowledge base index (`OSS_INDEX_SETTINGS`).
+
+Builds the exact nearest neighbours of a set of queries with numpy, then sweeps M, ef_construction and
+ef_search with a local ANN library: faiss (`pip install faiss-cpu`, same library as the `faiss` engine of
+OpenSearch) or hnswlib (`pip install hnswlib`, the HNSW implementation of the `nmslib` engine).
+For every configuration it reports recall@k, p50/p99 single query latency, build time and index memory, then
+prints the recommended settings in the format of `KB_CONFIGURATION.OSS_INDEX_SETTINGS` (cdk.json).
+
+The corpus is either synthetic (clustered, normalised vectors like the Titan embeddings) or dumped embeddings:
+a .npy matrix or a .jsonl file with one `{"vector": [...]}` (or `embedding`) per line.
+
+Usage (from the backend folder):
+    python benchmarks/bench_hnsw_tuning.py --vectors 20000 --queries 200 --m 8 16 32 --ef-search 100 256 512
+    python benchmarks/bench_hnsw_tuning.py --embeddings dump.npy --space-type innerproduct --target-recall 0.98
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_ROOT, "code", "services"))
+
+from lambdas.bedrock_kb_lambda.index_templates import (  # noqa: E402
+    DEFAULT_INDEX_SETTINGS,
+    MAX_RETRIEVAL_RESULTS,
+    MODEL_ID_TO_DIMENSION,
+    validate_index_settings,
+)
+
+# OpenSearch sizes the native memory of a faiss/nmslib HNSW graph as 1.1 * (bytes per vector + 8 * M) per vector
+OSS_MEMORY_OVERHEAD = 1.1
+
+
+def synthetic_corpus(vectors, queries, dimension, clusters, seed):
+    """Normalised vectors drawn around `clusters` centres, the queries come from the same distribution."""
+    generator = np.random.default_rng(seed)
+    centres = generator.standard_normal((clusters, dimension)).astype(np.float32)
+
+    def sample(count):
+        points = centres[generator.integers(0, clusters, count)] + 0.35 * generator.standard_normal(
+            (count, dimension)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    return sample(vectors), sample(queries)
+
+
+def load_embeddings(path, queries, seed):
+    """Dumped embeddings, a random sample of them is held out as queries."""
+    if path.endswith(".npy"):
+        matrix = np.load(path)
+    else:
+        with open(path, encoding="utf-8") as dump:
+            rows = [json.loads(line) for line in dump if line.strip()]
+        matrix = np.array([row.get("vector", row.get("embedding")) for row in rows])
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    order = np.random.default_rng(seed).permutation(len(matrix))
+    return matrix[order[queries:]], matrix[order[:queries]]
+
+
+def exact_neighbours(corpus, queries, k, space_type, chunk_size=256):
+    """Ground truth: ids of the k nearest vectors of every query, by brute force in chunks of queries."""
+    corpus_norms = (corpus ** 2).sum(axis=1)
+    neighbours = []
+    for start in range(0, len(queries), chunk_size):
+        chunk = queries[start:start + chunk_size]
+        scores = chunk @ corpus.T
+        # Smaller is closer: squared l2 distance (without the constant query norm) or negated inner product
+        distances = corpus_norms[None, :] - 2 * scores if space_type == "l2" else -scores
+        candidates = np.argpartition(distances, k, axis=1)[:, :k]
+        order = np.take_along_axis(distances, candidates, axis=1).argsort(axis=1)
+        neighbours.append(np.take_along_axis(candidates, order, axis=1))
+    return np.vstack(neighbours)
+
+
+class FaissBackend:
+    engine = "faiss"
+    encoders = ("none", "fp16")
+
+    def __init__(self, dimension, space_type, m, ef_construction, encoder):
+        import faiss
+
+        faiss.omp_set_num_threads(1)
+        metric = faiss.METRIC_L2 if space_type == "l2" else faiss.METRIC_INNER_PRODUCT
+        if encoder == "fp16":
+            self.index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, m, metric)
+        else:
+            self.index = faiss.IndexHNSWFlat(dimension, m, metric)
+        self.index.hnsw.efConstruction = ef_construction
+        self.faiss = faiss
+
+    def build(self, corpus):
+        if not self.index.is_trained:
+            self.index.train(corpus)
+        self.index.add(corpus)
+
+    def set_ef_search(self, ef_search):
+        self.index.hnsw.efSearch = ef_search
+
+    def query(self, vector, k):
+        return self.index.search(vector[None, :], k)[1][0]
+
+    def memory_bytes(self):
+        return len(self.faiss.serialize_index(self.index))
+
+
+class HnswlibBackend:
+    engine = "nmslib"
+    encoders = ("none",)
+
+    def __init__(self, dimension, space_type, m, ef_construction, encoder):
+        import hnswlib
+
+        self.index = hnswlib.Index(space="l2" if space_type == "l2" else "ip", dim=dimension)
+        self.m, self.ef_construction = m, ef_construction
+
+    def build(self, corpus):
+        self.index.init_index(max_elements=len(corpus), M=self.m, ef_construction=self.ef_construction)
+        self.index.set_num_threads(1)
+        self.index.add_items(corpus)
+
+    def set_ef_search(self, ef_search):
+        self.index.set_ef(ef_search)
+
+    def query(self, vector, k):
+        return self.index.knn_query(vector, k=k)[0][0]
+
+    def memory_bytes(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "index.bin")
+            self.index.save_index(path)
+            return os.path.getsize(path)
+
+
+BACKENDS = {"faiss": FaissBackend, "hnswlib": HnswlibBackend}
+
+
+def pick_backend(name):
+    names = [name] if name != "auto" else list(BACKENDS)
+    for backend_name in names:
+        try:
+            __import__("faiss" if backend_name == "faiss" else "hnswlib")
+            return BACKENDS[backend_name]
+        except ImportError:
+            continue
+    sys.exit("No ANN library found, install one of them: pip install faiss-cpu (or hnswlib)")
+
+
+def estimated_oss_memory_bytes(vectors, dimension, m, encoder):
+    bytes_per_value = {"none": 4, "fp16": 2}[encoder]
+    return int(OSS_MEMORY_OVERHEAD * (bytes_per_value * dimension + 8 * m) * vectors)
+
+
+def sweep(backend_class, corpus, queries, truth, k, space_type, ms, ef_constructions, ef_searches, encoders):
+    """Every configuration of the grid: one build per (M, ef_construction, encoder), one pass per ef_search."""
+    results = []
+    for encoder in encoders:
+        for m in ms:
+            for ef_construction in ef_constructions:
+                backend = backend_class(corpus.shape[1], space_type, m, ef_construction, encoder)
+                started = time.perf_counter()
+                backend.build(corpus)
+                build_seconds = time.perf_counter() - started
+                memory_bytes = backend.memory_bytes()
+                for ef_search in ef_searches:
+                    backend.set_ef_search(max(ef_search, k))
+                    latencies, hits = [], 0
+                    for query, expected in zip(queries, truth):
+                        started = time.perf_counter()
+                        found = backend.query(query, k)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        hits += len(set(found.tolist()) & set(expected.tolist()))
+                    results.append({
+                        "engine": backend_class.engine, "encoder": encoder, "m": m,
+                        "ef_construction": ef_construction, "ef_search": ef_search,
+                        "recall": hits / float(k * len(queries)),
+                        "p50_ms": float(np.percentile(latencies, 50)),
+                        "p99_ms": float(np.percentile(latencies, 99)),
+                        "build_seconds": build_seconds,
+                        "memory_mb": memory_bytes / 1048576,
+                        "oss_memory_mb": estimated_oss_memory_bytes(len(corpus), corpus.shape[1], m, encoder) / 1048576,
+                    })
+                    print("{engine:>7} {encoder:>5} M={m:<3} efC={ef_construction:<4} efS={ef_search:<4} "
+                          "recall@{k}={recall:.4f} p50={p50_ms:.3f}ms p99={p99_ms:.3f}ms build={build_seconds:.1f}s "
+                          "memory={memory_mb:.1f}MB oss~{oss_memory_mb:.1f}MB".format(k=k, **results[-1]), flush=True)
+    return results
+
+
+def recommend(results, target_recall):
+    """Fastest p99 among the configurations reaching the target recall (then the smallest), else the best recall."""
+    eligible = [result for result in results if result["recall"] >= target_recall]
+    if eligible:
+        return min(eligible, key=lambda result: (result["p99_ms"], result["oss_memory_mb"], result["build_seconds"]))
+    return max(results, key=lambda result: (result["recall"], -result["p99_ms"]))
+
+
+def to_index_settings(result, space_type, embedding_model_id):
+    """The recommendation as `KB_CONFIGURATION.OSS_INDEX_SETTINGS`, checked by the index template validation."""
+    settings = {
+        "ENGINE": result["engine"],
+        "SPACE_TYPE": space_type,
+        "M": result["m"],
+        "EF_CONSTRUCTION": result["ef_construction"],
+        # A knowledge base retrieval can ask for MAX_RETRIEVAL_RESULTS results, the template requires at least that
+        "EF_SEARCH": max(result["ef_search"], MAX_RETRIEVAL_RESULTS),
+        "ENCODER": result["encoder"],
+    }
+    validate_index_settings(embedding_model_id, settings)
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help=".npy or .jsonl dump, synthetic vectors when omitted")
+    parser.add_argument("--embedding-model", default="amazon.titan-embed-text-v2:0", choices=sorted(MODEL_ID_TO_DIMENSION))
+    parser.add_argument("--dimension", type=int, help="Synthetic vectors dimension (the model dimension by default)")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space-type", default=DEFAULT_INDEX_SETTINGS["SPACE_TYPE"], choices=["l2", "innerproduct"])
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[128, 512])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[100, 256, 512])
+    parser.add_argument("--encoders", nargs="+", default=["none"], choices=["none", "fp16"])
+    parser.add_argument("--backend", default="auto", choices=["auto"] + sorted(BACKENDS))
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the sweep and the recommendation to this JSON file")
+    args = parser.parse_args()
+
+    backend_class = pick_backend(args.backend)
+    encoders = [encoder for encoder in args.encoders if encoder in backend_class.encoders]
+    if args.embeddings:
+        corpus, queries = load_embeddings(args.embeddings, args.queries, args.seed)
+    else:
+        dimension = args.dimension or MODEL_ID_TO_DIMENSION[args.embedding_model]
+        corpus, queries = synthetic_corpus(args.vectors, args.queries, dimension, args.clusters, args.seed)
+    print(f"{len(corpus)} vectors of {corpus.shape[1]} dimensions, {len(queries)} queries, recall@{args.k}, "
+          f"space {args.space_type}, {backend_class.engine} engine")
+
+    started = time.perf_counter()
+    truth = exact_neighbours(corpus, queries, args.k, args.space_type)
+    print(f"Exact ground truth computed in {time.perf_counter() - started:.1f}s")
+
+    results = sweep(backend_class, corpus, queries, truth, args.k, args.space_type, args.m, args.ef_construction,
+                    args.ef_search, encoders)
+    best = recommend(results, args.target_recall)
+    if best["recall"] < args.target_recall:
+        print(f"No configuration reaches recall {args.target_recall}, recommending the most accurate one")
+    recommendation = {"KB_CONFIGURATION": {"OSS_INDEX_SETTINGS": to_index_settings(
+        best, args.space_type, args.embedding_model)}}
+    print(json.dumps(recommendation, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({"results": results, "recommended": best, **recommendation}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
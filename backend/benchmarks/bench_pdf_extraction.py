@@ -0,0 +1,89 @@
+"""
+Compares the serial and the page-range parallel text extraction of `agent_tools.pdf_extraction`
+on synthetic PDFs: wall time and peak RSS (parent + workers) for each path.
+
+Every measure runs in a fresh interpreter so that the peak RSS of one run does not leak into the next.
+
+Usage (from the backend folder):
+    python benchmarks/bench_pdf_extraction.py --pages 50 200 400 --workers 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_ROOT, "code", "services", "lambdas", "multi_agent_handlers"))
+
+LOREM = ("The supplier will deliver the migration of the workloads to AWS, including the landing zone, "
+         "the CI/CD pipelines and the observability stack, according to the milestones below. ")
+
+
+def build_synthetic_pdf(path, pages, lines_per_page=45):
+    import fitz
+
+    document = fitz.open()
+    for page_number in range(pages):
+        page = document.new_page()
+        text = "\n".join(f"{page_number + 1}.{line} {LOREM}"[:110] for line in range(lines_per_page))
+        page.insert_text((36, 48), text, fontsize=8)
+    document.save(path)
+    document.close()
+
+
+def run_once(pdf_path, mode, workers):
+    from agent_tools.pdf_extraction import extract_page_texts
+
+    with open(pdf_path, "rb") as pdf_file:
+        pdf_bytes = pdf_file.read()
+    started = time.perf_counter()
+    if mode == "serial":
+        page_texts = extract_page_texts(pdf_bytes, workers=1)
+    else:
+        page_texts = extract_page_texts(pdf_bytes, workers=workers, min_pages=0)
+    elapsed = time.perf_counter() - started
+    peak_rss_kb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                   + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_kb / 1024,
+                      "characters": sum(len(text) for text in page_texts)}))
+
+
+def measure(pdf_path, mode, workers):
+    output = subprocess.run(
+        [sys.executable, __file__, "--run", mode, "--pdf", pdf_path, "--workers", str(workers)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--run", choices=["serial", "parallel"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_once(args.pdf, args.run, args.workers)
+        return
+
+    print(f"{'pages':>6} {'mode':>9} {'wall (s)':>9} {'peak RSS (MB)':>14} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            pdf_path = os.path.join(workdir, f"synthetic_{pages}.pdf")
+            build_synthetic_pdf(pdf_path, pages)
+            serial = measure(pdf_path, "serial", args.workers)
+            parallel = measure(pdf_path, "parallel", args.workers)
+            assert serial["characters"] == parallel["characters"], "both paths must extract the same text"
+            for mode, result in (("serial", serial), ("parallel", parallel)):
+                speedup = serial["seconds"] / result["seconds"]
+                print(f"{pages:>6} {mode:>9} {result['seconds']:>9.3f} {result['peak_rss_mb']:>14.1f} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
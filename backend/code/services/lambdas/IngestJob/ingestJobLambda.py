@@ -1,22 +1,209 @@
+"""
+Synchronisation of the knowledge base with its S3 documents.
+
+The S3 events of the data source go through an SQS queue: the event source mapping batches them (up to its
+batching window) so a bulk upload starts a single ingestion job instead of one per document. While a job is
+running, a new one would fail with a ConflictException and miss the latest documents, so a delayed follow-up
+message is queued instead: it comes back through the same batching and starts the next job once the
+running one is over. At most one follow-up is pending, the S3 events are the only other (never delayed) messages.
+
+A sync is incremental: it only embeds the documents changed since the previous one. When the stack swaps the
+knowledge base alias to a new, empty index version, its message asks for a re-ingestion and every document of the
+data source is copied onto itself first, so the next job embeds all of them into the new index.
+"""
 import os
-from typing import Dict
-from boto3 import client
 import json
 
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+
+from ..aws_clients import get_client
+
 KNOWLEDGE_BASE_ID = os.environ["KNOWLEDGE_BASE_ID"]
 DATA_SOURCE_ID = os.environ["DATA_SOURCE_ID"]
 AWS_REGION = os.environ["AWS_REGION"]
+# Queue of the S3 events, follow-up runs are sent to it
+INGESTION_QUEUE_URL = os.environ.get("INGESTION_QUEUE_URL")
+# Delay before a follow-up run checks again for the running job (SQS allows up to 900 seconds)
+FOLLOW_UP_DELAY_SECONDS = int(os.environ.get("INGESTION_FOLLOW_UP_DELAY_SECONDS", "120"))
+# Documents of the data source, marked as changed when they have to be re-ingested into a new index
+DATA_SOURCE_BUCKET = os.environ.get("DATA_SOURCE_BUCKET")
+DATA_SOURCE_PREFIX = os.environ.get("DATA_SOURCE_PREFIX", "rag_input_document/")
+
+# Statuses of an ingestion job that would make a new job fail
+IN_FLIGHT_STATUSES = ["STARTING", "IN_PROGRESS", "STOPPING"]
+FOLLOW_UP_MESSAGE_TYPE = "ingestion_follow_up"
+# User metadata set on the documents re-ingested for an index version
+REINGESTION_METADATA_KEY = "reingested-for-index"
+# Archived documents cannot be copied (nor ingested) without a restore
+ARCHIVED_STORAGE_CLASSES = {"GLACIER", "DEEP_ARCHIVE"}
+
+logger = Logger(service="kb_ingestion_job", level=os.environ.get("LOG_LEVEL", "INFO"))
+metrics = Metrics(namespace=os.environ.get("POWERTOOLS_METRICS_NAMESPACE", "KnowledgeBaseIngestion"),
+                  service="kb_ingestion_job")
+
+bedrock_agent_client = get_client("bedrock-agent", region_name=AWS_REGION)
+sqs_client = get_client("sqs", region_name=AWS_REGION)
+s3_client = get_client("s3", region_name=AWS_REGION)
+
+
+def count_triggers(records):
+    """
+    Number of document changes and of follow-up runs in the batch. Records are SQS messages holding S3
+    notifications, or S3 records when the function is invoked by S3 directly; S3 test events are ignored.
+    """
+    changes, follow_ups = 0, 0
+    for record in records:
+        if record.get("eventSource") == "aws:s3":
+            changes += 1
+            continue
+        body = json.loads(record.get("body") or "{}")
+        if body.get("type") == FOLLOW_UP_MESSAGE_TYPE:
+            follow_ups += 1
+        else:
+            changes += sum(1 for s3_record in body.get("Records", []) if s3_record.get("eventSource") == "aws:s3")
+    return changes, follow_ups
+
+
+def get_reingestion_indexes(records):
+    """Index versions of the follow-ups sent by the stack for a new, empty index (RequiresReingestion)."""
+    indexes = []
+    for record in records:
+        if record.get("eventSource") == "aws:s3":
+            continue
+        body = json.loads(record.get("body") or "{}")
+        if body.get("type") == FOLLOW_UP_MESSAGE_TYPE and body.get("requires_reingestion") == "True":
+            indexes.append(body["index_name"])
+    return indexes
+
+
+def mark_documents_for_reingestion(index_name):
+    """
+    Copies every document of the data source onto itself with `index_name` in its metadata: the next sync sees
+    them as modified and embeds all of them again. Returns the number of documents marked.
+    """
+    if not DATA_SOURCE_BUCKET:
+        logger.warning("No data source bucket, the documents cannot be marked for re-ingestion")
+        return 0
+    marked, archived, continuation = 0, 0, {}
+    while True:
+        response = s3_client.list_objects_v2(Bucket=DATA_SOURCE_BUCKET, Prefix=DATA_SOURCE_PREFIX, **continuation)
+        for s3_object in response.get("Contents", []):
+            storage_class = s3_object.get("StorageClass", "STANDARD")
+            if storage_class in ARCHIVED_STORAGE_CLASSES:
+                archived += 1
+                continue
+            key = s3_object["Key"]
+            head = s3_client.head_object(Bucket=DATA_SOURCE_BUCKET, Key=key)
+            if head.get("Metadata", {}).get(REINGESTION_METADATA_KEY) == index_name:
+                # Already marked by a previous attempt of this message
+                continue
+            # REPLACE drops the metadata of the object, the content type and user metadata are copied back
+            s3_client.copy_object(
+                Bucket=DATA_SOURCE_BUCKET,
+                Key=key,
+                CopySource={"Bucket": DATA_SOURCE_BUCKET, "Key": key},
+                MetadataDirective="REPLACE",
+                ContentType=head.get("ContentType", "binary/octet-stream"),
+                Metadata={**head.get("Metadata", {}), REINGESTION_METADATA_KEY: index_name},
+                StorageClass=storage_class,
+            )
+            marked += 1
+        if not response.get("IsTruncated"):
+            break
+        continuation = {"ContinuationToken": response["NextContinuationToken"]}
+    if archived:
+        logger.warning("Archived documents are not re-ingested", extra={"archived_documents": archived})
+    logger.info("Documents marked for re-ingestion", extra={"index_name": index_name, "documents": marked})
+    return marked
+
+
+def get_in_flight_job():
+    """Summary of the ingestion job running on the data source, None when it is idle."""
+    response = bedrock_agent_client.list_ingestion_jobs(
+        knowledgeBaseId=KNOWLEDGE_BASE_ID,
+        dataSourceId=DATA_SOURCE_ID,
+        filters=[{"attribute": "STATUS", "operator": "EQ", "values": IN_FLIGHT_STATUSES}],
+        maxResults=1,
+    )
+    summaries = response.get("ingestionJobSummaries", [])
+    return summaries[0] if summaries else None
+
+
+def get_queue_attributes():
+    return sqs_client.get_queue_attributes(
+        QueueUrl=INGESTION_QUEUE_URL,
+        AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesDelayed"],
+    )["Attributes"]
+
+
+def schedule_follow_up():
+    """Queues a delayed follow-up run unless one is already pending. Returns True when a message was sent."""
+    if not INGESTION_QUEUE_URL:
+        logger.warning("No ingestion queue, the follow-up run is skipped")
+        return False
+    if int(get_queue_attributes()["ApproximateNumberOfMessagesDelayed"]):
+        logger.info("A follow-up run is already pending")
+        return False
+    sqs_client.send_message(
+        QueueUrl=INGESTION_QUEUE_URL,
+        MessageBody=json.dumps({"type": FOLLOW_UP_MESSAGE_TYPE}),
+        DelaySeconds=FOLLOW_UP_DELAY_SECONDS,
+    )
+    return True
+
+
+def get_queue_depth():
+    """Messages waiting in the queue, the pending follow-up included."""
+    attributes = get_queue_attributes()
+    return int(attributes["ApproximateNumberOfMessages"]) + int(attributes["ApproximateNumberOfMessagesDelayed"])
+
 
-bedrock_agent_client = client("bedrock-agent", region_name=AWS_REGION)
+def start_or_defer_ingestion_job(client_token):
+    """
+    Starts an ingestion job, or makes sure a follow-up run is pending when one is already in flight.
+    Returns the started job (None when deferred) and whether a follow-up message was sent.
+    """
+    in_flight_job = get_in_flight_job()
+    if in_flight_job is None:
+        try:
+            response = bedrock_agent_client.start_ingestion_job(
+                knowledgeBaseId=KNOWLEDGE_BASE_ID,
+                dataSourceId=DATA_SOURCE_ID,
+                clientToken=client_token,
+            )
+            return response["ingestionJob"], False
+        except bedrock_agent_client.exceptions.ConflictException:
+            # A job was started between the check and this call
+            logger.info("Ingestion job started concurrently")
+    else:
+        logger.info("Ingestion job in flight", extra={"ingestion_job_id": in_flight_job.get("ingestionJobId")})
+    return None, schedule_follow_up()
 
 
+@metrics.log_metrics
 def lambda_handler(event, context):
-    input_data = {
-        "knowledgeBaseId": KNOWLEDGE_BASE_ID,
-        "dataSourceId": DATA_SOURCE_ID,
-        "clientToken": context.aws_request_id,
-    }
+    records = event.get("Records", [])
+    changes, follow_ups = count_triggers(records)
+    if not changes and not follow_ups:
+        metrics.add_metric(name="IgnoredMessages", unit=MetricUnit.Count, value=len(records))
+        return {"ingestionJob": None}
 
-    response = bedrock_agent_client.start_ingestion_job(**input_data)
+    for index_name in get_reingestion_indexes(records):
+        metrics.add_metric(name="DocumentsMarkedForReingestion", unit=MetricUnit.Count,
+                           value=mark_documents_for_reingestion(index_name))
+    ingestion_job, follow_up_sent = start_or_defer_ingestion_job(context.aws_request_id)
 
-    return {"ingestionJob": response["ingestionJob"]}
+    # Triggers folded into this single sync attempt, each of them used to start its own job. The coalescing
+    # ratio of a period is sum(DocumentChanges) / sum(IngestionJobsStarted) (CloudWatch metric math)
+    metrics.add_metric(name="DocumentChanges", unit=MetricUnit.Count, value=changes)
+    metrics.add_metric(name="CoalescedTriggers", unit=MetricUnit.Count, value=changes + follow_ups)
+    metrics.add_metric(name="IngestionJobsStarted", unit=MetricUnit.Count, value=int(ingestion_job is not None))
+    metrics.add_metric(name="FollowUpsScheduled", unit=MetricUnit.Count, value=int(follow_up_sent))
+    if INGESTION_QUEUE_URL:
+        metrics.add_metric(name="QueueDepth", unit=MetricUnit.Count, value=get_queue_depth())
+    logger.info("Ingestion triggers coalesced", extra={
+        "document_changes": changes, "follow_ups": follow_ups,
+        "ingestion_job_id": ingestion_job and ingestion_job.get("ingestionJobId"),
+    })
+    return {"ingestionJob": ingestion_job}
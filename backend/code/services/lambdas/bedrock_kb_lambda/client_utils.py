@@ -1,13 +1,14 @@
-import boto3
 from aws_lambda_powertools import Logger
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from requests_aws4auth import AWS4Auth
 
+from ..aws_clients import get_client, get_session as get_shared_session
+
 logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
 
 
 def get_session():
-    return boto3.Session()
+    return get_shared_session()
 
 
 def get_credentials(session):
@@ -27,11 +28,11 @@ def get_caller_arn(sts_client):
 
 
 def get_sts_client(session, region):
-    return session.client("sts", region_name=region)
+    return get_client("sts", region_name=region)
 
 
 def get_oss_client(session, region):
-    return session.client("opensearchserverless", region_name=region)
+    return get_client("opensearchserverless", region_name=region)
 
 
 def get_oss_http_client(session, region, host):
@@ -52,8 +53,8 @@ def get_oss_http_client(session, region, host):
 
 
 def get_rds_data_api_client(session, region):
-    return session.client("rds-data", region_name=region)
+    return get_client("rds-data", region_name=region)
 
 
 def get_secret_manager_client(session, region):
-    return session.client("secretsmanager", region_name=region)
\ No newline at end of file
+    return get_client("secretsmanager", region_name=region)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import json
+
+VECTOR_FIELD_NAME = "bedrock-knowledge-base-default-vector"
+METADATA_FIELD_NAME = "AMAZON_BEDROCK_METADATA"
+TEXT_FIELD_NAME = "AMAZON_BEDROCK_TEXT_CHUNK"
+
+# Vector dimension written by each embedding model (its default output size on Bedrock)
+MODEL_ID_TO_DIMENSION = {
+    "amazon.titan-embed-text-v1": 1536,
+    "amazon.titan-embed-text-v2:0": 1024,
+    "cohere.embed-english-v3": 1024,
+    "cohere.embed-multilingual-v3": 1024,
+}
+
+# Space types supported by each k-NN engine for HNSW
+ENGINE_SPACE_TYPES = {
+    "faiss": {"l2", "innerproduct"},
+    "nmslib": {"l2", "innerproduct", "cosinesimil", "l1", "linf"},
+    "lucene": {"l2", "innerproduct", "cosinesimil"},
+}
+# none: float32 vectors, fp16: faiss scalar quantisation (half the memory). Knowledge bases write float32
+# embeddings, a byte (int8) vector field would reject them
+ENCODER_ENGINES = {
+    "none": set(ENGINE_SPACE_TYPES),
+    "fp16": {"faiss"},
+}
+# A knowledge base retrieval asks for up to 100 results, ef_search below that would cut the candidates short
+MAX_RETRIEVAL_RESULTS = 100
+
+# `KB_CONFIGURATION.OSS_INDEX_SETTINGS` of cdk.json, every key is optional
+DEFAULT_INDEX_SETTINGS = {
+    "ENGINE": "faiss",
+    "SPACE_TYPE": "l2",
+    "M": 16,
+    "EF_CONSTRUCTION": 512,
+    "EF_SEARCH": 512,
+    "ENCODER": "none",
+}
+
+
+def parse_index_settings(index_settings):
+    """
+    Settings of the custom resource props: CloudFormation passes the JSON of OSS_INDEX_SETTINGS as a string.
+    Returns the defaults completed by the given settings.
+    """
+    if isinstance(index_settings, str):
+        index_settings = json.loads(index_settings) if index_settings else {}
+    unknown_keys = set(index_settings or {}) - set(DEFAULT_INDEX_SETTINGS)
+    if unknown_keys:
+        raise ValueError("Unknown index settings {}, expected some of {}".format(
+            sorted(unknown_keys), sorted(DEFAULT_INDEX_SETTINGS)))
+    return {**DEFAULT_INDEX_SETTINGS, **(index_settings or {})}
+
+
+def _as_int(settings, key, minimum, maximum=None):
+    value = settings[key]
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("{} must be an integer, got {!r}".format(key, value))
+    if value < minimum:
+        raise ValueError("{} must be at least {}, got {}".format(key, minimum, value))
+    if maximum is not None and value > maximum:
+        raise ValueError("{} must be at most {}, got {}".format(key, maximum, value))
+    return value
+
+
+def validate_index_settings(embedding_model_id, index_settings=None):
+    """
+    Checks the settings against the model and the k-NN engine, raising a ValueError that lists every invalid
+    combination. Returns the normalised settings (lower case names, integers).
+    """
+    settings = parse_index_settings(index_settings)
+    errors = []
+    if embedding_model_id not in MODEL_ID_TO_DIMENSION:
+        errors.append("Unknown embedding model {}, expected one of {}".format(
+            embedding_model_id, sorted(MODEL_ID_TO_DIMENSION)))
+
+    engine = str(settings["ENGINE"]).lower()
+    space_type = str(settings["SPACE_TYPE"]).lower()
+    encoder = str(settings["ENCODER"]).lower()
+    if engine not in ENGINE_SPACE_TYPES:
+        errors.append("ENGINE must be one of {}, got {}".format(sorted(ENGINE_SPACE_TYPES), engine))
+    elif space_type not in ENGINE_SPACE_TYPES[engine]:
+        errors.append("SPACE_TYPE {} is not supported by the {} engine, expected one of {}".format(
+            space_type, engine, sorted(ENGINE_SPACE_TYPES[engine])))
+    if encoder not in ENCODER_ENGINES:
+        errors.append("ENCODER must be one of {}, got {}".format(sorted(ENCODER_ENGINES), encoder))
+    elif engine in ENGINE_SPACE_TYPES and engine not in ENCODER_ENGINES[encoder]:
+        errors.append("ENCODER {} is not supported by the {} engine, expected one of {}".format(
+            encoder, engine, sorted(ENCODER_ENGINES[encoder])))
+
+    numbers = {}
+    for key, minimum, maximum in (("M", 2, 100), ("EF_CONSTRUCTION", 2, None), ("EF_SEARCH", MAX_RETRIEVAL_RESULTS, None)):
+        try:
+            numbers[key] = _as_int(settings, key, minimum, maximum)
+        except ValueError as error:
+            errors.append(str(error))
+    if not errors and numbers["EF_CONSTRUCTION"] < numbers["M"]:
+        errors.append("EF_CONSTRUCTION ({}) must be at least M ({})".format(numbers["EF_CONSTRUCTION"], numbers["M"]))
+
+    if errors:
+        raise ValueError("Invalid OpenSearch index settings: " + "; ".join(errors))
+    return {"engine": engine, "space_type": space_type, "encoder": encoder, "m": numbers["M"],
+            "ef_construction": numbers["EF_CONSTRUCTION"], "ef_search": numbers["EF_SEARCH"]}
+
+
+def build_index_request(embedding_model_id, index_settings=None):
+    """Body of the index creation request of a knowledge base: HNSW vector field sized for the model."""
+    settings = validate_index_settings(embedding_model_id, index_settings)
+    parameters = {"ef_construction": settings["ef_construction"], "m": settings["m"]}
+    if settings["encoder"] == "fp16":
+        parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+    vector_field = {
+        "type": "knn_vector",
+        "dimension": MODEL_ID_TO_DIMENSION[embedding_model_id],
+        "method": {
+            "name": "hnsw",
+            "engine": settings["engine"],
+            "parameters": parameters,
+            "space_type": settings["space_type"],
+        },
+    }
+    return {
+        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": settings["ef_search"]}},
+        "mappings": {
+            "properties": {
+                VECTOR_FIELD_NAME: vector_field,
+                METADATA_FIELD_NAME: {"type": "text", "index": "false"},
+                TEXT_FIELD_NAME: {"type": "text", "index": "true"},
+            }
+        },
+    }
@@ -10,14 +10,21 @@ from .client_utils import (
     get_session,
     get_sts_client,
 )
+from .index_templates import build_index_request
 from .oss_utils import (
-    MODEL_ID_TO_INDEX_REQUEST_MAP,
     create_index_with_retries,
     delete_index_if_present,
     get_access_policy,
     get_host_from_collection_endpoint,
     get_updated_access_policy_with_caller_arn,
+    get_versioned_index_name,
+    is_alias,
+    reindex,
+    swap_alias,
     update_access_policy,
+    vectors_are_compatible,
+    wait_for_access_policy,
+    wait_for_index_ready,
 )
 
 logger = Logger(
@@ -45,13 +52,23 @@ def lambda_handler(event, context):
     raise Exception("Invalid request type: %s" % request_type)
 
 
+"""
+The knowledge base points to an alias named `index_name`, the documents live in a versioned index behind it
+(`<index_name>-<hash of the index definition>`). The versioned index name is the physical resource id, so
+CloudFormation only deletes an index once the alias has moved away from it:
+- after a successful update, the cleanup phase sends a delete event for the previous index,
+- after a failed update, the rollback sends an update event with the props reversed, the previous index still
+  exists and the alias is swapped back to it, then a delete event for the new index.
+"""
+
+
 """
 During a creation event:
 1. We first update the data access policy (supplied as part of the resoure properties) to add the caller arn as a trusted principal.
-2. We create an index with name `index_name`.
-3. In case of any failure, the error gets thrown and the Custom Resource Provider treats it as a resource creation failure. We don't do any
+2. We create the versioned index of the props (or reuse it if it already exists) and wait until it can be queried.
+3. We point the alias `index_name` to it.
+4. In case of any failure, the error gets thrown and the Custom Resource Provider treats it as a resource creation failure. We don't do any
 cleanup since the index failed to be created - so there is nothing to delete.
-4. We are using the index_name as the physical resource id because it serves as the identifier for an index.
 """
 
 
@@ -62,9 +79,10 @@ def on_create(event):
     policy_name = props["data_access_policy_name"]
     collection_endpoint = props["collection_endpoint"]
     host = get_host_from_collection_endpoint(collection_endpoint)
-    index_name = props["index_name"]
+    alias_name = props["index_name"]
     embedding_model_id = props["embedding_model_id"]
-    index_request = MODEL_ID_TO_INDEX_REQUEST_MAP[embedding_model_id]
+    index_request = build_index_request(embedding_model_id, props.get("index_settings"))
+    index_name = get_versioned_index_name(alias_name, embedding_model_id, index_request)
 
     session = get_session()
     sts_client = get_sts_client(session, region)
@@ -72,27 +90,35 @@ def on_create(event):
     oss_http_client = get_oss_http_client(session, region, host)
 
     update_access_policy_with_caller_arn_if_applicable(
-        sts_client, oss_client, policy_name
+        sts_client, oss_client, oss_http_client, policy_name, alias_name
     )
 
-    logger.info("Creating index {}".format(index_name))
-    create_index_with_retries(oss_http_client, index_name, index_request)
+    logger.info("Creating index {} behind alias {}".format(index_name, alias_name))
+    ensure_index(oss_http_client, index_name, index_request)
+    swap_alias(oss_http_client, alias_name, index_name)
 
-    return {"PhysicalResourceId": index_name}
+    return {
+        "PhysicalResourceId": index_name,
+        "Data": {"IndexName": index_name, "AliasName": alias_name, "RequiresReingestion": "False"},
+    }
 
 
 """
-During an update event:
+During an update event (blue/green, the knowledge base keeps querying the alias):
 1. We first check if the old resouce properties and the new ones are the same. If they are, we do not do anything.
 2. If the properties are different:
 a. We first update the data access policy (supplied as part of the resoure properties) to add the caller arn as a trusted principal.
-b. We delete the old index.
-c. We create a new index with the new `index_name`.
-3. In case of any failure, the error gets thrown and the Custom Resource Provider treats it as a resource update failure. The Customer Resource,
-provider will send another update event in this case with the old and new resource props reversed and the same update logic, should be able to recreate
-the old index again during rollback.
-6. We are using the new index_name as the physical resource id because it serves as the identifier for the index. If the index naem has changed from before,
-the Custom Resource provider will send a delete event for the old index but our deletion logic below is robust enough to not fail if we try deleting a non-existent index.
+b. We create the versioned index of the new props. During a rollback it still exists and is reused as is.
+c. When the embedding model is unchanged and the vectors are compatible (same field, dimension and space), the documents of the current index are copied into it
+   (`data_migration` prop, `reindex` by default), otherwise the data source has to be re-ingested (RequiresReingestion).
+d. We atomically swap the alias to the new index. The previous index is deleted later by the delete event CloudFormation sends
+   for the previous physical resource id. An empty new index answers no query until the data source is re-ingested: the
+   stack queues an ingestion run whenever IndexName changes, with RequiresReingestion the ingestion Lambda first marks every
+   document as changed since a sync only embeds the changed ones (see KbInfraStack.create_ingest_lambda).
+3. In case of any failure, an index created by this event is deleted and the error gets thrown: the Custom Resource Provider treats it
+as a resource update failure and the alias still points to the previous index.
+4. Indexes created before the alias existed are named `index_name`: the alias can only be created once that index is deleted, this
+one-time migration is the only moment queries can fail.
 """
 
 
@@ -103,20 +129,25 @@ def on_update(event):
         "Updating OpenSearch index with new props %s, old props: %s"
         % (props, old_props)
     )
-    index_name = event["PhysicalResourceId"]
+    previous_index_name = event["PhysicalResourceId"]
 
     if old_props == props:
         logger.info("Props are same, nothing to do")
-        return {"PhysicalResourceId": index_name}
+        return {
+            "PhysicalResourceId": previous_index_name,
+            "Data": {"IndexName": previous_index_name, "AliasName": props["index_name"], "RequiresReingestion": "False"},
+        }
 
-    logger.info("New props are different from old props. Index requires re-creation")
+    logger.info("New props are different from old props. Index requires a new version")
     region = os.environ["AWS_REGION"]
     policy_name = props["data_access_policy_name"]
     collection_endpoint = props["collection_endpoint"]
     host = get_host_from_collection_endpoint(collection_endpoint)
-    index_name = props["index_name"]
+    alias_name = props["index_name"]
     embedding_model_id = props["embedding_model_id"]
-    index_request = MODEL_ID_TO_INDEX_REQUEST_MAP[embedding_model_id]
+    index_request = build_index_request(embedding_model_id, props.get("index_settings"))
+    old_index_request = build_index_request(old_props["embedding_model_id"], old_props.get("index_settings"))
+    index_name = get_versioned_index_name(alias_name, embedding_model_id, index_request)
 
     session = get_session()
     sts_client = get_sts_client(session, region)
@@ -124,23 +155,44 @@ def on_update(event):
     oss_http_client = get_oss_http_client(session, region, host)
 
     update_access_policy_with_caller_arn_if_applicable(
-        sts_client, oss_client, policy_name
+        sts_client, oss_client, oss_http_client, policy_name, alias_name
     )
 
-    old_index_name = old_props["index_name"]
-    logger.info("Deleting old index {}".format(old_index_name))
-    delete_index_if_present(oss_http_client, old_index_name)
-
-    logger.info("Creating new index {}".format(index_name))
-    create_index_with_retries(oss_http_client, index_name, index_request)
-    return {"PhysicalResourceId": index_name}
+    logger.info("Creating index {} behind alias {}".format(index_name, alias_name))
+    created = ensure_index(oss_http_client, index_name, index_request)
+    requires_reingestion = False
+    try:
+        if created and index_name != previous_index_name:
+            # Vectors of another embedding model are meaningless to the new one, even with the same dimension
+            if props.get("data_migration", "reindex") == "reindex" and (
+                    old_props["embedding_model_id"] == embedding_model_id) and vectors_are_compatible(
+                    old_index_request, index_request) and oss_http_client.indices.exists(index=previous_index_name):
+                reindex(oss_http_client, previous_index_name, index_name)
+            else:
+                requires_reingestion = True
+                logger.warning("Index {} starts empty, the data source has to be re-ingested".format(index_name))
+        if oss_http_client.indices.exists(index=alias_name) and not is_alias(oss_http_client, alias_name):
+            logger.warning("Deleting index {} created before the alias, to replace it by the alias".format(alias_name))
+            delete_index_if_present(oss_http_client, alias_name)
+        swap_alias(oss_http_client, alias_name, index_name)
+    except Exception:
+        if created:
+            logger.info("Update failed, deleting the new index {}".format(index_name))
+            delete_index_if_present(oss_http_client, index_name)
+        raise
+
+    return {
+        "PhysicalResourceId": index_name,
+        "Data": {"IndexName": index_name, "AliasName": alias_name, "RequiresReingestion": str(requires_reingestion)},
+    }
 
 
 """
 During a delete event:
 1. We try deleting the index if it exists.
 2. If it doesn't exist, we return without error. If it exists, we delete it.
-3. In case of any errors (when the index exists), we throw the error and CFN treats it as a Deletion failure.
+3. A physical resource id that is now an alias (index created before the alias) is not deleted, the alias belongs to the new index.
+4. In case of any errors (when the index exists), we throw the error and CFN treats it as a Deletion failure.
 """
 
 
@@ -155,26 +207,45 @@ def on_delete(event):
     session = get_session()
     oss_http_client = get_oss_http_client(session, region, host)
 
-    delete_index_if_present(oss_http_client, index_name)
+    if is_alias(oss_http_client, index_name):
+        logger.info("{} is an alias now, nothing to delete".format(index_name))
+    else:
+        delete_index_if_present(oss_http_client, index_name)
     return {"PhysicalResourceId": index_name}
 
 
+def ensure_index(oss_http_client, index_name, index_request):
+    """Creates the index unless it already exists, then waits until it can be queried. Returns True if created."""
+    if oss_http_client.indices.exists(index=index_name):
+        logger.info("Index {} already exists, reusing it".format(index_name))
+        wait_for_index_ready(oss_http_client, index_name, index_request)
+        return False
+    create_index_with_retries(oss_http_client, index_name, index_request)
+    return True
+
+
 def update_access_policy_with_caller_arn_if_applicable(
-    sts_client, oss_client, policy_name
+    sts_client, oss_client, oss_http_client, policy_name, index_name
 ):
     caller_arn = get_caller_arn(sts_client)
 
     access_policy = get_access_policy(oss_client, policy_name)
-    updated_access_policy = {
-        **access_policy,
-        "Policy": get_updated_access_policy_with_caller_arn(
-            access_policy["Policy"], caller_arn
-        ),
-    }
-    logger.info("Updating access policy")
-    update_access_policy(
-        oss_client,
-        updated_access_policy["Policy"],
-        updated_access_policy["Version"],
-        updated_access_policy["PolicyName"],
+    if caller_arn in access_policy["Policy"][0]["Principal"]:
+        logger.info("Caller arn already in the access policy, no update needed")
+    else:
+        updated_access_policy = {
+            **access_policy,
+            "Policy": get_updated_access_policy_with_caller_arn(
+                access_policy["Policy"], caller_arn
+            ),
+        }
+        logger.info("Updating access policy")
+        update_access_policy(
+            oss_client,
+            updated_access_policy["Policy"],
+            updated_access_policy["Version"],
+            updated_access_policy["PolicyName"],
+        )
+    wait_for_access_policy(
+        oss_client, oss_http_client, policy_name, caller_arn, index_name
     )
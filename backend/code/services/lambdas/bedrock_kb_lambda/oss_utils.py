@@ -1,78 +1,27 @@
+import hashlib
 import json
 import re
 from datetime import datetime
-from time import sleep
 import os
 
 from aws_lambda_powertools import Logger
-from opensearchpy import NotFoundError
+from opensearchpy import AuthorizationException, NotFoundError, RequestError
+
+from .readiness import (
+    INDEX_CREATE_TIMEOUT_SECONDS,
+    INDEX_DELETED_TIMEOUT_SECONDS,
+    INDEX_READY_TIMEOUT_SECONDS,
+    POLICY_READY_TIMEOUT_SECONDS,
+    wait_until,
+)
 
 logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
 
 vector_field_name = os.environ.get('VECTOR_FIELD_NAME')
 metadata_field_name = os.environ.get('METADATA_FIELD_NAME')
 text_field_name = os.environ.get('TEXT_FIELD_NAME')
-
-
-MODEL_ID_TO_INDEX_REQUEST_MAP = {
-    "amazon.titan-embed-text-v1": {
-        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
-        "mappings": {
-            "properties": {
-                "bedrock-knowledge-base-default-vector": {
-                    "type": "knn_vector",
-                    "dimension": 1536,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "faiss",
-                        "parameters": {"ef_construction": 512, "m": 16},
-                        "space_type": "l2",
-                    },
-                },
-                "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
-                "AMAZON_BEDROCK_TEXT_CHUNK": {"type": "text", "index": "true"},
-            }
-        },
-    },
-    "amazon.titan-embed-text-v2:0": {
-        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
-        "mappings": {
-            "properties": {
-                "bedrock-knowledge-base-default-vector": {
-                    "type": "knn_vector",
-                    "dimension": 1024,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "faiss",
-                        "parameters": {"ef_construction": 512, "m": 16},
-                        "space_type": "l2",
-                    },
-                },
-                "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
-                "AMAZON_BEDROCK_TEXT_CHUNK": {"type": "text", "index": "true"},
-            }
-        },
-    },
-    "cohere.embed-english-v3": {
-        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
-        "mappings": {
-            "properties": {
-                "bedrock-knowledge-base-default-vector": {
-                    "type": "knn_vector",
-                    "dimension": 1024,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "faiss",
-                        "parameters": {"ef_construction": 512, "m": 16},
-                        "space_type": "l2",
-                    },
-                },
-                "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
-                "AMAZON_BEDROCK_TEXT_CHUNK": {"type": "text", "index": "true"},
-            }
-        },
-    },
-}
+# Copying the documents of the previous index can take a while, it must finish within the 14 minutes of the Lambda
+REINDEX_TIMEOUT_SECONDS = int(os.environ.get("OSS_REINDEX_TIMEOUT_SECONDS", "300"))
 
 
 def get_access_policy(oss_client, policy_name):
@@ -96,8 +45,8 @@ def update_access_policy(oss_client, updated_policy, policy_version, policy_name
         type="data",
     )
     logger.info(response)
-    logger.info("Updated data access policy, sleeping for 2 minutes for permissions to propagate")
-    sleep(120)
+    logger.info("Updated data access policy")
+    return response
 
 
 def get_updated_access_policy_with_caller_arn(policy, caller_arn):
@@ -108,36 +57,83 @@ def get_updated_access_policy_with_caller_arn(policy, caller_arn):
     return policy_copy
 
 
+def wait_for_access_policy(oss_client, oss_http_client, policy_name, caller_arn, index_name,
+                           timeout=POLICY_READY_TIMEOUT_SECONDS):
+    """
+    Waits until the caller is a principal of the data access policy and the collection stops answering 403 to
+    it, the policy takes a while to reach every node of the collection.
+    """
+    def policy_is_visible():
+        policy = get_access_policy(oss_client, policy_name)["Policy"]
+        if caller_arn not in policy[0]["Principal"]:
+            return False
+        try:
+            oss_http_client.indices.exists(index=index_name)
+        except AuthorizationException:
+            return False
+        return True
+
+    # Two successes in a row: the first allowed request can be served by a node the policy already reached
+    return wait_until(policy_is_visible, "Data access policy {} visible".format(policy_name), timeout,
+                      required_successes=2)
+
+
 def create_index(oss_http_client, index_name, request_body):
     return oss_http_client.indices.create(index_name, body=request_body)
 
 
-def create_index_with_retries(oss_http_client, index_name, request_body):
-    attempts = 0
-    while attempts < 10:
+def get_knn_probe_query(request_body):
+    """
+    Smallest kNN query on the vector field of an index request, it fails until the index can be searched.
+    The probe vector is one-hot: cosinesimil rejects a zero vector, the wait would only end at its timeout.
+    """
+    vector_mapping = get_vector_mapping(request_body)
+    probe_vector = [1.0] + [0.0] * (vector_mapping["dimension"] - 1)
+    return {"size": 1, "query": {"knn": {vector_mapping["field"]: {"vector": probe_vector, "k": 1}}}}
+
+
+def wait_for_index_ready(oss_http_client, index_name, request_body, timeout=INDEX_READY_TIMEOUT_SECONDS):
+    """Waits until the index can be read and a kNN query on it returns, without 403 or 404."""
+    knn_query = get_knn_probe_query(request_body)
+
+    def index_is_ready():
         try:
-            response = create_index(oss_http_client, index_name, request_body)
-            logger.info(response)
-            logger.info(
-                "Created index {}, sleeping for 2 minutes for index to get ready".format(index_name)
-            )
-            sleep(120)
-            return response
-        except Exception as e:
-            logger.info("Caught: " + str(e))
-            logger.info("Sleeping for 10 seconds and retrying.")
-            sleep(10)
-            attempts += 1
-            if attempts == 10:
-                raise e
-
-
-def delete_index_if_present(oss_http_client, index_name):
+            oss_http_client.indices.get(index=index_name)
+            oss_http_client.search(index=index_name, body=knn_query)
+        except (AuthorizationException, NotFoundError):
+            return False
+        return True
+
+    return wait_until(index_is_ready, "Index {} ready".format(index_name), timeout, required_successes=2)
+
+
+def create_index_with_retries(oss_http_client, index_name, request_body, timeout=INDEX_CREATE_TIMEOUT_SECONDS):
+    """Creates the index, retrying with backoff until its deadline, then waits for the index to be ready."""
+    responses = []
+
+    def index_is_created():
+        try:
+            responses.append(create_index(oss_http_client, index_name, request_body))
+        except RequestError as error:
+            # A previous attempt that timed out on the client side may have created it
+            if error.error != "resource_already_exists_exception":
+                raise
+            logger.info("Index {} already exists".format(index_name))
+        return True
+
+    wait_until(index_is_created, "Index {} created".format(index_name), timeout)
+    logger.info(responses[-1] if responses else None)
+    wait_for_index_ready(oss_http_client, index_name, request_body)
+    return responses[-1] if responses else None
+
+
+def delete_index_if_present(oss_http_client, index_name, timeout=INDEX_DELETED_TIMEOUT_SECONDS):
     try:
         response = oss_http_client.indices.delete(index=index_name)
         logger.info(response)
-        logger.info("Deleted index {}, sleeping for 1 min".format(index_name))
-        sleep(60)
+        logger.info("Deleted index {}, waiting for the deletion to be visible".format(index_name))
+        wait_until(lambda: not oss_http_client.indices.exists(index=index_name),
+                   "Index {} deleted".format(index_name), timeout)
         return response
     except NotFoundError:
         logger.info("Index {} not found, skipping deletion".format(index_name))
@@ -145,5 +141,65 @@ def delete_index_if_present(oss_http_client, index_name):
         logger.info("Deletion of index {} failed, reason: {}".format(index_name, e))
 
 
+def get_versioned_index_name(alias_name, embedding_model_id, request_body):
+    """
+    Name of the index behind the alias for a given index definition: the same definition always maps to
+    the same index, so a rollback finds the previous index again.
+    """
+    definition = json.dumps({"model": embedding_model_id, "request": request_body}, sort_keys=True)
+    return "{}-{}".format(alias_name, hashlib.sha256(definition.encode("utf-8")).hexdigest()[:8])
+
+
+def get_alias_targets(oss_http_client, alias_name):
+    """Indices the alias currently points to, empty when the alias does not exist."""
+    try:
+        return sorted(oss_http_client.indices.get_alias(name=alias_name).keys())
+    except NotFoundError:
+        return []
+
+
+def is_alias(oss_http_client, name):
+    return bool(oss_http_client.indices.exists_alias(name=name))
+
+
+def swap_alias(oss_http_client, alias_name, index_name):
+    """Points the alias to `index_name` only, removing and adding in one atomic request: queries never miss it."""
+    actions = [
+        {"remove": {"index": target, "alias": alias_name}}
+        for target in get_alias_targets(oss_http_client, alias_name) if target != index_name
+    ]
+    actions.append({"add": {"index": index_name, "alias": alias_name, "is_write_index": True}})
+    response = oss_http_client.indices.update_aliases(body={"actions": actions})
+    logger.info("Alias {} now points to {}".format(alias_name, index_name))
+    return response
+
+
+def get_vector_mapping(request_body):
+    for field_name, field_mapping in request_body["mappings"]["properties"].items():
+        if field_mapping.get("type") == "knn_vector":
+            return {"field": field_name, **field_mapping}
+    raise ValueError("The index request has no knn_vector field")
+
+
+def vectors_are_compatible(old_request_body, new_request_body):
+    """Stored vectors can be copied only when the vector field, its dimension, type and space are unchanged."""
+    old_mapping, new_mapping = get_vector_mapping(old_request_body), get_vector_mapping(new_request_body)
+    return all(old_mapping.get(key) == new_mapping.get(key) for key in ("field", "dimension", "data_type")) and (
+        old_mapping["method"]["space_type"] == new_mapping["method"]["space_type"])
+
+
+def reindex(oss_http_client, source_index, dest_index, timeout=REINDEX_TIMEOUT_SECONDS):
+    """Copies the documents (text, metadata and vectors) of the previous index into the new one."""
+    response = oss_http_client.reindex(
+        body={"source": {"index": source_index}, "dest": {"index": dest_index}},
+        refresh=True,
+        request_timeout=timeout,
+    )
+    logger.info("Reindexed {} into {}: {}".format(source_index, dest_index, response))
+    if response.get("failures"):
+        raise RuntimeError("Reindex of {} into {} failed: {}".format(source_index, dest_index, response["failures"]))
+    return response
+
+
 def get_host_from_collection_endpoint(collection_endpoint):
     return re.sub(r"https?://", "", collection_endpoint)
\ No newline at end of file
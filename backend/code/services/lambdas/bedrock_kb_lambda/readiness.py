@@ -0,0 +1,61 @@
+import os
+import random
+import time
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
+
+# Deadlines of the readiness probes (seconds), together they stay below the 14 minutes of the custom resource Lambda
+POLICY_READY_TIMEOUT_SECONDS = float(os.environ.get("OSS_POLICY_READY_TIMEOUT_SECONDS", "180"))
+INDEX_CREATE_TIMEOUT_SECONDS = float(os.environ.get("OSS_INDEX_CREATE_TIMEOUT_SECONDS", "150"))
+INDEX_READY_TIMEOUT_SECONDS = float(os.environ.get("OSS_INDEX_READY_TIMEOUT_SECONDS", "240"))
+INDEX_DELETED_TIMEOUT_SECONDS = float(os.environ.get("OSS_INDEX_DELETED_TIMEOUT_SECONDS", "120"))
+# Backoff between two probes: doubles from the initial delay up to the maximum, with jitter
+PROBE_INITIAL_DELAY_SECONDS = float(os.environ.get("OSS_PROBE_INITIAL_DELAY_SECONDS", "2"))
+PROBE_MAX_DELAY_SECONDS = float(os.environ.get("OSS_PROBE_MAX_DELAY_SECONDS", "20"))
+
+
+class ReadinessTimeout(TimeoutError):
+    """Raised when a condition is still not met at its deadline, CloudFormation then fails the resource."""
+
+
+def backoff_delays(initial_delay=PROBE_INITIAL_DELAY_SECONDS, max_delay=PROBE_MAX_DELAY_SECONDS):
+    """Exponential delays with equal jitter: each delay is drawn between half and all of the capped backoff."""
+    delay = initial_delay
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(max_delay, delay * 2)
+
+
+def wait_until(probe, description, timeout, required_successes=1, initial_delay=PROBE_INITIAL_DELAY_SECONDS,
+               max_delay=PROBE_MAX_DELAY_SECONDS):
+    """
+    Calls `probe` until it returns True `required_successes` times in a row, sleeping a jittered backoff
+    between two calls. The probe returns False (or raises) while the condition is not met.
+    Returns the number of probes, raises ReadinessTimeout once `timeout` seconds have elapsed.
+    """
+    deadline = time.monotonic() + timeout
+    delays = backoff_delays(initial_delay, max_delay)
+    probes, successes, last_error = 0, 0, None
+    while True:
+        probes += 1
+        try:
+            ready = probe()
+        except Exception as error:
+            ready, last_error = False, error
+        successes = successes + 1 if ready else 0
+        if successes >= required_successes:
+            logger.info("Condition met", extra={"condition": description, "probes": probes})
+            return probes
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ReadinessTimeout(
+                "{} not met after {:.0f} seconds ({} probes), last error: {}".format(
+                    description, timeout, probes, last_error))
+        # A confirmation probe only waits the initial delay, the backoff grows with the failed probes
+        delay = min(initial_delay if ready else next(delays), remaining)
+        logger.info("Condition not met yet", extra={
+            "condition": description, "probes": probes, "successes": successes, "retry_in_seconds": round(delay, 1),
+            "last_error": str(last_error) if last_error else None})
+        time.sleep(delay)
@@ -0,0 +1,81 @@
+"""
+Registry of the boto3 clients shared by the Lambdas: every client is created once per container, with
+a connection pool, timeouts and retries tuned for the service it talks to.
+
+This module is copied in every Lambda image (agent_tools/aws_clients.py, stacks/cr/aws_clients.py) because
+the images are built from different folders, tests/unit/test_aws_clients.py keeps the copies identical.
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+# Environment variables holding the region of a service, AWS_REGION (set by Lambda) is the fallback
+SERVICE_REGION_VARIABLES = {
+    "bedrock-runtime": "BEDROCK_REGION_NAME",
+    "bedrock-agent-runtime": "BEDROCK_REGION_NAME",
+}
+
+DEFAULT_CLIENT_CONFIG = {
+    "connect_timeout": 5,
+    "read_timeout": 60,
+    "max_pool_connections": 10,
+    "retries": {"max_attempts": 5, "mode": "adaptive"},
+}
+
+# Model invocations are long and run from the description threads, the control plane APIs used by the
+# custom resources are throttled at a few requests per second
+SERVICE_CLIENT_CONFIGS = {
+    "bedrock-runtime": {"read_timeout": 300, "max_pool_connections": 16, "retries": {"max_attempts": 8, "mode": "adaptive"}},
+    "bedrock-agent": {"retries": {"max_attempts": 10, "mode": "adaptive"}},
+    "s3": {"max_pool_connections": 16},
+    "opensearchserverless": {"retries": {"max_attempts": 10, "mode": "adaptive"}},
+}
+
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_region(service_name):
+    """Region of a service client, from its configuration variable or from the Lambda region."""
+    variable = SERVICE_REGION_VARIABLES.get(service_name)
+    return (variable and os.environ.get(variable)) or os.environ.get("AWS_REGION") or os.environ.get(
+        "AWS_DEFAULT_REGION")
+
+
+def build_client_config(service_name):
+    """botocore Config of a service: keep-alive connections, pool size, timeouts and adaptive retries."""
+    options = {**DEFAULT_CLIENT_CONFIG, **SERVICE_CLIENT_CONFIGS.get(service_name, {})}
+    return Config(tcp_keepalive=True, **options)
+
+
+def get_session():
+    """boto3 session shared by all the clients, its credentials are refreshed by botocore."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.Session()
+        return _session
+
+
+def get_client(service_name, region_name=None):
+    """Returns the client of `service_name` in `region_name`, creating it on first use only."""
+    region_name = region_name or get_region(service_name)
+    session = get_session()
+    with _lock:
+        client = _clients.get((service_name, region_name))
+        if client is None:
+            # boto3 client creation is not thread safe, the lock also covers it
+            client = session.client(service_name, region_name=region_name, config=build_client_config(service_name))
+            _clients[(service_name, region_name)] = client
+        return client
+
+
+def clear_clients():
+    """Forgets every client and the session, used by the tests."""
+    global _session
+    with _lock:
+        _clients.clear()
+        _session = None
@@ -0,0 +1,163 @@
+import os
+import re
+import time
+
+from agent_tools.pdf_extraction import open_pdf, partition_pages
+from agent_tools.rate_limiter import CHARS_PER_TOKEN
+
+# Tool functions answered by the model reading the PDF itself, sent as a Converse `document` block, instead of
+# the local PyMuPDF extraction. Comma separated: get_document_from_s3, analyse_images_documents
+DOCUMENT_BLOCK_FUNCTIONS = {
+    function.strip() for function in os.environ.get("DOCUMENT_BLOCK_FUNCTIONS", "").split(",") if function.strip()
+}
+# Model of the document block calls, it must support Converse document blocks (the agent model by default)
+DOCUMENT_BLOCK_MODEL_ID = os.environ.get("DOCUMENT_BLOCK_MODEL_ID", "")
+# Converse accepts documents up to 4.5 MB, larger (selections of) documents use the local extraction
+DOCUMENT_BLOCK_MAX_BYTES = int(os.environ.get("DOCUMENT_BLOCK_MAX_BYTES", str(4718592)))
+# Pages sent per call: the answer of a call is bounded by the output tokens of the model, a whole SoW is split
+DOCUMENT_BLOCK_PAGES_PER_CALL = int(os.environ.get("DOCUMENT_BLOCK_PAGES_PER_CALL", "10"))
+DOCUMENT_BLOCK_MAX_TOKENS = int(os.environ.get("DOCUMENT_BLOCK_MAX_TOKENS", "4096"))
+
+# Claude reads a PDF page as its text plus an image of the page
+DOCUMENT_PAGE_TOKEN_ESTIMATE = 2500
+
+TRANSCRIPTION_PROMPT = (
+    "Transcribe the text of this document in reading order. Start the transcription of every page with a line "
+    "'=== Page N ===' where N is the page number in this document (1 for its first page). Keep the headings on "
+    "their own line, write every table row as one line with the cells separated by ' | ' and replace every "
+    "diagram or picture by a short description between [Figure: ...]. Answer only with the transcription."
+)
+# Page marker the transcription prompt asks for, the section index and the compaction work page by page
+PAGE_MARKER = re.compile(r"^[ \t]*=== Page (\d+) ===[ \t]*$", re.MULTILINE)
+IMAGES_PROMPT_SUFFIX = (
+    "Apply these instructions to every diagram and picture of this document, start each description with the "
+    "page number of the image, for example 'Page 3: ...'. Answer 'No images' when the pages have none."
+)
+
+
+class TruncatedAnswerError(Exception):
+    """Raised when the answer about a single page still stops on the output token limit."""
+
+    def __init__(self, s3_key, page_number, max_tokens):
+        super().__init__(f"The document block answer of {s3_key} page {page_number} is above "
+                         f"{max_tokens} output tokens (DOCUMENT_BLOCK_MAX_TOKENS)")
+
+
+def uses_document_block(function):
+    """Whether a tool function is configured to send the PDF to the model as a document block."""
+    return function in DOCUMENT_BLOCK_FUNCTIONS
+
+
+def document_block_prompt(function):
+    if function == "analyse_images_documents":
+        return f"{os.environ['ANALYSE_AWS_DIAGRAM_AGENT_PROMPT'].strip()}\n{IMAGES_PROMPT_SUFFIX}"
+    return TRANSCRIPTION_PROMPT
+
+
+def parse_page_ranges(pages_parameter, page_count):
+    """Page numbers (1 based, sorted) of a selection such as "3-5, 7", pages outside the document are ignored."""
+    if not pages_parameter:
+        return list(range(1, page_count + 1))
+    page_numbers = set()
+    for part in str(pages_parameter).split(","):
+        bounds = [bound.strip() for bound in part.split("-")]
+        if not all(bound.isdigit() for bound in bounds) or len(bounds) > 2:
+            raise ValueError(f"Invalid page selection '{pages_parameter}', expected e.g. '3-5,7'")
+        first, last = int(bounds[0]), int(bounds[-1])
+        page_numbers.update(range(max(first, 1), min(last, page_count) + 1))
+    return sorted(page_numbers)
+
+
+def format_page_ranges(page_numbers):
+    """Inverse of parse_page_ranges: [3, 4, 5, 7] -> "3-5,7"."""
+    ranges = []
+    for page_number in page_numbers:
+        if ranges and page_number == ranges[-1][1] + 1:
+            ranges[-1][1] = page_number
+        else:
+            ranges.append([page_number, page_number])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def split_pdf_pages(pdf_source, pages=None, pages_per_call=DOCUMENT_BLOCK_PAGES_PER_CALL):
+    """
+    Splits the selected pages of a PDF into sub-documents of at most `pages_per_call` pages.
+    Returns [(page numbers, pdf bytes)], one entry per model call.
+    """
+    document = open_pdf(pdf_source)
+    try:
+        page_numbers = parse_page_ranges(pages, document.page_count)
+        if not page_numbers:
+            raise ValueError(f"The page selection '{pages}' is outside of the {document.page_count} pages document")
+        chunks = []
+        for start, stop in partition_pages(len(page_numbers), -(-len(page_numbers) // pages_per_call)):
+            chunk_pages = page_numbers[start:stop]
+            chunk = open_pdf(pdf_source)
+            try:
+                chunk.select([page_number - 1 for page_number in chunk_pages])
+                chunks.append((chunk_pages, chunk.tobytes(garbage=3, deflate=True)))
+            finally:
+                chunk.close()
+        return chunks
+    finally:
+        document.close()
+
+
+def split_transcription(text, page_numbers):
+    """
+    Splits the transcription of a sub-document on its page markers. Returns one text per page of
+    `page_numbers` (the document pages the sub-document holds). Text before the first marker, or a whole
+    answer without markers, goes to the first page.
+    """
+    page_texts = [""] * len(page_numbers)
+    markers = list(PAGE_MARKER.finditer(text))
+    page_texts[0] = text[:markers[0].start()] if markers else text
+    for position, marker in enumerate(markers):
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        index = min(max(int(marker.group(1)), 1), len(page_numbers)) - 1
+        page_texts[index] += text[marker.end():end]
+    return [page_text.strip("\n") for page_text in page_texts]
+
+
+def document_name(s3_key):
+    """Converse document names only allow alphanumerics, single spaces, hyphens, parentheses and brackets."""
+    stem = os.path.splitext(os.path.basename(s3_key))[0]
+    return re.sub(r"\s+", " ", re.sub(r"[^A-Za-z0-9\-()\[\] ]", " ", stem)).strip() or "document"
+
+
+def converse_document(client, model_id, document_bytes, prompt, name, page_count, rate_limiter=None,
+                      max_tokens=DOCUMENT_BLOCK_MAX_TOKENS):
+    """
+    Sends a PDF as a Converse `document` block followed by the prompt, the model reads the layout and the
+    diagrams together. Returns the text of the answer and the metrics of the call.
+    """
+    estimated_tokens = page_count * DOCUMENT_PAGE_TOKEN_ESTIMATE + len(prompt) // CHARS_PER_TOKEN + max_tokens
+    if rate_limiter is not None:
+        rate_limiter.acquire(model_id, estimated_tokens)
+    started_at = time.perf_counter()
+    response = client.converse(
+        modelId=model_id,
+        messages=[{
+            "role": "user",
+            "content": [
+                {"document": {"format": "pdf", "name": name, "source": {"bytes": document_bytes}}},
+                {"text": prompt},
+            ],
+        }],
+        inferenceConfig={"maxTokens": max_tokens},
+    )
+    text = "".join(block.get("text", "") for block in response["output"]["message"]["content"])
+    usage = response.get("usage", {})
+    metrics = {
+        "model_id": model_id,
+        "pages": page_count,
+        "document_bytes": len(document_bytes),
+        "total_latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+        "model_latency_ms": response.get("metrics", {}).get("latencyMs"),
+        "input_tokens": usage.get("inputTokens"),
+        "output_tokens": usage.get("outputTokens"),
+        "stop_reason": response.get("stopReason"),
+    }
+    if rate_limiter is not None and usage:
+        rate_limiter.release(model_id, estimated_tokens - usage.get("inputTokens", 0) - usage.get("outputTokens", 0))
+    return text, metrics
@@ -0,0 +1,172 @@
+import base64
+import io
+
+from agent_tools.image_dedup import content_hash
+from agent_tools.pdf_extraction import extract_page_texts, open_pdf
+from agent_tools.section_index import load_section_patterns
+from agent_tools.vector_diagrams import VECTOR_DIAGRAM_DETECTION, inventory_vector_diagrams
+
+# Bump whenever the digest layout changes, it is part of the extraction cache key
+DIGEST_VERSION = 4
+
+# Vector diagrams are searched in the sections whose name contains this word (section_index headers)
+ARCHITECTURE_SECTION_KEYWORD = "ARCHITECTURE"
+# Images are only described in the sections whose name contains one of these words, every header is still detected
+IMAGE_SECTION_KEYWORDS = (ARCHITECTURE_SECTION_KEYWORD, "MILESTONES")
+
+# A digest is the single, JSON serialisable result of parsing a document once. Every tool reads from it:
+# {
+#     "digest_version": 4,
+#     "format": "pdf" | "docx" | "text" | "binary",
+#     "page_count": 12,
+#     "pages": [{"page": 1, "width": 595.0, "height": 842.0, "text": "..."}],
+#     "sections": [{"name": "SUMMARY OF MILESTONES & DELIVERABLES", "page": 7}],
+#     "images": [{"page": 7, "image_index": 0, "xref": 42, "width": 800, "height": 600, "bytes": 51234,
+#                 "ext": "png", "content_hash": "..."},
+#                {"page": 8, "image_index": 0, "xref": None, "clip": [40.0, 120.0, 560.0, 480.0], ...}]
+# }
+# Image payloads are not part of the digest, they are extracted on demand from the PDF by xref. Vector diagrams
+# (architecture section only) have no xref, their `clip` region of the page is rendered on demand.
+
+
+def detect_sections(pages):
+    """Pages on which each section header appears, with the headers of section_index (SECTION_HEADER_PATTERNS)."""
+    patterns = load_section_patterns()
+    sections = []
+    for page in pages:
+        for section_name, pattern in patterns.items():
+            if pattern.search(page["text"]):
+                sections.append({"name": section_name, "page": page["page"]})
+    return sections
+
+
+def _inventory_images(document):
+    images = []
+    inventoried_xrefs = {}
+    for page_num, page in enumerate(document, start=1):
+        for img_index, img in enumerate(page.get_images(full=True)):
+            xref = img[0]
+            if xref not in inventoried_xrefs:
+                base_image = document.extract_image(xref)
+                image_bytes = base_image["image"]
+                inventoried_xrefs[xref] = {
+                    "xref": xref,
+                    "width": base_image.get("width", img[2]),
+                    "height": base_image.get("height", img[3]),
+                    "bytes": len(image_bytes),
+                    "ext": base_image.get("ext"),
+                    "content_hash": content_hash(image_bytes),
+                }
+            images.append({"page": page_num, "image_index": img_index, **inventoried_xrefs[xref]})
+    return images
+
+
+def build_pdf_digest(pdf_source):
+    """Single extraction pass over a PDF: page texts, section map, image inventory and page dimensions."""
+    page_texts = extract_page_texts(pdf_source)
+    document = open_pdf(pdf_source)
+    try:
+        pages = [
+            {"page": page_num, "width": page.rect.width, "height": page.rect.height, "text": page_texts[page_num - 1]}
+            for page_num, page in enumerate(document, start=1)
+        ]
+        images = _inventory_images(document)
+        sections = detect_sections(pages)
+        if VECTOR_DIAGRAM_DETECTION:
+            # Only the architecture pages are searched, get_drawings and the rendering are too costly for all pages
+            first_image_index = {}
+            for image in images:
+                first_image_index[image["page"]] = image["image_index"] + 1
+            architecture_pages = [page_num for page_num, section in _page_sections(pages, sections)
+                                  if ARCHITECTURE_SECTION_KEYWORD in section.upper()]
+            images += inventory_vector_diagrams(document, architecture_pages, first_image_index)
+            images.sort(key=lambda image: (image["page"], image["image_index"]))
+    finally:
+        document.close()
+
+    return {
+        "digest_version": DIGEST_VERSION,
+        "format": "pdf",
+        "page_count": len(pages),
+        "pages": pages,
+        "sections": sections,
+        "images": images,
+    }
+
+
+def build_text_digest(text, document_format):
+    """Digest of a document without pages, the whole text is a single page."""
+    pages = [{"page": 1, "width": None, "height": None, "text": text}]
+    return {
+        "digest_version": DIGEST_VERSION,
+        "format": document_format,
+        "page_count": 1,
+        "pages": pages,
+        "sections": detect_sections(pages),
+        "images": [],
+    }
+
+
+def build_document_digest(file_data, file_extension):
+    """
+    Builds the digest of a downloaded document according to its extension.
+    `file_data` is either the document bytes or the path of the document streamed to disk.
+    """
+    if file_extension == "pdf":
+        return build_pdf_digest(file_data)
+    if file_extension in ["docx", "doc"]:
+        from docx import Document  # python-docx is only needed for Word documents
+
+        doc = Document(file_data if isinstance(file_data, str) else io.BytesIO(file_data))
+        return build_text_digest("\n".join(paragraph.text for paragraph in doc.paragraphs), "docx")
+    if isinstance(file_data, str):
+        with open(file_data, "rb") as document_file:
+            file_data = document_file.read()
+    try:
+        return build_text_digest(file_data.decode("utf-8"), "text")
+    except UnicodeDecodeError:
+        return build_text_digest(base64.b64encode(file_data).decode("utf-8"), "binary")
+
+
+def digest_text(digest):
+    """Full text of the document, as returned before the digest existed."""
+    return "\n".join(page["text"] for page in digest["pages"])
+
+
+def _page_sections(pages, sections, first_page=3):
+    """
+    (page number, section) of the pages from `first_page` on, every page belongs to the most recent section
+    header (the first pages are skipped, they usually hold the table of contents). Pages before any header
+    are not returned.
+    """
+    section_by_page = {}
+    for section in sections:
+        if section["page"] >= first_page:
+            section_by_page[section["page"]] = section["name"]
+
+    page_sections = []
+    current_section = None
+    for page in pages:
+        if page["page"] < first_page:
+            continue
+        current_section = section_by_page.get(page["page"], current_section)
+        if current_section:
+            page_sections.append((page["page"], current_section))
+    return page_sections
+
+
+def select_section_images(digest, first_page=3, section_keywords=IMAGE_SECTION_KEYWORDS):
+    """
+    Images of the pages that belong to an architecture or milestones section (`section_keywords`), each
+    associated with the section of its page.
+    """
+    images_by_page = {}
+    for image in digest["images"]:
+        images_by_page.setdefault(image["page"], []).append(image)
+
+    return [
+        {**image, "section": section}
+        for page_num, section in _page_sections(digest["pages"], digest["sections"], first_page)
+        if any(keyword in section.upper() for keyword in section_keywords)
+        for image in images_by_page.get(page_num, [])
+    ]
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from agent_tools.tool_logging import logger
+
+# Objects from this size on are streamed to /tmp and opened from disk (memory mapped by MuPDF)
+# instead of being held in memory, the Lambda then keeps a flat memory profile whatever the document size
+DOWNLOAD_TO_DISK_MIN_BYTES = int(os.environ.get("DOWNLOAD_TO_DISK_MIN_BYTES", str(16 * 1024 * 1024)))
+# Hard limit, larger documents are rejected before anything is downloaded (the default /tmp is 512 MB)
+DOWNLOAD_MAX_BYTES = int(os.environ.get("DOWNLOAD_MAX_BYTES", str(256 * 1024 * 1024)))
+DOWNLOAD_TMP_DIR = os.environ.get("DOWNLOAD_TMP_DIR", "/tmp/documents")
+DOWNLOAD_CHUNK_BYTES = int(os.environ.get("DOWNLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Documents kept in /tmp after their digest is built, the image payloads are then read without a new download.
+# Bounded in bytes next to DOWNLOAD_MAX_BYTES so that /tmp keeps room for the download in progress, 0 disables it
+RETAINED_DOCUMENTS_MAX_BYTES = int(os.environ.get("RETAINED_DOCUMENTS_MAX_BYTES", str(128 * 1024 * 1024)))
+
+
+class DocumentTooLargeError(ValueError):
+    """Raised when an S3 object is above DOWNLOAD_MAX_BYTES."""
+
+    def __init__(self, bucket_name, s3_key, size, max_bytes):
+        super().__init__(f"s3://{bucket_name}/{s3_key} is {size} bytes, documents above {max_bytes} bytes "
+                         f"are not processed")
+
+
+def _stream_to_file(body, path, bucket_name, s3_key, max_bytes, chunk_bytes):
+    written = 0
+    with open(path, "wb") as document_file:
+        while True:
+            chunk = body.read(chunk_bytes)
+            if not chunk:
+                break
+            written += len(chunk)
+            # ContentLength is checked upfront, this also covers objects served without it
+            if written > max_bytes:
+                raise DocumentTooLargeError(bucket_name, s3_key, written, max_bytes)
+            document_file.write(chunk)
+    return written
+
+
+@contextmanager
+def fetch_s3_document(s3_client, bucket_name, s3_key, etag=None, to_disk_min_bytes=None, max_bytes=None,
+                      tmp_dir=None, chunk_bytes=None):
+    """
+    Downloads an S3 object and yields it as bytes (small objects) or as the path of a file in /tmp
+    (objects of at least `to_disk_min_bytes`, or of unknown size). The file is removed on exit.
+    Raises DocumentTooLargeError above `max_bytes`.
+    """
+    to_disk_min_bytes = DOWNLOAD_TO_DISK_MIN_BYTES if to_disk_min_bytes is None else to_disk_min_bytes
+    max_bytes = DOWNLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    tmp_dir = tmp_dir or DOWNLOAD_TMP_DIR
+    chunk_bytes = chunk_bytes or DOWNLOAD_CHUNK_BYTES
+
+    get_object_arguments = {"Bucket": bucket_name, "Key": s3_key}
+    if etag:
+        get_object_arguments["IfMatch"] = etag
+    response = s3_client.get_object(**get_object_arguments)
+    content_length = response.get("ContentLength")
+    if content_length is not None and content_length > max_bytes:
+        response["Body"].close()
+        raise DocumentTooLargeError(bucket_name, s3_key, content_length, max_bytes)
+
+    if content_length is not None and content_length < to_disk_min_bytes:
+        yield response["Body"].read()
+        return
+
+    os.makedirs(tmp_dir, exist_ok=True)
+    extension = os.path.splitext(s3_key)[1]
+    file_descriptor, path = tempfile.mkstemp(suffix=extension, dir=tmp_dir)
+    os.close(file_descriptor)
+    try:
+        written = _stream_to_file(response["Body"], path, bucket_name, s3_key, max_bytes, chunk_bytes)
+        logger.info("Document streamed to disk", extra={"s3_key": s3_key, "path": path, "document_bytes": written})
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class RetainedDocuments:
+    """
+    Downloaded documents kept as files in /tmp by object version (bucket, key, etag), so that the tools reading
+    the same version share one download across invocations of the container. The least recently used files are
+    removed beyond `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=None, tmp_dir=None):
+        self.max_bytes = RETAINED_DOCUMENTS_MAX_BYTES if max_bytes is None else max_bytes
+        self.tmp_dir = tmp_dir or os.path.join(DOWNLOAD_TMP_DIR, "retained")
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bucket_name, s3_key, etag):
+        """Path of the retained version, None when it was not retained (or was evicted)."""
+        key = (bucket_name, s3_key, etag)
+        with self._lock:
+            if key not in self._files:
+                return None
+            path, _ = self._files[key]
+            if not os.path.exists(path):
+                del self._files[key]
+                return None
+            self._files.move_to_end(key)
+            return path
+
+    def put(self, bucket_name, s3_key, etag, file_data):
+        """
+        Retains `file_data`: document bytes, or the path of a file yielded by fetch_s3_document which is moved
+        (fetch_s3_document then finds nothing to remove). Returns the retained path, None when not retained.
+        """
+        size = len(file_data) if isinstance(file_data, bytes) else os.path.getsize(file_data)
+        if not etag or size > self.max_bytes:
+            return None
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        key = (bucket_name, s3_key, etag)
+        file_name = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()[:32] + os.path.splitext(s3_key)[1]
+        path = os.path.join(self.tmp_dir, file_name)
+        if isinstance(file_data, bytes):
+            file_descriptor, written_path = tempfile.mkstemp(dir=self.tmp_dir)
+            with os.fdopen(file_descriptor, "wb") as document_file:
+                document_file.write(file_data)
+            os.replace(written_path, path)
+        else:
+            os.replace(file_data, path)
+
+        with self._lock:
+            self._files[key] = (path, size)
+            self._files.move_to_end(key)
+            while sum(file_size for _, file_size in self._files.values()) > self.max_bytes:
+                _, (evicted_path, _) = self._files.popitem(last=False)
+                try:
+                    # A handle opened on it keeps reading the file, only the directory entry goes away
+                    os.remove(evicted_path)
+                except OSError:
+                    pass
+        return path
@@ -0,0 +1,75 @@
+import json
+import os
+import re
+
+from agent_tools.section_index import build_section_index, format_sections, match_sections
+
+# Views declared by the agents in stacks/configuration/agent_config.yaml (`document_view`), set by the stacks:
+# {"view name": {"agent_name": "...", "sections": ["Investment"], "keywords": ["cost", "USD"]}}
+DOCUMENT_VIEWS = json.loads(os.environ.get("DOCUMENT_VIEWS", "{}"))
+# Lines of context kept around every keyword match
+VIEW_KEYWORD_CONTEXT_LINES = int(os.environ.get("VIEW_KEYWORD_CONTEXT_LINES", "2"))
+# Session attribute an invoker can set to choose the view of every call of the session
+VIEW_SESSION_ATTRIBUTE = "document_view"
+# View name that always returns the whole document
+FULL_VIEW = "full"
+
+
+def resolve_view(view_name=None, agent_name=None, session_attributes=None, views=None):
+    """
+    Finds the view of a tool call: the `view` parameter first, then the session attribute, then the view
+    declared by the calling agent. Returns (name, view) or (None, None) when the whole document is wanted.
+    """
+    views = DOCUMENT_VIEWS if views is None else views
+    view_name = view_name or (session_attributes or {}).get(VIEW_SESSION_ATTRIBUTE)
+    if view_name:
+        if view_name == FULL_VIEW or view_name not in views:
+            return None, None
+        return view_name, views[view_name]
+    for name, view in views.items():
+        if agent_name and view.get("agent_name") == agent_name:
+            return name, view
+    return None, None
+
+
+def _keyword_ranges(lines, keywords, context_lines):
+    pattern = re.compile("|".join(rf"\b{re.escape(keyword)}\b" for keyword in keywords), re.IGNORECASE)
+    ranges = []
+    for index, line in enumerate(lines):
+        if pattern.search(line):
+            start, end = max(0, index - context_lines), min(len(lines), index + context_lines + 1)
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+            else:
+                ranges.append((start, end))
+    return ranges
+
+
+def extract_keyword_slices(text, keywords, context_lines=VIEW_KEYWORD_CONTEXT_LINES):
+    """Lines matching one of the keywords (whole words, case insensitive) with their context, in order."""
+    if not keywords:
+        return []
+    lines = text.split("\n")
+    return ["\n".join(lines[start:end]).strip() for start, end in _keyword_ranges(lines, keywords, context_lines)]
+
+
+def apply_view(page_texts, view_name, view, context_lines=VIEW_KEYWORD_CONTEXT_LINES):
+    """
+    Text of a document restricted to a view: the declared sections, then the keyword matches found outside
+    of them. Returns None when nothing matches, the caller then returns the whole document.
+    """
+    full_text = "\n".join(page_texts)
+    sections = match_sections(build_section_index(page_texts), view.get("sections", []))
+    parts = [format_sections(full_text, sections)] if sections else []
+    # Keyword matches already part of a returned section are not repeated
+    remaining_text = full_text
+    for section in sorted(sections, key=lambda section: section["char_start"], reverse=True):
+        remaining_text = remaining_text[:section["char_start"]] + remaining_text[section["char_end"]:]
+    keyword_slices = extract_keyword_slices(remaining_text, view.get("keywords", []), context_lines)
+    if keyword_slices:
+        parts.append(f"=== KEYWORD MATCHES ({', '.join(view['keywords'])}) ===\n" + "\n[...]\n".join(keyword_slices))
+    if not parts:
+        return None
+    header = (f"Document view '{view_name}': only the parts of the document relevant to this agent are returned. "
+              f"Call get_document_from_s3 again with view={FULL_VIEW} to read the whole document.")
+    return "\n\n".join([header] + parts)
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from agent_tools.tool_logging import logger
+
+# Bump whenever the extraction logic changes so that stale entries are never served
+EXTRACTOR_VERSION = "5"
+
+CACHE_MAX_ENTRIES = int(os.environ.get("EXTRACTION_CACHE_MAX_ENTRIES", "16"))
+CACHE_TMP_DIR = os.environ.get("EXTRACTION_CACHE_TMP_DIR", "/tmp/extraction_cache")
+CACHE_TMP_MAX_FILES = int(os.environ.get("EXTRACTION_CACHE_TMP_MAX_FILES", "64"))
+# The sidecar is written next to the source object, keep it disabled on buckets that feed a knowledge base
+CACHE_S3_SIDECAR_ENABLED = os.environ.get("EXTRACTION_CACHE_S3_SIDECAR", "false").lower() == "true"
+# Sidecars are stored under this prefix + the source key, e.g. "extracted_digest/" keeps them out of the upload prefix
+CACHE_SIDECAR_PREFIX = os.environ.get("EXTRACTION_CACHE_SIDECAR_PREFIX", "")
+SIDECAR_SUFFIX = ".extracted.json"
+
+
+def build_cache_key(bucket_name, s3_key, etag, extractor_version=EXTRACTOR_VERSION, variant=""):
+    """
+    Content address of an extraction: the same object version always maps to the same key.
+    `variant` tells apart several payloads derived from the same object (e.g. descriptions per prompt).
+    """
+    raw_key = f"{bucket_name}/{s3_key}/{etag.strip(chr(34))}/{extractor_version}"
+    if variant:
+        raw_key = f"{raw_key}/{variant}"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Three tier cache for extracted documents:
+    1. an in-process LRU, alive for the lifetime of the Lambda container,
+    2. a JSON file per entry in /tmp, which survives warm starts of a recycled handler,
+    3. an optional `.extracted.json` sidecar stored in S3 (next to the source object or under `sidecar_prefix`),
+       shared by all containers and written ahead of time by the pre-extraction Lambda.
+    Entries are keyed by bucket/key/ETag/extractor version so a new upload of the same key is never served stale.
+    """
+
+    def __init__(self, s3_client, max_entries=CACHE_MAX_ENTRIES, tmp_dir=CACHE_TMP_DIR,
+                 tmp_max_files=CACHE_TMP_MAX_FILES, use_s3_sidecar=CACHE_S3_SIDECAR_ENABLED,
+                 sidecar_prefix=CACHE_SIDECAR_PREFIX, sidecar_suffix=SIDECAR_SUFFIX):
+        self.s3_client = s3_client
+        self.max_entries = max_entries
+        self.tmp_dir = tmp_dir
+        self.tmp_max_files = tmp_max_files
+        self.use_s3_sidecar = use_s3_sidecar
+        self.sidecar_prefix = sidecar_prefix
+        self.sidecar_suffix = sidecar_suffix
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "tmp_hits": 0, "s3_hits": 0, "misses": 0}
+
+    def get(self, bucket_name, s3_key, etag, variant=""):
+        """Return the cached payload for this object version or None."""
+        cache_key = build_cache_key(bucket_name, s3_key, etag, variant=variant)
+
+        with self._lock:
+            if cache_key in self._memory:
+                self._memory.move_to_end(cache_key)
+                self._stats["memory_hits"] += 1
+                return self._memory[cache_key]
+
+        payload = self._read_tmp(cache_key)
+        if payload is not None:
+            self._remember(cache_key, payload)
+            self._count("tmp_hits")
+            return payload
+
+        if self.use_s3_sidecar:
+            payload = self._read_sidecar(bucket_name, s3_key, cache_key, variant)
+            if payload is not None:
+                self._remember(cache_key, payload)
+                self._write_tmp(cache_key, payload)
+                self._count("s3_hits")
+                return payload
+
+        self._count("misses")
+        return None
+
+    def put(self, bucket_name, s3_key, etag, payload, variant=""):
+        """Store a JSON serialisable payload in every enabled tier."""
+        cache_key = build_cache_key(bucket_name, s3_key, etag, variant=variant)
+        self._remember(cache_key, payload)
+        self._write_tmp(cache_key, payload)
+        if self.use_s3_sidecar:
+            self._write_sidecar(bucket_name, s3_key, cache_key, payload, variant)
+
+    def get_stats(self):
+        """Return the hit/miss counters and the derived hit ratio."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = sum(stats.values())
+        hits = lookups - stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop the in-process tier and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            for counter in self._stats:
+                self._stats[counter] = 0
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _remember(self, cache_key, payload):
+        with self._lock:
+            self._memory[cache_key] = payload
+            self._memory.move_to_end(cache_key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _tmp_path(self, cache_key):
+        return os.path.join(self.tmp_dir, f"{cache_key}.json")
+
+    def _read_tmp(self, cache_key):
+        path = self._tmp_path(cache_key)
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                payload = json.load(cache_file)
+            os.utime(path)  # keep the LRU order of the /tmp tier
+            return payload
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable extraction cache file {path}: {e}")
+            return None
+
+    def _write_tmp(self, cache_key, payload):
+        try:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            path = self._tmp_path(cache_key)
+            partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+            with open(partial_path, "w", encoding="utf-8") as cache_file:
+                json.dump(payload, cache_file)
+            os.replace(partial_path, path)
+            self._prune_tmp()
+        except OSError as e:
+            logger.warning(f"Unable to write extraction cache file for {cache_key}: {e}")
+
+    def _prune_tmp(self):
+        entries = [os.path.join(self.tmp_dir, name) for name in os.listdir(self.tmp_dir) if name.endswith(".json")]
+        if len(entries) <= self.tmp_max_files:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.tmp_max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def sidecar_key(self, s3_key, variant=""):
+        """S3 key of the sidecar of a source object, each variant gets its own object."""
+        if variant:
+            variant_hash = hashlib.sha256(variant.encode("utf-8")).hexdigest()[:16]
+            return f"{self.sidecar_prefix}{s3_key}.{variant_hash}{self.sidecar_suffix}"
+        return f"{self.sidecar_prefix}{s3_key}{self.sidecar_suffix}"
+
+    def _read_sidecar(self, bucket_name, s3_key, cache_key, variant):
+        try:
+            response = self.s3_client.get_object(Bucket=bucket_name, Key=self.sidecar_key(s3_key, variant))
+            sidecar = json.loads(response["Body"].read())
+        except Exception as e:
+            # A missing sidecar is the normal case on the first read of a document
+            logger.info(f"No usable extraction sidecar for s3://{bucket_name}/{s3_key}: {e}")
+            return None
+        if sidecar.get("cache_key") != cache_key:
+            return None
+        return sidecar.get("payload")
+
+    def _write_sidecar(self, bucket_name, s3_key, cache_key, payload, variant):
+        try:
+            self.s3_client.put_object(
+                Bucket=bucket_name,
+                Key=self.sidecar_key(s3_key, variant),
+                Body=json.dumps({
+                    "cache_key": cache_key,
+                    "extractor_version": EXTRACTOR_VERSION,
+                    "payload": payload,
+                }).encode("utf-8"),
+                ContentType="application/json",
+            )
+        except Exception as e:
+            logger.warning(f"Unable to write extraction sidecar for s3://{bucket_name}/{s3_key}: {e}")
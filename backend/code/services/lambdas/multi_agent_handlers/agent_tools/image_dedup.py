@@ -0,0 +1,107 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from agent_tools.tool_logging import logger
+
+IMAGE_DESCRIPTION_MEMO_PATH = os.environ.get("IMAGE_DESCRIPTION_MEMO_PATH", "/tmp/image_descriptions.sqlite3")
+
+
+def content_hash(image_bytes):
+    """Exact hash of the encoded image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def deduplicate_images(images):
+    """
+    Marks repeated images so that only one copy of each picture is sent to the LLM.
+    Images are matched by PDF xref, then by content hash: only identical images are merged, two diagrams with the
+    same layout but other labels are both described.
+    Returns the list in the same order, duplicates carry a `duplicate_of` reference to the
+    (page, image_index) of the first occurrence and no longer carry the image payload.
+    """
+    first_by_xref = {}
+    first_by_content = {}
+    deduplicated = []
+
+    for image in images:
+        original = None
+        if image.get("xref") is not None:
+            original = first_by_xref.get(image["xref"])
+        if original is None and image.get("content_hash"):
+            original = first_by_content.get(image["content_hash"])
+
+        if original is not None:
+            duplicate = {key: value for key, value in image.items() if key != "image_base64"}
+            duplicate["duplicate_of"] = {"page": original["page"], "image_index": original["image_index"]}
+            deduplicated.append(duplicate)
+            continue
+
+        if image.get("xref") is not None:
+            first_by_xref[image["xref"]] = image
+        if image.get("content_hash"):
+            first_by_content[image["content_hash"]] = image
+        deduplicated.append(image)
+
+    duplicates_count = sum(1 for image in deduplicated if "duplicate_of" in image)
+    logger.info("Image deduplication", extra={"images": len(images), "duplicates_skipped": duplicates_count})
+    return deduplicated
+
+
+class DescriptionMemo:
+    """
+    Persistent memo of image descriptions keyed by image hash, prompt and model id.
+    Backed by SQLite, by default in /tmp so it lives as long as the Lambda container; point
+    IMAGE_DESCRIPTION_MEMO_PATH to a shared file system (e.g. EFS) to share it between containers.
+    """
+
+    def __init__(self, path=IMAGE_DESCRIPTION_MEMO_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS image_descriptions ("
+                "image_hash TEXT NOT NULL, prompt_hash TEXT NOT NULL, model_id TEXT NOT NULL, "
+                "description TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (image_hash, prompt_hash, model_id))"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def prompt_hash(prompt):
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def get(self, image_hash, prompt, model_id):
+        """Return the memoised description or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT description FROM image_descriptions WHERE image_hash = ? AND prompt_hash = ? AND model_id = ?",
+                (image_hash, self.prompt_hash(prompt), model_id),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, image_hash, prompt, model_id, description):
+        """Store a description, replacing any previous one for the same key."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO image_descriptions VALUES (?, ?, ?, ?, ?)",
+                (image_hash, self.prompt_hash(prompt), model_id, description, time.time()),
+            )
+            connection.commit()
@@ -0,0 +1,116 @@
+import base64
+import io
+import os
+
+# Claude vision models downscale anything above ~1568px on the long edge / ~1.15 megapixels anyway
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", "1568"))
+IMAGE_MAX_PIXELS = int(os.environ.get("IMAGE_MAX_PIXELS", "1150000"))
+# Icons, bullets and separators below these thresholds carry no information worth a vision call
+IMAGE_MIN_EDGE = int(os.environ.get("IMAGE_MIN_EDGE", "48"))
+IMAGE_MIN_BYTES = int(os.environ.get("IMAGE_MIN_BYTES", "1024"))
+IMAGE_OUTPUT_FORMAT = os.environ.get("IMAGE_OUTPUT_FORMAT", "JPEG").upper()
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+
+SUPPORTED_MEDIA_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+
+class ImageSkipped(Exception):
+    """Raised when normalisation drops an image on purpose (undecodable or too small), it is not a failure."""
+
+
+def _target_size(width, height, max_edge, max_pixels):
+    scale = min(1.0, max_edge / max(width, height), (max_pixels / float(width * height)) ** 0.5)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def _encode(image, output_format, jpeg_quality):
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if output_format == "JPEG" and has_alpha:
+        # JPEG has no alpha channel, transparent line art stays readable as PNG
+        output_format = "PNG"
+    if output_format == "JPEG":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    buffer = io.BytesIO()
+    save_options = {"quality": jpeg_quality, "optimize": True} if output_format in ("JPEG", "WEBP") else {"optimize": True}
+    image.save(buffer, format=output_format, **save_options)
+    return buffer.getvalue(), output_format
+
+
+def is_below_size_threshold(width, height, byte_count, min_edge=IMAGE_MIN_EDGE, min_bytes=IMAGE_MIN_BYTES):
+    """True for icons, bullets and separators that are not worth a vision call."""
+    return min(width, height) < min_edge or byte_count < min_bytes
+
+
+def normalize_image(image_bytes, max_edge=IMAGE_MAX_EDGE, max_pixels=IMAGE_MAX_PIXELS, min_edge=IMAGE_MIN_EDGE,
+                    min_bytes=IMAGE_MIN_BYTES, output_format=IMAGE_OUTPUT_FORMAT, jpeg_quality=IMAGE_JPEG_QUALITY):
+    """
+    Prepares an extracted image for a Bedrock vision call:
+    detects the real format, drops tiny images, downscales to the edge/pixel budget and re-encodes
+    to a compact format. The original bytes are kept when they are already smaller and supported.
+    Returns a dict with the base64 payload, its media type and the byte counts, `skipped` holds the
+    reason when the image should not be sent at all.
+    """
+    result = {
+        "original_bytes": len(image_bytes),
+        "normalized_bytes": 0,
+        "skipped": None,
+    }
+    from PIL import Image  # Pillow is only needed once a document has images
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+    except Exception as e:
+        result["skipped"] = f"undecodable image: {e}"
+        return result
+
+    source_format = (image.format or "").upper()
+    width, height = image.size
+    result.update({"source_format": source_format, "width": width, "height": height})
+
+    if is_below_size_threshold(width, height, len(image_bytes), min_edge, min_bytes):
+        result["skipped"] = f"below size threshold ({width}x{height}, {len(image_bytes)} bytes)"
+        return result
+
+    target_width, target_height = _target_size(width, height, max_edge, max_pixels)
+    if (target_width, target_height) != (width, height):
+        image = image.resize((target_width, target_height), Image.LANCZOS)
+
+    encoded_bytes, encoded_format = _encode(image, output_format, jpeg_quality)
+    keep_original = (
+            source_format in SUPPORTED_MEDIA_TYPES
+            and (target_width, target_height) == (width, height)
+            and len(image_bytes) <= len(encoded_bytes)
+    )
+    if keep_original:
+        encoded_bytes, encoded_format = image_bytes, source_format
+
+    result.update({
+        "image_base64": base64.b64encode(encoded_bytes).decode("utf-8"),
+        "media_type": SUPPORTED_MEDIA_TYPES[encoded_format],
+        "normalized_bytes": len(encoded_bytes),
+        "width": target_width,
+        "height": target_height,
+    })
+    return result
+
+
+def summarize_normalization(normalized_images):
+    """Aggregated byte counts of a document, used to report the savings of the normalisation."""
+    original_bytes = sum(image["original_bytes"] for image in normalized_images)
+    normalized_bytes = sum(image["normalized_bytes"] for image in normalized_images)
+    return {
+        "images": len(normalized_images),
+        "skipped_images": sum(1 for image in normalized_images if image["skipped"]),
+        "original_bytes": original_bytes,
+        "normalized_bytes": normalized_bytes,
+        "bytes_saved": original_bytes - normalized_bytes,
+    }
@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+
+from agent_tools.tool_logging import logger
+
+# Below this page count the cost of forking the workers is higher than the extraction itself
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "100"))
+# Opt-in: Lambda reports at least 2 CPUs even at its smallest memory sizes, and the forked workers were slower
+# with a higher peak RSS in benchmarks/bench_pdf_extraction.py. Raise it only where that benchmark shows a gain
+PDF_EXTRACTION_WORKERS = int(os.environ.get("PDF_EXTRACTION_WORKERS", "1"))
+
+
+def open_pdf(pdf_source):
+    """Opens a PDF from a file path (memory mapped by MuPDF) or from in-memory bytes."""
+    import fitz  # PyMuPDF, imported on first use to keep it out of the cold start of non PDF reads
+    if isinstance(pdf_source, (str, os.PathLike)):
+        return fitz.open(pdf_source)
+    if hasattr(pdf_source, "getvalue"):
+        pdf_source = pdf_source.getvalue()
+    return fitz.open(stream=pdf_source, filetype="pdf")
+
+
+def partition_pages(page_count, partitions):
+    """Splits [0, page_count) into contiguous, balanced page ranges."""
+    partitions = max(1, min(partitions, page_count))
+    size, remainder = divmod(page_count, partitions)
+    ranges = []
+    start = 0
+    for index in range(partitions):
+        stop = start + size + (1 if index < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _extract_page_range(pdf_source, start, stop, connection):
+    """Worker entry point: every worker opens its own document handle, MuPDF handles are not shareable."""
+    try:
+        document = open_pdf(pdf_source)
+        connection.send(("ok", [document[page_number].get_text() for page_number in range(start, stop)]))
+        document.close()
+    except Exception as e:
+        connection.send(("error", repr(e)))
+    finally:
+        connection.close()
+
+
+def _extract_serial(pdf_source):
+    document = open_pdf(pdf_source)
+    try:
+        return [page.get_text() for page in document]
+    finally:
+        document.close()
+
+
+def _extract_parallel(pdf_source, page_count, workers):
+    # Lambda has no /dev/shm, so multiprocessing.Pool/ProcessPoolExecutor (backed by semaphores and queues)
+    # are not available there. Plain processes talking through pipes work in Lambda and locally.
+    context = multiprocessing.get_context("fork")
+    jobs = []
+    for start, stop in partition_pages(page_count, workers):
+        parent_connection, child_connection = context.Pipe(duplex=False)
+        process = context.Process(target=_extract_page_range, args=(pdf_source, start, stop, child_connection))
+        process.start()
+        child_connection.close()
+        jobs.append((process, parent_connection))
+
+    page_texts = []
+    errors = []
+    for process, parent_connection in jobs:
+        try:
+            status, result = parent_connection.recv()
+        except EOFError:
+            status, result = "error", "worker exited without result"
+        if status == "ok":
+            page_texts.extend(result)
+        else:
+            errors.append(result)
+        parent_connection.close()
+        process.join()
+
+    if errors:
+        raise RuntimeError(f"Parallel PDF extraction failed: {errors}")
+    return page_texts
+
+
+def extract_page_texts(pdf_source, workers=PDF_EXTRACTION_WORKERS, min_pages=PDF_PARALLEL_MIN_PAGES):
+    """
+    Returns the text of every page, in page order.
+    Documents with at least `min_pages` pages are split in contiguous page ranges extracted by `workers`
+    processes, smaller documents (or a single worker) use the serial path.
+    """
+    document = open_pdf(pdf_source)
+    page_count = document.page_count
+    document.close()
+
+    if workers <= 1 or page_count < min_pages:
+        return _extract_serial(pdf_source)
+
+    try:
+        return _extract_parallel(pdf_source, page_count, workers)
+    except Exception as e:
+        logger.warning(f"Falling back to serial PDF extraction: {e}")
+        return _extract_serial(pdf_source)
@@ -0,0 +1,40 @@
+import os
+from urllib.parse import unquote_plus
+
+from agent_tools.tool_logging import logger
+from agent_tools.tools_utils import describe_document_images, get_document_digest
+
+# Also describes the images of every uploaded PDF, this costs vision calls even if the agent never asks for them
+PRE_EXTRACTION_DESCRIBE_IMAGES = os.environ.get("PRE_EXTRACTION_DESCRIBE_IMAGES", "false").lower() == "true"
+
+
+def pre_extract_document(bucket_name, s3_key, describe_images=PRE_EXTRACTION_DESCRIBE_IMAGES):
+    """
+    Builds the digest of an uploaded document (and optionally its image descriptions) so that the first
+    agent call reads them from the extraction cache instead of parsing the document while the agent waits.
+    """
+    digest = get_document_digest(bucket_name, s3_key)
+    result = {"s3_key": s3_key, "format": digest["format"], "pages": digest["page_count"],
+              "images": len(digest["images"])}
+    if describe_images and digest["format"] == "pdf":
+        result["described_images"] = len(describe_document_images(f"s3://{bucket_name}/{s3_key}"))
+    return result
+
+
+def lambda_handler(event, context):
+    """S3 ObjectCreated handler of the SoW upload prefix."""
+    logger.append_keys(request_id=getattr(context, "aws_request_id", None))
+    results = []
+    for record in event.get("Records", []):
+        bucket_name = record["s3"]["bucket"]["name"]
+        # Object keys are url encoded in S3 event notifications
+        s3_key = unquote_plus(record["s3"]["object"]["key"])
+        try:
+            result = pre_extract_document(bucket_name, s3_key)
+            logger.info("Document pre-extracted", extra=result)
+        except Exception as e:
+            # Not fatal, the tool functions extract the document on demand
+            logger.exception(f"Pre-extraction failed for s3://{bucket_name}/{s3_key}")
+            result = {"s3_key": s3_key, "error": str(e)}
+        results.append(result)
+    return {"documents": results}
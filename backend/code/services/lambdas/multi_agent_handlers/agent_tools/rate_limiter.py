@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Budgets of the account quotas (Service Quotas > Amazon Bedrock), per model id. 0 disables a dimension.
+BEDROCK_REQUESTS_PER_MINUTE = int(os.environ.get("BEDROCK_REQUESTS_PER_MINUTE", "0"))
+BEDROCK_TOKENS_PER_MINUTE = int(os.environ.get("BEDROCK_TOKENS_PER_MINUTE", "0"))
+# "memory" keeps the buckets in the process, "sqlite" shares them between the processes using the same file
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.environ.get("RATE_LIMIT_SQLITE_PATH", "/tmp/bedrock_rate_limit.sqlite3")
+# A call that would have to wait longer than this fails instead of consuming the Lambda timeout
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", "60"))
+
+# Claude bills an image ~width*height/750 tokens, the normalised images stay below ~1.15 megapixels
+IMAGE_TOKEN_ESTIMATE = 1600
+CHARS_PER_TOKEN = 4
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would wait more than the configured maximum for its budget."""
+
+
+def estimate_request_tokens(request_body):
+    """
+    Tokens a Bedrock Anthropic request counts against the tokens per minute quota: the prompt text,
+    the images and the `max_tokens` reserved for the answer.
+    """
+    tokens = request_body.get("max_tokens", 0)
+    text_chars = len(request_body.get("system", ""))
+    for message in request_body.get("messages", []):
+        content = message.get("content", [])
+        if isinstance(content, str):
+            text_chars += len(content)
+            continue
+        for block in content:
+            if block.get("type") == "image":
+                tokens += IMAGE_TOKEN_ESTIMATE
+            else:
+                text_chars += len(block.get("text", ""))
+    return tokens + text_chars // CHARS_PER_TOKEN
+
+
+def _refill(level, updated_at, capacity, now):
+    if level is None:
+        return float(capacity)
+    return min(float(capacity), level + (now - updated_at) * capacity / 60.0)
+
+
+def _apply(levels, costs, now, force):
+    """
+    Shared token bucket arithmetic of the backends. `levels` maps a dimension to its stored (level, updated_at),
+    `costs` maps it to (amount, capacity). Returns the refilled/consumed levels and the wait in seconds,
+    nothing is consumed when the wait is above 0.
+    """
+    refilled = {
+        dimension: _refill(*levels.get(dimension, (None, None)), capacity, now)
+        for dimension, (amount, capacity) in costs.items()
+    }
+    wait = 0.0
+    if not force:
+        for dimension, (amount, capacity) in costs.items():
+            if amount > refilled[dimension]:
+                wait = max(wait, (amount - refilled[dimension]) * 60.0 / capacity)
+    if wait == 0.0:
+        for dimension, (amount, capacity) in costs.items():
+            refilled[dimension] = min(float(capacity), refilled[dimension] - amount)
+    return refilled, wait
+
+
+class InMemoryRateLimitBackend:
+    """Token buckets of a single process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, costs, now, force=False):
+        """Consumes `costs` from the buckets of `key`, returns 0 or the seconds to wait before retrying."""
+        with self._lock:
+            buckets = self._buckets.setdefault(key, {})
+            levels, wait = _apply(buckets, costs, now, force)
+            # Only the dimensions of `costs` change, a release must not reset the requests bucket
+            buckets.update({dimension: (level, now) for dimension, level in levels.items()})
+            return wait
+
+
+class SqliteRateLimitBackend:
+    """
+    Token buckets shared through a SQLite file, every take is a single IMMEDIATE transaction so concurrent
+    processes never consume the same budget. A local stand-in for a shared store (e.g. a DynamoDB table
+    with conditional writes) when many Lambda containers run at once.
+    """
+
+    def __init__(self, path=RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "bucket_key TEXT NOT NULL, dimension TEXT NOT NULL, level REAL NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (bucket_key, dimension))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def take(self, key, costs, now, force=False):
+        """Consumes `costs` from the buckets of `key`, returns 0 or the seconds to wait before retrying."""
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                "SELECT dimension, level, updated_at FROM rate_limit_buckets WHERE bucket_key = ?", (key,)
+            ).fetchall()
+            levels, wait = _apply({row[0]: (row[1], row[2]) for row in rows}, costs, now, force)
+            connection.executemany(
+                "INSERT OR REPLACE INTO rate_limit_buckets VALUES (?, ?, ?, ?)",
+                [(key, dimension, level, now) for dimension, level in levels.items()],
+            )
+            connection.execute("COMMIT")
+            return wait
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+
+class BedrockRateLimiter:
+    """
+    Client side token bucket limiter of the Bedrock model calls, keyed by model id, with a requests per
+    minute and a tokens per minute budget. Calls wait for their budget instead of being throttled.
+    """
+
+    def __init__(self, backend=None, requests_per_minute=BEDROCK_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=BEDROCK_TOKENS_PER_MINUTE, max_wait_seconds=RATE_LIMIT_MAX_WAIT_SECONDS,
+                 clock=time.time, sleep=time.sleep):
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait_seconds = max_wait_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.waited_seconds = 0.0
+
+    def _costs(self, requests, tokens):
+        costs = {}
+        if self.requests_per_minute > 0:
+            costs["requests"] = (requests, self.requests_per_minute)
+        if self.tokens_per_minute > 0:
+            # A request larger than the whole budget would never be granted, it takes the full bucket instead
+            costs["tokens"] = (min(tokens, self.tokens_per_minute), self.tokens_per_minute)
+        return costs
+
+    def acquire(self, model_id, tokens):
+        """Blocks until the model has budget for one request of `tokens` tokens."""
+        costs = self._costs(1, tokens)
+        if not costs:
+            return
+        waited = 0.0
+        while True:
+            wait = self.backend.take(model_id, costs, self.clock())
+            if wait == 0.0:
+                return
+            if waited + wait > self.max_wait_seconds:
+                raise RateLimitExceeded(
+                    f"No Bedrock budget for {model_id} within {self.max_wait_seconds}s "
+                    f"({self.requests_per_minute} requests/min, {self.tokens_per_minute} tokens/min)")
+            self.sleep(wait)
+            waited += wait
+            self.waited_seconds += wait
+
+    def release(self, model_id, unused_tokens):
+        """Gives back the estimated tokens a call did not use, once its real usage is known."""
+        if self.tokens_per_minute > 0 and unused_tokens > 0:
+            self.backend.take(model_id, {"tokens": (-unused_tokens, self.tokens_per_minute)}, self.clock(),
+                              force=True)
+
+
+def build_rate_limiter():
+    """Rate limiter configured from the environment."""
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return BedrockRateLimiter(SqliteRateLimitBackend())
+    return BedrockRateLimiter(InMemoryRateLimitBackend())
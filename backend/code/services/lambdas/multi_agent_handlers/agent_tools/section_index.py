@@ -0,0 +1,122 @@
+import json
+import os
+import re
+
+# Section headers of the SoW template (see stacks/prompts/StructuralComplianceAgent.xml).
+# Override with SECTION_HEADER_PATTERNS, a JSON object {"SECTION NAME": "regex"}.
+DEFAULT_SECTION_HEADERS = {
+    "PROJECT OVERVIEW": r"PROJECT\s+OVERVIEW",
+    "EXECUTIVE SUMMARY": r"EXECUTIVE\s+SUMMARY",
+    "STAKEHOLDERS & TEAM": r"STAKEHOLDERS\s*(?:&|AND)\s*TEAM",
+    "SUCCESS CRITERIA": r"SUCCESS\s+CRITERIA",
+    "ASSUMPTIONS": r"ASSUMPTIONS",
+    "OUT OF SCOPE": r"OUT\s+OF\s+SCOPE",
+    "SCOPE OF WORK - TECHNICAL PROJECT PLAN": r"SCOPE\s+OF\s+WORK(?:\s*[-–:]\s*TECHNICAL\s+PROJECT\s+PLAN)?",
+    "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM": r"SOLUTION\s+ARCHITECTURE(?:\s*/\s*ARCHITECTURAL\s+DIAGRAM)?",
+    "SUMMARY OF MILESTONES & DELIVERABLES": r"(?:SUMMARY\s+OF\s+)?MILESTONES\s*(?:&|AND)\s*DELIVERABLES",
+    "EXPECTED COST BREAKDOWN": r"(?:EXPECTED\s+)?COST\s+BREAKDOWN",
+    "INVESTMENT": r"INVESTMENT",
+}
+
+# A header is a line of its own, optionally numbered ("3.", "3.1", "III."), never a table of contents
+# entry which ends with dot leaders and a page number.
+HEADER_LINE_TEMPLATE = r"^[ \t]*(?:(?:\d+(?:\.\d+)*|[IVX]+)\.?[ \t]+)?(?:{pattern})[ \t]*:?[ \t]*$"
+
+
+def load_section_headers():
+    """Header regexes by section name, from SECTION_HEADER_PATTERNS when set, from the SoW template otherwise."""
+    if os.environ.get("SECTION_HEADER_PATTERNS"):
+        return json.loads(os.environ["SECTION_HEADER_PATTERNS"])
+    return DEFAULT_SECTION_HEADERS
+
+
+def load_section_patterns():
+    """Compiled header patterns, each one only matching a header line (see HEADER_LINE_TEMPLATE)."""
+    return {
+        name: re.compile(HEADER_LINE_TEMPLATE.format(pattern=pattern), re.IGNORECASE | re.MULTILINE)
+        for name, pattern in load_section_headers().items()
+    }
+
+
+def build_section_index(page_texts, patterns=None, page_separator="\n"):
+    """
+    Locates every section of the document from its header.
+    Offsets refer to the text obtained by joining `page_texts` with `page_separator`, a section runs from
+    its header to the next detected header. Returns a list ordered by position:
+    [{"name": ..., "page_start": 3, "page_end": 5, "char_start": 1200, "char_end": 5400}]
+    """
+    patterns = patterns or load_section_patterns()
+    page_offsets = []
+    offset = 0
+    for page_text in page_texts:
+        page_offsets.append(offset)
+        offset += len(page_text) + len(page_separator)
+    full_text = page_separator.join(page_texts)
+
+    def page_of(char_offset):
+        page_number = 1
+        for index, page_offset in enumerate(page_offsets):
+            if page_offset > char_offset:
+                break
+            page_number = index + 1
+        return page_number
+
+    starts = []
+    for name, pattern in patterns.items():
+        match = pattern.search(full_text)
+        if match:
+            starts.append((match.start(), name))
+    starts.sort()
+
+    index = []
+    for position, (char_start, name) in enumerate(starts):
+        char_end = starts[position + 1][0] if position + 1 < len(starts) else len(full_text)
+        index.append({
+            "name": name,
+            "page_start": page_of(char_start),
+            "page_end": page_of(max(char_start, char_end - 1)),
+            "char_start": char_start,
+            "char_end": char_end,
+        })
+    return index
+
+
+def parse_requested_sections(sections_parameter):
+    """Accepts a comma separated string or a JSON array of section names."""
+    if not sections_parameter:
+        return []
+    if isinstance(sections_parameter, list):
+        return [str(section).strip() for section in sections_parameter if str(section).strip()]
+    sections_parameter = sections_parameter.strip()
+    if sections_parameter.startswith("["):
+        try:
+            return [str(section).strip() for section in json.loads(sections_parameter) if str(section).strip()]
+        except ValueError:
+            sections_parameter = sections_parameter.strip("[]")
+    return [section.strip().strip("\"'") for section in sections_parameter.split(",") if section.strip()]
+
+
+def match_sections(section_index, requested_sections):
+    """Sections whose name contains one of the requested names (case insensitive), in document order."""
+    requested = [section.upper() for section in requested_sections]
+    return [section for section in section_index if any(name in section["name"].upper() for name in requested)]
+
+
+def extract_sections(full_text, section_index, requested_sections):
+    """
+    Text of the requested sections only, each one prefixed by its name and page range.
+    Returns None when no section matches so that the caller can tell the agent which sections exist.
+    """
+    matching_sections = match_sections(section_index, requested_sections)
+    if not matching_sections:
+        return None
+    return format_sections(full_text, matching_sections)
+
+
+def format_sections(full_text, sections):
+    """Text of the given sections, each one prefixed by its name and page range."""
+    return "\n\n".join(
+        f"=== {section['name']} (pages {section['page_start']}-{section['page_end']}) ===\n"
+        f"{full_text[section['char_start']:section['char_end']].strip()}"
+        for section in sections
+    )
@@ -1,17 +1,21 @@
 from agent_tools.tools_utils import (
+    DOCUMENT_PAGE_MAX_CHARS,
     read_s3_url,
-    download_document_from_s3,
-    extract_images_from_pdf_sections,
-    llm_describe_image
+    describe_document_images,
+    paginate_text
 )
+from agent_tools.document_views import resolve_view
+from agent_tools.tool_logging import logger, payload_size, should_sample_payload, summarize_event
 import json
 
 
-
-
 def lambda_handler(event, context):
     """AWS Lambda handler function."""
-    print(event)
+    logger.append_keys(request_id=getattr(context, "aws_request_id", None))
+    log_payloads = should_sample_payload()
+    logger.info("Tool invocation", extra=summarize_event(event))
+    if log_payloads:
+        logger.info("Sampled tool event", extra={"event": event})
     agent = event.get('agent')
     actionGroup = event.get('actionGroup')
     function = event.get('function')
@@ -24,22 +28,45 @@ def lambda_handler(event, context):
 
     if function == 'get_document_from_s3':
         s3_uri_path = None
+        sections = None
+        cursor = None
+        max_chars = None
+        view_parameter = None
         for param in parameters:
             if param["name"] == "s3_uri_path":
                 s3_uri_path = param["value"]
+            if param["name"] == "sections":
+                sections = param["value"]
+            if param["name"] == "cursor":
+                cursor = param["value"]
+            if param["name"] == "max_chars":
+                max_chars = param["value"]
+            if param["name"] == "view":
+                view_parameter = param["value"]
 
         if not s3_uri_path:
             raise Exception("Missing mandatory parameter: s3_uri_path")
 
         try:
-            document_content = read_s3_url(s3_uri_path)
+            # Each collaborator only receives the parts of the document declared in its agent configuration
+            view_name, view = resolve_view(view_parameter, (agent or {}).get("name"), event.get("sessionAttributes"))
+            document_content = read_s3_url(s3_uri_path, sections=sections, view_name=view_name, view=view)
+            if isinstance(document_content, str) and (
+                    cursor or max_chars or len(document_content) > DOCUMENT_PAGE_MAX_CHARS):
+                # Large documents are served in slices, the agent follows next_cursor to read the rest
+                document_page = paginate_text(document_content, cursor=cursor, max_chars=max_chars)
+                if document_page["next_cursor"]:
+                    document_page["instructions"] = (
+                        f"The document is truncated, call get_document_from_s3 again with "
+                        f"cursor={document_page['next_cursor']} to read the next part.")
+                document_content = json.dumps(document_page, ensure_ascii=False)
             response_body = {
                 'TEXT': {
                     "body": document_content
                 }
             }
         except Exception as e:
-            print(f"Error processing file: {str(e)}")
+            logger.exception("Error processing file")
             response_body = {
                 'TEXT': {
                     "body": f"An error occurred while processing the file: {str(e)}"
@@ -48,20 +75,18 @@ def lambda_handler(event, context):
 
     if function == 'analyse_images_documents':
         s3_uri_path = None
+        pages = None
         for param in parameters:
             if param["name"] == "s3_uri_path":
                 s3_uri_path = param["value"]
+            if param["name"] == "pages":
+                pages = param["value"]
 
         if not s3_uri_path:
             raise Exception("Missing mandatory parameter: s3_uri_path")
 
         try:
-            doc_stream = download_document_from_s3(s3_uri_path)
-            images_details = extract_images_from_pdf_sections(doc_stream)
-            # create new dict with the details from image_details page, image_index and image describe that is the call of function on image_base64
-            images_described = [{"page": image["page"],
-                                 "image_index": image["image_index"],
-                                 "image_described": llm_describe_image(image["image_base64"])} for image in images_details]
+            images_described = describe_document_images(s3_uri_path, pages=pages)
 
             response_body = {
                 'TEXT': {
@@ -69,7 +94,7 @@ def lambda_handler(event, context):
                 }
             }
         except Exception as e:
-            print(f"Error processing file: {str(e)}")
+            logger.exception("Error processing file")
             response_body = {
                 'TEXT': {
                     "body": f"An error occurred while processing the file: {str(e)}"
@@ -84,6 +109,11 @@ def lambda_handler(event, context):
     }
 
     function_response = {'response': action_response, 'messageVersion': event['messageVersion']}
-    print("Response:", json.dumps(function_response, indent=2))
+    response_text = response_body["TEXT"]["body"]
+    logger.info("Tool response", extra={"function": function,
+                                        "response_chars": len(response_text),
+                                        "response_bytes": payload_size(function_response)})
+    if log_payloads:
+        logger.info("Sampled tool response", extra={"response": function_response})
     return function_response
 
@@ -0,0 +1,164 @@
+import json
+import math
+import os
+import re
+from collections import defaultdict
+
+from agent_tools.rate_limiter import CHARS_PER_TOKEN
+
+# Compacts the document text returned to the agents, every collaborator pays it as input tokens
+TEXT_COMPACTION_ENABLED = os.environ.get("TEXT_COMPACTION", "true").lower() == "true"
+# A line found on at least this share of the pages (and on REPEATED_LINE_MIN_PAGES pages) is a running
+# header or footer, only its first occurrence is kept
+REPEATED_LINE_MIN_PAGE_RATIO = float(os.environ.get("TEXT_COMPACTION_REPEATED_LINE_RATIO", "0.5"))
+REPEATED_LINE_MIN_PAGES = int(os.environ.get("TEXT_COMPACTION_REPEATED_LINE_MIN_PAGES", "3"))
+# Headers, footers and page numbers are only looked for in the first/last lines of a page, lines repeated
+# in the body (table cells, list items) are content. Page numbers are removed only when they follow the page
+# index across pages ("Page # of #"), a bare number that does not may be a table cell
+EDGE_LINES = int(os.environ.get("TEXT_COMPACTION_EDGE_LINES", "4"))
+# Joins runs of short lines (tables extracted one cell per line) into " | " separated lines. Off by default,
+# short bullet lists look the same
+COLLAPSE_TABLES = os.environ.get("TEXT_COMPACTION_COLLAPSE_TABLES", "false").lower() == "true"
+TABLE_CELL_MAX_CHARS = 40
+TABLE_MIN_CELLS = 6
+
+# Lines removed wherever they appear, override with TEXT_BOILERPLATE_PATTERNS (JSON list of regexes)
+DEFAULT_BOILERPLATE_PATTERNS = [
+    r"(?:copyright|©|\(c\)).{0,120}all rights reserved\.?",
+    r"(?:strictly\s+)?(?:private\s+(?:and|&)\s+)?confidential(?:\s+(?:and|&)\s+proprietary)?\.?",
+]
+# "3", "- 3 -", "Page 3", "3 / 12", "page 3 of 12", years such as 2024 are not page numbers
+PAGE_NUMBER_PATTERN = re.compile(r"[-–\s]*(?:page\s*)?\d{1,3}(?:\s*(?:/|of)\s*\d{1,3})?[-–\s]*", re.IGNORECASE)
+EMBEDDED_PAGE_NUMBER = re.compile(r"page\s*\d{1,3}(?:\s*(?:/|of)\s*\d{1,3})?")
+TRAILING_PAGE_NUMBER = re.compile(r"\s*[|–-]\s*\d{1,3}$")
+PRINTED_NUMBER = re.compile(r"\d{1,3}")
+
+SOFT_HYPHEN = "\u00ad"
+INLINE_WHITESPACE = re.compile(r"[^\S\n]+")
+DOT_LEADER = re.compile(r"\s*(?:\.\s?){4,}\s*")
+HYPHENATED_LINE_BREAK = re.compile(r"(?<=[^\W\d_])-\n(?=[a-z])")
+BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def load_boilerplate_patterns():
+    """Compiled boilerplate patterns, a line is removed when it matches one of them entirely."""
+    patterns = DEFAULT_BOILERPLATE_PATTERNS
+    if os.environ.get("TEXT_BOILERPLATE_PATTERNS"):
+        patterns = json.loads(os.environ["TEXT_BOILERPLATE_PATTERNS"])
+    return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+
+def estimate_tokens(text):
+    """Same estimate as the rate limiter, good enough to compare a text before and after compaction."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _normalize_line(line):
+    line = INLINE_WHITESPACE.sub(" ", line.replace(SOFT_HYPHEN, ""))
+    return DOT_LEADER.sub(" ... ", line).strip()
+
+
+def _page_offset(match, page_number):
+    """The first number of a page number match replaced by its offset to the page index ("3" on page 3: "#+0")."""
+    text = match.group(0)
+    number = PRINTED_NUMBER.search(text)
+    return "{}#{:+d}{}".format(text[:number.start()], int(number.group(0)) - page_number, text[number.end():])
+
+
+def _line_signature(line, page_number):
+    """
+    Page numbers embedded in running headers ("Acme SoW - page 3", "Acme SoW | 3") change from page to page.
+    They are replaced by their offset to the page index, so a number only repeats across pages when it follows
+    the page index: table values ending the pages (15, 25, 35...) keep distinct signatures.
+    """
+    line = line.lower()
+    match = PAGE_NUMBER_PATTERN.fullmatch(line)
+    if match:
+        return _page_offset(match, page_number)
+    line = EMBEDDED_PAGE_NUMBER.sub(lambda embedded: _page_offset(embedded, page_number), line)
+    return TRAILING_PAGE_NUMBER.sub(lambda trailing: _page_offset(trailing, page_number), line)
+
+
+def _edge_indexes(lines, edge_lines):
+    content_indexes = [index for index, line in enumerate(lines) if line]
+    return set(content_indexes[:edge_lines] + content_indexes[-edge_lines:]) if edge_lines else set()
+
+
+def find_repeated_lines(pages_lines, min_page_ratio=REPEATED_LINE_MIN_PAGE_RATIO,
+                        min_pages=REPEATED_LINE_MIN_PAGES, edge_lines=EDGE_LINES):
+    """Signatures of the edge lines found on enough pages to be running headers or footers."""
+    pages_by_signature = defaultdict(set)
+    for page_number, lines in enumerate(pages_lines, start=1):
+        for index in _edge_indexes(lines, edge_lines):
+            pages_by_signature[_line_signature(lines[index], page_number)].add(page_number)
+    threshold = max(min_pages, math.ceil(min_page_ratio * len(pages_lines)))
+    return {signature for signature, pages in pages_by_signature.items() if len(pages) >= threshold}
+
+
+def collapse_table_lines(lines, cell_max_chars=TABLE_CELL_MAX_CHARS, min_cells=TABLE_MIN_CELLS):
+    """Joins every run of at least `min_cells` short lines into a single " | " separated line."""
+    collapsed = []
+    run = []
+    for line in lines + [""]:
+        if line and len(line) <= cell_max_chars:
+            run.append(line)
+            continue
+        if len(run) >= min_cells:
+            collapsed.append(" | ".join(run))
+        else:
+            collapsed.extend(run)
+        run = []
+        collapsed.append(line)
+    return collapsed[:-1]
+
+
+def compact_pages(page_texts, collapse_tables=COLLAPSE_TABLES, boilerplate_patterns=None, edge_lines=EDGE_LINES):
+    """
+    Deterministic compaction of the page texts of a document: running headers/footers, page numbers and
+    boilerplate lines are removed, whitespace, dot leaders and hyphenated line breaks are normalised.
+    Returns the compacted page texts (one per page, so page offsets stay valid) and a report of the
+    characters and estimated tokens saved.
+    """
+    boilerplate_patterns = load_boilerplate_patterns() if boilerplate_patterns is None else boilerplate_patterns
+    pages_lines = [[_normalize_line(line) for line in text.split("\n")] for text in page_texts]
+    repeated_signatures = find_repeated_lines(pages_lines, edge_lines=edge_lines)
+
+    removed = {"repeated_lines": 0, "page_numbers": 0, "boilerplate_lines": 0}
+    kept_signatures = set()
+    compacted_pages = []
+    for page_number, lines in enumerate(pages_lines, start=1):
+        edge_indexes = _edge_indexes(lines, edge_lines)
+        kept_lines = []
+        for index, line in enumerate(lines):
+            signature = _line_signature(line, page_number)
+            if index in edge_indexes and signature in repeated_signatures:
+                # Page numbers carry no content, even their first occurrence is removed
+                if PAGE_NUMBER_PATTERN.fullmatch(line):
+                    removed["page_numbers"] += 1
+                    continue
+                if signature in kept_signatures:
+                    removed["repeated_lines"] += 1
+                    continue
+                kept_signatures.add(signature)
+            if line and any(pattern.fullmatch(line) for pattern in boilerplate_patterns):
+                removed["boilerplate_lines"] += 1
+                continue
+            kept_lines.append(line)
+        if collapse_tables:
+            kept_lines = collapse_table_lines(kept_lines)
+        text = HYPHENATED_LINE_BREAK.sub("", "\n".join(kept_lines))
+        compacted_pages.append(BLANK_LINES.sub("\n\n", text).strip("\n"))
+
+    original_text = "\n".join(page_texts)
+    compacted_text = "\n".join(compacted_pages)
+    tokens_before = estimate_tokens(original_text)
+    tokens_after = estimate_tokens(compacted_text)
+    report = {
+        "chars_before": len(original_text),
+        "chars_after": len(compacted_text),
+        "estimated_tokens_before": tokens_before,
+        "estimated_tokens_after": tokens_after,
+        "token_reduction_pct": round(100 * (tokens_before - tokens_after) / tokens_before, 1) if tokens_before else 0.0,
+        **removed,
+    }
+    return compacted_pages, report
@@ -0,0 +1,51 @@
+import json
+import os
+import random
+
+from aws_lambda_powertools import Logger
+
+# Longest string logged as is, longer values are cut and suffixed with their real length
+LOG_FIELD_MAX_CHARS = int(os.environ.get("LOG_FIELD_MAX_CHARS", "256"))
+# Share of the invocations that also log their full event and response (0 disables the payload logs)
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+
+logger = Logger(service="agent_tools", level=os.environ.get("LOG_LEVEL", "INFO"))
+
+
+def truncate_value(value, max_chars=LOG_FIELD_MAX_CHARS):
+    """Copy of a JSON like value where every string is cut to `max_chars` characters."""
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        return f"{value[:max_chars]}... [{len(value)} chars]"
+    if isinstance(value, dict):
+        return {key: truncate_value(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [truncate_value(item, max_chars) for item in value]
+    return value
+
+
+def payload_size(value):
+    """Size in bytes of the JSON serialisation of a payload, logged instead of the payload itself."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+def summarize_event(event):
+    """Fields of an agent action group event worth logging on every invocation."""
+    return {
+        "agent": (event.get("agent") or {}).get("name"),
+        "action_group": event.get("actionGroup"),
+        "function": event.get("function"),
+        "parameters": {
+            parameter.get("name"): truncate_value(parameter.get("value"))
+            for parameter in event.get("parameters", [])
+        },
+        "event_bytes": payload_size(event),
+    }
+
+
+def should_sample_payload(sample_rate=LOG_PAYLOAD_SAMPLE_RATE):
+    """Decides, once per invocation, whether the full payloads of the invocation are logged."""
+    return sample_rate > 0 and random.random() < sample_rate
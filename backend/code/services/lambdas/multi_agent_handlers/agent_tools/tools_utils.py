@@ -1,104 +1,510 @@
-import base64
-import io
 import json
 import re
-from io import BytesIO
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from urllib.parse import urlparse
 
-import boto3
-import fitz  # PyMuPDF for PDF processing
-from docx import Document
 import os
 
+from agent_tools.aws_clients import get_client
+from agent_tools.document_digest import build_document_digest, select_section_images
+from agent_tools.document_block import (
+    DOCUMENT_BLOCK_MAX_BYTES,
+    DOCUMENT_BLOCK_MAX_TOKENS,
+    DOCUMENT_BLOCK_MODEL_ID,
+    TruncatedAnswerError,
+    converse_document,
+    document_block_prompt,
+    document_name,
+    format_page_ranges,
+    parse_page_ranges,
+    split_pdf_pages,
+    split_transcription,
+    uses_document_block,
+)
+from agent_tools.document_download import DocumentTooLargeError, RetainedDocuments, fetch_s3_document
+from agent_tools.document_views import apply_view
+from agent_tools.extraction_cache import ExtractionCache
+from agent_tools.image_dedup import DescriptionMemo, deduplicate_images
+from agent_tools.image_normalizer import (
+    ImageSkipped,
+    is_below_size_threshold,
+    normalize_image,
+    summarize_normalization,
+)
+from agent_tools.pdf_extraction import open_pdf
+from agent_tools.rate_limiter import CHARS_PER_TOKEN, build_rate_limiter, estimate_request_tokens
+from agent_tools.section_index import build_section_index, extract_sections, parse_requested_sections
+from agent_tools.text_compaction import TEXT_COMPACTION_ENABLED, compact_pages
+from agent_tools.tool_logging import logger, truncate_value
+from agent_tools.vector_diagrams import render_region
+from agent_tools.vision_stream import (
+    IMAGE_DESCRIPTION_MAX_CHARS,
+    IMAGE_DESCRIPTION_STOP_SEQUENCES,
+    IMAGE_DESCRIPTION_STREAMING,
+    read_vision_stream,
+)
 
-s3_client = boto3.client("s3")
 
-SECTION_PATTERNS = {
-    "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM": re.compile(
-        r"SOLUTION\s+ARCHITECTURE\s*/\s*ARCHITECTURAL\s+DIAGRAM", re.IGNORECASE),
-    "SUMMARY OF MILESTONES & DELIVERABLES": re.compile(r"SUMMARY\s+OF\s+MILESTONES\s*&\s*DELIVERABLES", re.IGNORECASE)
-}
+s3_client = get_client("s3")
+extraction_cache = ExtractionCache(s3_client)
+# Descriptions of the images of a whole document, stored in the same tiers (and S3 location) as the digests
+image_descriptions_cache = ExtractionCache(s3_client, sidecar_suffix=".image_descriptions.json")
+# PDFs downloaded for their digest, read again for the image payloads
+retained_documents = RetainedDocuments()
 
+# Number of images described in parallel, bounded to stay below the Bedrock account throttling limits
+IMAGE_DESCRIPTION_CONCURRENCY = int(os.environ.get("IMAGE_DESCRIPTION_CONCURRENCY", "4"))
 
-def read_s3_url(s3_url_path):
-    """Reads a file from S3 and extracts text if it's a PDF"""
+description_memo = DescriptionMemo()
+
+# Keeps the vision calls within the Bedrock requests/tokens per minute quotas of the model
+rate_limiter = build_rate_limiter()
+
+# Images sent in a single vision request, 1 keeps one request per image
+IMAGE_DESCRIPTION_BATCH_SIZE = int(os.environ.get("IMAGE_DESCRIPTION_BATCH_SIZE", "1"))
+# Base64 payload of a batched request, well below the Bedrock request size limit
+IMAGE_DESCRIPTION_BATCH_MAX_BYTES = int(os.environ.get("IMAGE_DESCRIPTION_BATCH_MAX_BYTES", str(4 * 1024 * 1024)))
+IMAGE_DESCRIPTION_BATCH_MAX_TOKENS = int(os.environ.get("IMAGE_DESCRIPTION_BATCH_MAX_TOKENS", "4096"))
+BATCH_PROMPT_SUFFIX = (
+    "Each image above is preceded by its identifier. Describe every image separately following these "
+    "instructions and answer only with a JSON object mapping each identifier to the description of its image, "
+    'for example {"p3-i0": "description of the first image", "p3-i1": "description of the second image"}.'
+)
+
+# Bedrock agents reject action group responses above 25 KB, keep every slice of a document below that
+DOCUMENT_PAGE_MAX_CHARS = int(os.environ.get("DOCUMENT_PAGE_MAX_CHARS", "20000"))
+
+
+def parse_s3_url(s3_url_path):
+    """Returns the bucket and key of an s3:// url, None when the url is not valid"""
     parsed_url = urlparse(s3_url_path)
     if not parsed_url.netloc or not parsed_url.path:
-        return {"error": "Invalid S3 URL format"}
+        return None
+    return parsed_url.netloc, parsed_url.path.lstrip("/")
 
-    bucket_name = parsed_url.netloc
-    s3_key = parsed_url.path.lstrip("/")
 
-    response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
-    file_data = response["Body"].read()
+def get_document_digest(bucket_name, s3_key, etag=None):
+    """
+    Returns the digest of a document, parsing it only once per object version.
+    Both tool functions read from the digest, so a document is downloaded and parsed at most once: the PDF is
+    retained in /tmp for the image payloads (see PdfImageLoader).
+    """
+    # The ETag identifies the object version, a HEAD is enough to know if the extraction is already cached
+    etag = etag or s3_client.head_object(Bucket=bucket_name, Key=s3_key)["ETag"]
+    digest = extraction_cache.get(bucket_name, s3_key, etag)
+    logger.info("Extraction cache stats", extra=extraction_cache.get_stats())
+    if digest is not None:
+        return digest
+
+    # IfMatch guarantees the body we parse is the version the cache entry is keyed on
     file_extension = s3_key.lower().split(".")[-1]
+    with fetch_s3_document(s3_client, bucket_name, s3_key, etag=etag) as file_data:
+        digest = build_document_digest(file_data, file_extension)
+        if file_extension == "pdf":
+            retained_documents.put(bucket_name, s3_key, etag, file_data)
+    extraction_cache.put(bucket_name, s3_key, etag, digest)
+    return digest
+
 
-    # Extract text based on file type
-    if file_extension == "pdf":
-        extracted_text = extract_text_from_pdf(file_data)
-    elif file_extension in ["docx", "doc"]:
-        extracted_text = extract_text_from_docx(file_data)
+def read_s3_url(s3_url_path, sections=None, view_name=None, view=None):
+    """
+    Reads a file from S3 and extracts text if it's a PDF, serving repeated reads from the extraction cache.
+    When `sections` is given (comma separated names) only the text of those sections is returned, otherwise
+    a document `view` (see document_views) restricts the text to the parts the calling agent needs.
+    """
+    bucket_and_key = parse_s3_url(s3_url_path)
+    if bucket_and_key is None:
+        return {"error": "Invalid S3 URL format"}
+
+    model_read = _read_with_document_block(*bucket_and_key, "get_document_from_s3")
+    if model_read is not None:
+        # Split back into pages on the markers of the transcription, section page ranges stay document pages
+        page_texts = [page_text for chunk in model_read
+                      for page_text in split_transcription(chunk["text"], chunk["page_numbers"])]
+        page_count = len(page_texts)
     else:
-        try:
-            extracted_text = file_data.decode("utf-8")
-        except UnicodeDecodeError:
-            extracted_text = base64.b64encode(file_data).decode("utf-8")
+        digest = get_document_digest(*bucket_and_key)
+        page_texts = [page["text"] for page in digest["pages"]]
+        page_count = digest["page_count"]
+    if TEXT_COMPACTION_ENABLED:
+        # Compacted on read, the digest keeps the raw text so the compaction settings can change freely
+        page_texts, compaction_report = compact_pages(page_texts)
+        logger.info("Document text compacted", extra=compaction_report)
+    extracted_text = "\n".join(page_texts)
+    logger.info("Document text extracted", extra={"document_chars": len(extracted_text), "pages": page_count})
 
-    print(f"Extracted Text: {extracted_text[:500]}")  # Print first 500 chars for debugging
-    return extracted_text
+    requested_sections = parse_requested_sections(sections)
+    if not requested_sections:
+        view_text = apply_view(page_texts, view_name, view) if view else None
+        if view_text is None:
+            return extracted_text
+        logger.info("Document view read", extra={"view": view_name, "view_chars": len(view_text),
+                                                 "document_chars": len(extracted_text)})
+        return view_text
 
+    section_index = build_section_index(page_texts)
+    scoped_text = extract_sections(extracted_text, section_index, requested_sections)
+    if scoped_text is None:
+        available_sections = ", ".join(section["name"] for section in section_index) or "none detected"
+        return (f"No section matching {requested_sections} was found in the document. "
+                f"Available sections: {available_sections}. "
+                f"Call the function again without the sections parameter to read the whole document.")
+    logger.info("Section scoped read", extra={"sections": requested_sections, "section_chars": len(scoped_text),
+                                              "document_chars": len(extracted_text)})
+    return scoped_text
 
-def extract_text_from_pdf(pdf_bytes):
-    """Extracts text from a PDF file."""
-    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-    text = "\n".join(page.get_text() for page in pdf_document)
-    return text
 
+def read_document_with_model(bucket_name, s3_key, function, pages=None, etag=None):
+    """
+    Answers a tool function by sending the PDF to the model as Converse `document` blocks (see document_block),
+    `DOCUMENT_BLOCK_PAGES_PER_CALL` pages at a time. Returns
+    [{"pages": "1-10", "page_numbers": [1, ...], "text": ...}] in page order, cached per object version, prompt,
+    model and page selection like the local extractions. A call stopped by the output token limit is read again
+    as two halves, a truncated answer is never cached.
+    Raises DocumentTooLargeError when a part of the document is above the Converse document size limit and
+    TruncatedAnswerError when a single page does not fit in the output tokens.
+    """
+    etag = etag or s3_client.head_object(Bucket=bucket_name, Key=s3_key)["ETag"]
+    model_id = DOCUMENT_BLOCK_MODEL_ID or os.environ["LLM_MODEL_AGENT"]
+    prompt = document_block_prompt(function)
+    variant = f"document_block/{DescriptionMemo.prompt_hash(prompt)}/{model_id}/{pages or 'all'}"
+    cached_read = extraction_cache.get(bucket_name, s3_key, etag, variant=variant)
+    if cached_read is not None:
+        return cached_read
 
-def extract_text_from_docx(doc_bytes):
-    """Extracts text from a Word (.docx) file."""
-    doc_stream = io.BytesIO(doc_bytes)
-    doc = Document(doc_stream)
-    text = "\n".join(paragraph.text for paragraph in doc.paragraphs)
-    return text
+    with fetch_s3_document(s3_client, bucket_name, s3_key, etag=etag) as file_data:
+        chunks = split_pdf_pages(file_data, pages)
+    for chunk_pages, chunk_bytes in chunks:
+        if len(chunk_bytes) > DOCUMENT_BLOCK_MAX_BYTES:
+            raise DocumentTooLargeError(bucket_name, f"{s3_key} (pages {format_page_ranges(chunk_pages)})",
+                                        len(chunk_bytes), DOCUMENT_BLOCK_MAX_BYTES)
 
+    def read_chunk(chunk):
+        chunk_pages, chunk_bytes = chunk
+        text, metrics = converse_document(get_bedrock_client(), model_id, chunk_bytes, prompt,
+                                          document_name(s3_key), len(chunk_pages), rate_limiter=rate_limiter)
+        metrics["function"] = function
+        logger.info("Document block call metrics", extra=metrics)
+        if metrics["stop_reason"] != "max_tokens":
+            return [{"pages": format_page_ranges(chunk_pages), "page_numbers": chunk_pages, "text": text}]
+        if len(chunk_pages) == 1:
+            raise TruncatedAnswerError(s3_key, chunk_pages[0], DOCUMENT_BLOCK_MAX_TOKENS)
+        logger.warning("Document block answer truncated, reading the pages again in two halves",
+                       extra={"s3_key": s3_key, "pages": format_page_ranges(chunk_pages)})
+        # Page numbers of the halves are relative to the chunk
+        halves = split_pdf_pages(chunk_bytes, pages_per_call=-(-len(chunk_pages) // 2))
+        return [part for half_pages, half_bytes in halves
+                for part in read_chunk(([chunk_pages[number - 1] for number in half_pages], half_bytes))]
 
-def llm_describe_image(image_base64):
-    """Calls Bedrock LLM to analyze an image."""
-    bedrock = boto3.client(service_name='bedrock-runtime', region_name="us-east-1")
+    with ThreadPoolExecutor(max_workers=max(1, min(IMAGE_DESCRIPTION_CONCURRENCY, len(chunks)))) as executor:
+        model_read = [part for parts in executor.map(read_chunk, chunks) for part in parts]
+    extraction_cache.put(bucket_name, s3_key, etag, model_read, variant=variant)
+    return model_read
+
+
+def _read_with_document_block(bucket_name, s3_key, function, pages=None):
+    """Model read of a PDF when the function uses the document block mode, None to use the local extraction."""
+    if not uses_document_block(function) or not s3_key.lower().endswith(".pdf"):
+        return None
+    try:
+        return read_document_with_model(bucket_name, s3_key, function, pages=pages)
+    except (DocumentTooLargeError, TruncatedAnswerError) as e:
+        logger.warning(f"Document block mode not possible, falling back to the local extraction: {e}")
+        return None
+
+
+def _as_int_parameter(name, value, minimum):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    if number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, got {number}")
+    return number
+
+
+def paginate_text(text, cursor=None, max_chars=None):
+    """
+    Returns a bounded slice of `text` starting at the character offset `cursor`.
+    The slice is cut on a line break when there is one in the last fifth of the window so that agents
+    do not receive half sentences. `next_cursor` is None once the end of the text is reached.
+    Raises ValueError when `max_chars` is not a positive integer or `cursor` not an offset, the agent gets the
+    message back instead of a slice that moves backwards.
+    """
+    max_chars = min(_as_int_parameter("max_chars", max_chars or DOCUMENT_PAGE_MAX_CHARS, 1), DOCUMENT_PAGE_MAX_CHARS)
+    offset = _as_int_parameter("cursor", cursor or 0, 0)
+    end = min(len(text), offset + max_chars)
+    if end < len(text):
+        line_break = text.rfind("\n", offset + int(max_chars * 0.8), end)
+        if line_break > offset:
+            end = line_break + 1
+    return {
+        "content": text[offset:end],
+        "offset": offset,
+        "returned_chars": end - offset,
+        "total_chars": len(text),
+        "next_cursor": str(end) if end < len(text) else None,
+    }
+
+
+def get_bedrock_client():
+    """Returns the bedrock-runtime client shared by the description threads, in the BEDROCK_REGION_NAME region."""
+    return get_client("bedrock-runtime")
+
+
+def _invoke_vision_model(content, max_tokens=1000, streaming=None, max_chars=0, stop_sequences=()):
+    """
+    Sends one message to the vision model and returns the text of the answer.
+    When streaming, the answer is read as it is generated and cut at `max_chars` or at the first of the
+    `stop_sequences`, so the latency follows the length of the description instead of `max_tokens`.
+    """
+    streaming = IMAGE_DESCRIPTION_STREAMING if streaming is None else streaming
+    bedrock = get_bedrock_client()
     request_body = {
         "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 1000,
+        "max_tokens": max_tokens,
         "messages": [
             {
                 "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": image_base64
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": os.environ["ANALYSE_AWS_DIAGRAM_AGENT_PROMPT"]
-                    }
-                ]
+                "content": content
             }
         ]
     }
-    print(f" ##### Analysing Image #####")
-    response = bedrock.invoke_model(
-        body=json.dumps(request_body),
-        modelId=os.environ['LLM_MODEL_AGENT'],
-        contentType="application/json",
-        accept="application/json"
-    )
-    response_body = json.loads(response['body'].read())
-    analysis = response_body['content'][0]['text']
-    return analysis
+    if stop_sequences:
+        request_body["stop_sequences"] = list(stop_sequences)
+    model_id = os.environ['LLM_MODEL_AGENT']
+    estimated_tokens = estimate_request_tokens(request_body)
+    rate_limiter.acquire(model_id, estimated_tokens)
+
+    started_at = time.perf_counter()
+    if streaming:
+        response = bedrock.invoke_model_with_response_stream(
+            body=json.dumps(request_body),
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json"
+        )
+        text, metrics = read_vision_stream(response['body'], max_chars=max_chars, stop_sequences=stop_sequences,
+                                           started_at=started_at)
+        usage = {"input_tokens": metrics["input_tokens"] or 0,
+                 "output_tokens": metrics["output_tokens"] or len(text) // CHARS_PER_TOKEN}
+    else:
+        response = bedrock.invoke_model(
+            body=json.dumps(request_body),
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json"
+        )
+        response_body = json.loads(response['body'].read())
+        text = response_body['content'][0]['text']
+        usage = response_body.get("usage", {})
+        metrics = {"time_to_first_token_ms": None,
+                   "total_latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+                   "stopped_early": False}
+    metrics.update({"model_id": model_id, "streaming": streaming, "output_chars": len(text)})
+    logger.info("Vision call metrics", extra=metrics)
+
+    if usage:
+        rate_limiter.release(model_id, estimated_tokens - usage.get("input_tokens", 0) - usage.get("output_tokens", 0))
+    return text
+
+
+def _image_block(image_base64, media_type):
+    return {
+        "type": "image",
+        "source": {
+            "type": "base64",
+            "media_type": media_type,
+            "data": image_base64
+        }
+    }
+
+
+def llm_describe_image(image_base64, media_type="image/jpeg"):
+    """Calls Bedrock LLM to analyze an image."""
+    return _invoke_vision_model([
+        _image_block(image_base64, media_type),
+        {
+            "type": "text",
+            "text": os.environ["ANALYSE_AWS_DIAGRAM_AGENT_PROMPT"]
+        }
+    ], max_chars=IMAGE_DESCRIPTION_MAX_CHARS, stop_sequences=IMAGE_DESCRIPTION_STOP_SEQUENCES)
+
+
+def image_identifier(image):
+    """Tag of an image inside a batched request."""
+    return f"p{image['page']}-i{image['image_index']}"
+
+
+def pack_batches(images, batch_size=IMAGE_DESCRIPTION_BATCH_SIZE, max_bytes=IMAGE_DESCRIPTION_BATCH_MAX_BYTES):
+    """Groups images, in order, in batches of at most `batch_size` images and `max_bytes` of base64 payload."""
+    batches = []
+    batch = []
+    batch_bytes = 0
+    for image in images:
+        image_bytes = len(image["image_base64"])
+        if batch and (len(batch) >= batch_size or batch_bytes + image_bytes > max_bytes):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(image)
+        batch_bytes += image_bytes
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_batch_descriptions(answer, identifiers):
+    """
+    Splits the JSON answer of a batched request back into {identifier: description}.
+    Identifiers missing from the answer (or an answer that is not JSON) are left out, the caller
+    describes those images one by one.
+    """
+    try:
+        descriptions = json.loads(answer[answer.index("{"):answer.rindex("}") + 1])
+    except ValueError:
+        logger.warning("Batched description answer is not JSON", extra={"answer": truncate_value(answer)})
+        return {}
+    return {
+        identifier: description if isinstance(description, str) else json.dumps(description)
+        for identifier, description in descriptions.items()
+        if identifier in identifiers and description
+    }
+
+
+def llm_describe_images_batch(images):
+    """
+    Describes several images with a single Bedrock call. Every image is preceded by its identifier and the
+    model is asked for a JSON object mapping each identifier to its description.
+    Returns {identifier: description}.
+    """
+    content = []
+    for image in images:
+        content.append({"type": "text", "text": f"Image {image_identifier(image)}:"})
+        content.append(_image_block(image["image_base64"], image.get("media_type", "image/jpeg")))
+    content.append({
+        "type": "text",
+        "text": f"{os.environ['ANALYSE_AWS_DIAGRAM_AGENT_PROMPT']}\n{BATCH_PROMPT_SUFFIX}"
+    })
+    answer = _invoke_vision_model(content, max_tokens=min(1000 * len(images), IMAGE_DESCRIPTION_BATCH_MAX_TOKENS))
+    return parse_batch_descriptions(answer, {image_identifier(image) for image in images})
+
+
+def describe_images(images_details, max_workers=IMAGE_DESCRIPTION_CONCURRENCY, memo=None, payload_loader=None,
+                    batch_size=None):
+    """
+    Describes the images with a bounded thread pool.
+    Descriptions already memoised for the same image, prompt and model are reused without calling the LLM.
+    Images without an `image_base64` payload get it from `payload_loader` only when the LLM has to be called.
+    With `batch_size` above 1 (IMAGE_DESCRIPTION_BATCH_SIZE) the images to describe are sent several per
+    request, images the batched answer does not cover are described one by one.
+    The output keeps the (page, image_index) order of the input and a failing image is reported
+    with an error instead of discarding the descriptions of the other images. Images the loader drops on
+    purpose (ImageSkipped) are reported as `skipped`, which is not an error.
+    """
+    memo = memo or description_memo
+    batch_size = IMAGE_DESCRIPTION_BATCH_SIZE if batch_size is None else batch_size
+    prompt = os.environ["ANALYSE_AWS_DIAGRAM_AGENT_PROMPT"]
+    if batch_size > 1:
+        # Batched descriptions are memoised apart so that both modes can be compared
+        prompt = f"{prompt}\n{BATCH_PROMPT_SUFFIX}"
+    model_id = os.environ["LLM_MODEL_AGENT"]
+
+    def described(image, description):
+        return {"page": image["page"],
+                "image_index": image["image_index"],
+                "image_described": description}
+
+    def failed(image, error):
+        logger.warning(f"Error describing image {image['image_index']} of page {image['page']}: {str(error)}")
+        return {"page": image["page"],
+                "image_index": image["image_index"],
+                "image_described": None,
+                "error": str(error)}
+
+    def skipped(image, reason):
+        return {"page": image["page"],
+                "image_index": image["image_index"],
+                "image_described": None,
+                "skipped": str(reason)}
+
+    def remember(image, description):
+        if image.get("content_hash"):
+            memo.put(image["content_hash"], prompt, model_id, description)
+
+    def load(image):
+        if "image_base64" not in image:
+            image = {**image, **payload_loader(image)}
+        return image
+
+    def describe(image):
+        try:
+            image = load(image)
+            description = llm_describe_image(image["image_base64"], image.get("media_type", "image/jpeg"))
+            remember(image, description)
+            return described(image, description)
+        except ImageSkipped as e:
+            return skipped(image, e)
+        except Exception as e:
+            return failed(image, e)
+
+    def describe_batch(images):
+        loaded_images = []
+        results = {}
+        for image in images:
+            try:
+                loaded_images.append(load(image))
+            except ImageSkipped as e:
+                results[image_identifier(image)] = skipped(image, e)
+            except Exception as e:
+                results[image_identifier(image)] = failed(image, e)
+
+        for batch in pack_batches(loaded_images, batch_size):
+            descriptions = {}
+            if len(batch) > 1:
+                try:
+                    descriptions = llm_describe_images_batch(batch)
+                except Exception as e:
+                    logger.warning(f"Batched description failed, describing the images one by one: {str(e)}")
+            for image in batch:
+                description = descriptions.get(image_identifier(image))
+                if description is None:
+                    results[image_identifier(image)] = describe(image)
+                else:
+                    remember(image, description)
+                    results[image_identifier(image)] = described(image, description)
+        return [results[image_identifier(image)] for image in images]
+
+    if not images_details:
+        return []
+
+    results = [None] * len(images_details)
+    pending = []
+    for position, image in enumerate(images_details):
+        image_hash = image.get("content_hash")
+        description = memo.get(image_hash, prompt, model_id) if image_hash else None
+        if description is None:
+            pending.append(position)
+        else:
+            results[position] = described(image, description)
+
+    def describe_positions(positions):
+        if batch_size > 1:
+            return describe_batch([images_details[position] for position in positions])
+        return [describe(images_details[position]) for position in positions]
+
+    work = [pending[start:start + max(1, batch_size)] for start in range(0, len(pending), max(1, batch_size))]
+    if work:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(work)))) as executor:
+            # map yields the results in submission order whatever the completion order is
+            for positions, descriptions in zip(work, executor.map(describe_positions, work)):
+                for position, description in zip(positions, descriptions):
+                    results[position] = description
+    logger.info("Image description memo", extra={"memo_hits": memo.hits, "memo_misses": memo.misses})
+    return results
 
 
 def parse_s3_uri(s3_uri):
@@ -109,44 +515,103 @@ def parse_s3_uri(s3_uri):
     return match.group(1), match.group(2)
 
 
-def download_document_from_s3(s3_uri):
-    """Download a PDF file from S3 and return it as a BytesIO object."""
-    bucket_name, file_key = parse_s3_uri(s3_uri)
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    return BytesIO(response["Body"].read())
+class PdfImageLoader:
+    """
+    Extracts and normalises image payloads by xref (vector diagrams are rendered from their clip region),
+    opening the PDF retained by the digest build, or downloading it, on the first request.
+    The download is pinned to `etag`, the version the xrefs and clips of the digest were inventoried from.
+    Shared by the description threads, the document handle is guarded by a lock.
+    Large PDFs are streamed to /tmp and stay there, memory mapped, until `close()`.
+    """
+
+    def __init__(self, s3_uri, etag=None):
+        self.s3_uri = s3_uri
+        self.etag = etag
+        self.normalization_reports = []
+        self._document = None
+        self._resources = ExitStack()
+        self._lock = threading.Lock()
+
+    def __call__(self, image):
+        with self._lock:
+            if self._document is None:
+                bucket_name, s3_key = parse_s3_uri(self.s3_uri)
+                file_data = retained_documents.get(bucket_name, s3_key, self.etag) if self.etag else None
+                if file_data is None:
+                    file_data = self._resources.enter_context(
+                        fetch_s3_document(s3_client, bucket_name, s3_key, etag=self.etag))
+                self._document = open_pdf(file_data)
+                self._resources.callback(self._document.close)
+            if image.get("clip"):
+                image_bytes = render_region(self._document[image["page"] - 1], image["clip"])[0]
+            else:
+                image_bytes = self._document.extract_image(image["xref"])["image"]
+        normalized_image = normalize_image(image_bytes)
+        self.normalization_reports.append(normalized_image)
+        if normalized_image["skipped"]:
+            raise ImageSkipped(f"Image not sent to the LLM: {normalized_image['skipped']}")
+        return {"image_base64": normalized_image["image_base64"], "media_type": normalized_image["media_type"]}
+
+    def close(self):
+        # The document is closed before its /tmp file is removed (callbacks run in reverse order)
+        self._document = None
+        self._resources.close()
 
 
-def extract_images_from_pdf_sections(pdf_stream):
-    """Extract images from sections sequentially and associate them with the most recent section title."""
-    doc = fitz.open(stream=pdf_stream, filetype="pdf")
-    image_data = []
-    current_section = None
+def _descriptions_variant():
+    """Descriptions depend on the prompt, the model and the batching mode on top of the document version."""
+    prompt = os.environ["ANALYSE_AWS_DIAGRAM_AGENT_PROMPT"]
+    return f"{DescriptionMemo.prompt_hash(prompt)}/{os.environ['LLM_MODEL_AGENT']}/{IMAGE_DESCRIPTION_BATCH_SIZE > 1}"
 
-    for page_num, page in enumerate(doc, start=1):
-        if page_num < 3:
-            continue
-        text = page.get_text("text")  # Extract full text from the page
 
-        # Check if we are entering a new section
-        for section_name, pattern in SECTION_PATTERNS.items():
-            if pattern.search(text):
-                current_section = section_name  # Switch to the new section
-                print(f"Detected Section: {current_section} on Page {page_num}")
+def describe_document_images(s3_uri_path, pages=None):
+    """
+    Describes the images found in the sections of a document (of the `pages` selection, e.g. "3-5,7"),
+    reading the image inventory from the digest.
+    Descriptions computed ahead (pre-extraction on upload) or by a previous call are served from the cache,
+    otherwise the PDF is only downloaded if at least one image has no memoised description.
+    In document block mode the model reads the PDF pages directly and describes their images.
+    """
+    bucket_name, s3_key = parse_s3_uri(s3_uri_path)
+    model_read = _read_with_document_block(bucket_name, s3_key, "analyse_images_documents", pages=pages)
+    if model_read is not None:
+        return [{"pages": chunk["pages"], "image_described": chunk["text"]} for chunk in model_read]
 
-        # Extract images and assign them to the current section
-        if current_section:
-            image_list = page.get_images(full=True)
+    etag = s3_client.head_object(Bucket=bucket_name, Key=s3_key)["ETag"]
+    variant = f"{_descriptions_variant()}/{pages or 'all'}"
+    cached_descriptions = image_descriptions_cache.get(bucket_name, s3_key, etag, variant=variant)
+    if cached_descriptions is not None:
+        return cached_descriptions
 
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                base64_image = base64.b64encode(image_bytes).decode("utf-8")
+    digest = get_document_digest(bucket_name, s3_key, etag=etag)
+    selected_pages = set(parse_page_ranges(pages, digest["page_count"]))
+    images_details = [
+        image for image in select_section_images(digest)
+        if image["page"] in selected_pages
+        and not is_below_size_threshold(image["width"], image["height"], image["bytes"])
+    ]
+    images_details = deduplicate_images(images_details)
 
-                image_data.append({
-                    "page": page_num,
-                    "image_index": img_index,
-                    "image_base64": base64_image
-                })
+    image_loader = PdfImageLoader(s3_uri_path, etag=etag)
+    try:
+        described_by_position = {
+            (image["page"], image["image_index"]): image
+            for image in describe_images([image for image in images_details if "duplicate_of" not in image],
+                                         payload_loader=image_loader)
+        }
+    finally:
+        image_loader.close()
+    logger.info("Image normalisation summary", extra=summarize_normalization(image_loader.normalization_reports))
 
-    return image_data
+    # Duplicates only reference the first occurrence, the description is not repeated in the response
+    images_described = [
+        described_by_position.get((image["page"], image["image_index"]),
+                                  {"page": image["page"],
+                                   "image_index": image["image_index"],
+                                   "duplicate_of": image.get("duplicate_of")})
+        for image in images_details
+    ]
+    # A failed description is retried by the next call instead of being cached, skipped images are final
+    if not any("error" in image for image in images_described):
+        image_descriptions_cache.put(bucket_name, s3_key, etag, images_described, variant=variant)
+    return images_described
@@ -0,0 +1,129 @@
+import os
+
+from agent_tools.image_dedup import content_hash
+from agent_tools.image_normalizer import IMAGE_MAX_PIXELS
+
+# Architecture diagrams exported as vector drawings have no embedded image, they are found by their drawings
+VECTOR_DIAGRAM_DETECTION = os.environ.get("VECTOR_DIAGRAM_DETECTION", "true").lower() == "true"
+# A region is a diagram when it holds at least this many shapes (table rules and underlines are not counted)
+VECTOR_DIAGRAM_MIN_DRAWINGS = int(os.environ.get("VECTOR_DIAGRAM_MIN_DRAWINGS", "15"))
+# ... and covers at least this share of the page
+VECTOR_DIAGRAM_MIN_AREA_RATIO = float(os.environ.get("VECTOR_DIAGRAM_MIN_AREA_RATIO", "0.05"))
+# Drawings closer than this distance (points) belong to the same region
+VECTOR_DIAGRAM_MERGE_DISTANCE = float(os.environ.get("VECTOR_DIAGRAM_MERGE_DISTANCE", "24"))
+# Rendering resolution of a region, lowered when the region would exceed the pixel budget
+VECTOR_DIAGRAM_DPI = int(os.environ.get("VECTOR_DIAGRAM_DPI", "150"))
+VECTOR_DIAGRAM_MAX_PIXELS = int(os.environ.get("VECTOR_DIAGRAM_MAX_PIXELS", str(IMAGE_MAX_PIXELS)))
+
+# Horizontal/vertical rules thinner than this (points) are table borders, underlines or separators
+RULE_THICKNESS = 2.0
+# Drawings covering nearly the whole page are backgrounds or page borders
+BACKGROUND_AREA_RATIO = 0.9
+# Pages with more drawings than this are clustered as a single region to bound the detection cost
+MAX_CLUSTERED_DRAWINGS = 2000
+
+
+def _is_rule(rect):
+    return min(rect.width, rect.height) < RULE_THICKNESS and max(rect.width, rect.height) > 4 * RULE_THICKNESS
+
+
+def _cluster(drawings, distance):
+    """
+    Merges the drawings closer than `distance` until the clusters are stable.
+    `drawings` are (rect, shape count) pairs, returns [(bounding rect, shape count)].
+    """
+    clusters = [list(drawing) for drawing in sorted(drawings, key=lambda drawing: (drawing[0].y0, drawing[0].x0))]
+    merged = True
+    while merged:
+        merged = False
+        stable = []
+        for rect, count in clusters:
+            for cluster in stable:
+                if (cluster[0] + (-distance, -distance, distance, distance)).intersects(rect):
+                    cluster[0] = cluster[0] | rect
+                    cluster[1] += count
+                    merged = True
+                    break
+            else:
+                stable.append([rect, count])
+        clusters = stable
+    return [tuple(cluster) for cluster in clusters]
+
+
+def detect_vector_regions(page, min_drawings=VECTOR_DIAGRAM_MIN_DRAWINGS, min_area_ratio=VECTOR_DIAGRAM_MIN_AREA_RATIO,
+                          merge_distance=VECTOR_DIAGRAM_MERGE_DISTANCE):
+    """
+    Regions of a page dense in vector drawings: the drawings are clustered by proximity (connectors link the
+    boxes) and a cluster is kept when it has enough shapes and a large enough area. Rules only link, they are
+    not counted, so ruled tables are not taken for diagrams. Regions mostly covered by an embedded image are
+    left to the raster extraction. Returns the regions as fitz.Rect, top to bottom.
+    """
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    drawings = []
+    for drawing in page.get_drawings():
+        # Straight connectors have a zero height or width, they are widened to intersect what they link
+        rect = (drawing["rect"] + (-0.5, -0.5, 0.5, 0.5)) & page_rect
+        if not rect.is_empty and rect.width * rect.height < BACKGROUND_AREA_RATIO * page_area:
+            drawings.append((rect, 0 if _is_rule(rect) else 1))
+    if sum(count for _, count in drawings) < min_drawings:
+        return []
+    if len(drawings) > MAX_CLUSTERED_DRAWINGS:
+        bounds = drawings[0][0]
+        for rect, _ in drawings[1:]:
+            bounds = bounds | rect
+        clusters = [(bounds, sum(count for _, count in drawings))]
+    else:
+        clusters = _cluster(drawings, merge_distance)
+
+    image_rects = [image["bbox"] for image in page.get_image_info()]
+    regions = []
+    for rect, count in clusters:
+        area = rect.width * rect.height
+        if count < min_drawings or area < min_area_ratio * page_area:
+            continue
+        covered = max((abs(rect & image_rect) for image_rect in image_rects), default=0)
+        if covered >= 0.5 * area:
+            continue
+        # Labels are text, not drawings: the margin keeps the ones written around the shapes
+        margin = merge_distance / 2
+        regions.append((rect + (-margin, -margin, margin, margin)) & page_rect)
+    return sorted(regions, key=lambda rect: (rect.y0, rect.x0))
+
+
+def render_region(page, clip, dpi=VECTOR_DIAGRAM_DPI, max_pixels=VECTOR_DIAGRAM_MAX_PIXELS):
+    """PNG of a page region at `dpi`, or at the highest resolution that fits `max_pixels`."""
+    import fitz
+
+    clip = fitz.Rect(clip)
+    zoom = min(dpi / 72.0, (max_pixels / (clip.width * clip.height)) ** 0.5)
+    # The pixmap size is rounded up, keep a pixel of slack on both edges
+    while (clip.width * zoom + 1) * (clip.height * zoom + 1) > max_pixels:
+        zoom *= 0.99
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+    return pixmap.tobytes("png"), pixmap.width, pixmap.height
+
+
+def inventory_vector_diagrams(document, page_numbers, first_image_index=None):
+    """
+    Digest entries of the vector diagrams of the given pages (1 based), rendered once to hash them.
+    The entries have no xref, the `clip` (page coordinates) is rendered again when the payload is needed.
+    """
+    first_image_index = first_image_index or {}
+    diagrams = []
+    for page_num in page_numbers:
+        page = document[page_num - 1]
+        for region_index, region in enumerate(detect_vector_regions(page)):
+            image_bytes, width, height = render_region(page, region)
+            diagrams.append({
+                "page": page_num,
+                "image_index": first_image_index.get(page_num, 0) + region_index,
+                "xref": None,
+                "clip": [round(region.x0, 2), round(region.y0, 2), round(region.x1, 2), round(region.y1, 2)],
+                "width": width,
+                "height": height,
+                "bytes": len(image_bytes),
+                "ext": "png",
+                "content_hash": content_hash(image_bytes),
+            })
+    return diagrams
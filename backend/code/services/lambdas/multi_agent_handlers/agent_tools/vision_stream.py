@@ -0,0 +1,65 @@
+import json
+import os
+import time
+
+# Streams the descriptions (invoke_model_with_response_stream) instead of waiting for the whole answer
+IMAGE_DESCRIPTION_STREAMING = os.environ.get("IMAGE_DESCRIPTION_STREAMING", "false").lower() == "true"
+# Early cutoff of a streamed description: a character budget (0 disables it) and stop sequences (JSON list)
+IMAGE_DESCRIPTION_MAX_CHARS = int(os.environ.get("IMAGE_DESCRIPTION_MAX_CHARS", "0"))
+IMAGE_DESCRIPTION_STOP_SEQUENCES = json.loads(os.environ.get("IMAGE_DESCRIPTION_STOP_SEQUENCES", "[]"))
+
+
+def _cut(text, max_chars, stop_sequences):
+    """Returns the text up to the first stop sequence or the character budget, and whether it was cut."""
+    cut_at = len(text)
+    for stop_sequence in stop_sequences:
+        position = text.find(stop_sequence)
+        if position != -1:
+            cut_at = min(cut_at, position)
+    if max_chars and cut_at > max_chars:
+        # Do not return half a word
+        word_end = text.rfind(" ", 0, max_chars + 1)
+        cut_at = word_end if word_end > 0 else max_chars
+    return text[:cut_at], cut_at < len(text)
+
+
+def read_vision_stream(event_stream, max_chars=0, stop_sequences=(), started_at=None, clock=time.perf_counter):
+    """
+    Gathers the text deltas of an Anthropic response stream, stopping as soon as the character budget or a
+    stop sequence is reached (the stream is then closed, the model stops generating).
+    Returns the text and the metrics of the call: time to first token, total latency, token usage.
+    """
+    started_at = clock() if started_at is None else started_at
+    metrics = {
+        "time_to_first_token_ms": None,
+        "total_latency_ms": None,
+        "input_tokens": None,
+        "output_tokens": None,
+        "stopped_early": False,
+    }
+    chunks = []
+    text = ""
+    for event in event_stream:
+        if "chunk" not in event:
+            continue
+        payload = json.loads(event["chunk"]["bytes"])
+        if payload["type"] == "message_start":
+            metrics["input_tokens"] = payload["message"].get("usage", {}).get("input_tokens")
+        elif payload["type"] == "content_block_delta" and payload["delta"].get("type") == "text_delta":
+            if metrics["time_to_first_token_ms"] is None:
+                metrics["time_to_first_token_ms"] = round((clock() - started_at) * 1000, 1)
+            chunks.append(payload["delta"]["text"])
+            if max_chars or stop_sequences:
+                text, metrics["stopped_early"] = _cut("".join(chunks), max_chars, stop_sequences)
+                if metrics["stopped_early"]:
+                    break
+        elif payload["type"] == "message_delta":
+            metrics["output_tokens"] = payload.get("usage", {}).get("output_tokens")
+
+    if metrics["stopped_early"]:
+        if hasattr(event_stream, "close"):
+            event_stream.close()
+    else:
+        text = "".join(chunks)
+    metrics["total_latency_ms"] = round((clock() - started_at) * 1000, 1)
+    return text, metrics
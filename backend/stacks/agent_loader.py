@@ -76,6 +76,24 @@ class AgentLoader:
 
         return reply_agents
 
+    def get_document_views(self) -> Dict[str, dict]:
+        """
+        Return the document views declared by the agents (`document_view`), keyed by agent key.
+        The tools Lambda uses them to return only the sections and keyword matches an agent needs.
+        """
+        project_name = self.get_project_name()
+        views = {}
+        for key, settings in self._config_data.get("agents", {}).items():
+            document_view = settings.get("document_view")
+            if not document_view or not settings.get("activate", False):
+                continue
+            views[key] = {
+                "agent_name": settings["agent_name"].replace("${project_name}", project_name),
+                "sections": document_view.get("sections", []),
+                "keywords": document_view.get("keywords", []),
+            }
+        return views
+
     def read_instruction_file(self, file_name):
         path = Path("./stacks/prompts") / file_name
         with open(path, 'r') as file:
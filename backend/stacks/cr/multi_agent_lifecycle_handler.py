@@ -4,6 +4,7 @@ import traceback
 import boto3
 
 import cfnresponse
+from aws_clients import get_client
 from multi_agent_manager import create_agent_alias, associate_sub_agents, associate_knowledge_base_with_agent, \
     prepare_agent, delete_all_agents_in_list
 
@@ -11,7 +12,7 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize Bedrock Client
-bedrock_agent_client = boto3.client('bedrock-agent')
+bedrock_agent_client = get_client('bedrock-agent')
 
 
 #######€xample payload###########
@@ -2,14 +2,15 @@ import logging
 import time
 from typing import Dict
 
-import boto3
 from botocore.exceptions import ClientError
 
+from aws_clients import get_client
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize Bedrock Client
-bedrock_agent_client = boto3.client('bedrock-agent')
+bedrock_agent_client = get_client('bedrock-agent')
 
 
 def delete_all_agents_in_list(list_agent_name):
@@ -10,6 +10,8 @@ from aws_cdk import (
     Stack,
     aws_iam as iam,
     aws_s3 as s3,
+    aws_s3_notifications as s3n,
+    aws_sqs as sqs,
     aws_lambda as _lambda,
     aws_ssm as ssm,
     aws_lambda_event_sources as lambda_events, RemovalPolicy, NestedStack, CustomResource, CfnOutput,
@@ -265,6 +267,7 @@ class KbInfraStack(NestedStack):
                         text_field="AMAZON_BEDROCK_TEXT_CHUNK",
                         vector_field="bedrock-knowledge-base-default-vector",
                     ),
+                    # Alias maintained by the index custom resource, the versioned index behind it is swapped on updates
                     vector_index_name=index_name,
                 ),
             ),
@@ -374,6 +377,25 @@ class KbInfraStack(NestedStack):
             lambda_service
     ) -> _lambda:
 
+        # S3 events are buffered in a queue so that a bulk upload starts a single ingestion job
+        ingestion_dead_letter_queue = sqs.Queue(
+            self,
+            "IngestionEventsDLQ",
+            retention_period=Duration.days(14),
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            enforce_ssl=True,
+        )
+        ingestion_queue = sqs.Queue(
+            self,
+            "IngestionEventsQueue",
+            # At least 6 times the function timeout, as recommended with a batching window
+            visibility_timeout=Duration.minutes(6),
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            enforce_ssl=True,
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=5, queue=ingestion_dead_letter_queue),
+        )
+
+        kb_bucket = self.resource_registry.get_resource("KB_DOCS_S3_BUCKET")
         ingest_lambda = _lambda.DockerImageFunction(
             self,
             "IngestionJob",
@@ -382,25 +404,78 @@ class KbInfraStack(NestedStack):
                 tag_or_digest =lambda_service.image_tag,
                 cmd=["lambdas.IngestJob.ingestJobLambda.lambda_handler"],
             ),
-            timeout=Duration.minutes(5),
+            timeout=Duration.minutes(1),
             environment=dict(
                 KNOWLEDGE_BASE_ID=knowledge_base.attr_knowledge_base_id,
                 DATA_SOURCE_ID=data_source.attr_data_source_id,
+                INGESTION_QUEUE_URL=ingestion_queue.queue_url,
+                DATA_SOURCE_BUCKET=kb_bucket.bucket_name,
+                DATA_SOURCE_PREFIX="rag_input_document/",
             ),
         )
 
-        s3_put_event_source = lambda_events.S3EventSourceV2(
-            self.resource_registry.get_resource("KB_DOCS_S3_BUCKET"),
-            events=[s3.EventType.OBJECT_REMOVED, s3.EventType.OBJECT_CREATED_PUT],
+        # Only the documents of the data source, the bucket also receives the SoWs and their extractions.
+        # The copies made for a re-ingestion (OBJECT_CREATED_COPY) are not notified
+        kb_bucket.grant_read_write(ingest_lambda, "rag_input_document/*")
+        for event_type in (s3.EventType.OBJECT_REMOVED, s3.EventType.OBJECT_CREATED_PUT):
+            kb_bucket.add_event_notification(
+                event_type,
+                s3n.SqsDestination(ingestion_queue),
+                s3.NotificationKeyFilter(prefix="rag_input_document/"),
+            )
+        batching_window = self.extra_configuration.get("KB_CONFIGURATION", {}).get(
+            "INGESTION_BATCHING_WINDOW_SECONDS", 60)
+        ingest_lambda.add_event_source(
+            lambda_events.SqsEventSource(
+                ingestion_queue,
+                batch_size=1000,
+                max_batching_window=Duration.seconds(int(batching_window)),
+                # Two invocations at most, a job started concurrently is turned into a follow-up run
+                max_concurrency=2,
+            )
         )
-        ingest_lambda.add_event_source(s3_put_event_source)
+        ingestion_queue.grant_send_messages(ingest_lambda)
+        ingestion_queue.grant(ingest_lambda, "sqs:GetQueueAttributes")
 
         ingest_lambda.add_to_role_policy(
             iam.PolicyStatement(
-                actions=["bedrock:StartIngestionJob"],
+                actions=["bedrock:StartIngestionJob", "bedrock:ListIngestionJobs"],
                 resources=[knowledge_base.attr_knowledge_base_arn],
             )
         )
+
+        # A new index version behind the alias may start empty (RequiresReingestion, e.g. new embedding model):
+        # a follow-up message makes the ingestion Lambda mark every document as changed then synchronise the data
+        # source, a sync alone only embeds the documents changed since the previous one
+        index_custom_resource = self.resource_registry.get_resource("INDEX_CREATION_CUSTOM_RESOURCE")
+        index_name = index_custom_resource.get_att_string("IndexName")
+        queue_ingestion_call = cr.AwsSdkCall(
+            service="SQS",
+            action="sendMessage",
+            parameters={
+                "QueueUrl": ingestion_queue.queue_url,
+                # FOLLOW_UP_MESSAGE_TYPE of lambdas/IngestJob/ingestJobLambda.py
+                "MessageBody": json.dumps({
+                    "type": "ingestion_follow_up",
+                    "index_name": index_name,
+                    "requires_reingestion": index_custom_resource.get_att_string("RequiresReingestion"),
+                }),
+            },
+            physical_resource_id=cr.PhysicalResourceId.of(index_name),
+        )
+        index_ingestion = cr.AwsCustomResource(
+            self,
+            "IndexVersionIngestion",
+            on_create=queue_ingestion_call,
+            on_update=queue_ingestion_call,
+            policy=cr.AwsCustomResourcePolicy.from_statements([
+                iam.PolicyStatement(actions=["sqs:SendMessage"], resources=[ingestion_queue.queue_arn]),
+            ]),
+        )
+        index_ingestion.node.add_dependency(ingest_lambda)
+        index_ingestion.node.add_dependency(data_source)
+        CfnOutput(self, "CfnOutputIndexRequiresReingestion",
+                  value=index_custom_resource.get_att_string("RequiresReingestion"))
         return ingest_lambda
 
     def __create_kb_bucket(self,
@@ -520,17 +595,23 @@ class KbInfraStack(NestedStack):
             role=oss_provider_role,
         )
 
+        index_properties = {
+            "collection_endpoint": self.oss_stack.collection.attr_collection_endpoint,
+            "data_access_policy_name": self.data_access_policy.name,
+            "index_name": index_name,
+            "embedding_model_id": embedding_model_id,
+        }
+        # HNSW parameters of the vector field (engine, space type, m, ef_*, encoder), validated by the custom resource
+        index_settings = self.extra_configuration.get("KB_CONFIGURATION", {}).get("OSS_INDEX_SETTINGS")
+        if index_settings:
+            index_properties["index_settings"] = json.dumps(index_settings, sort_keys=True)
+
         # Create a new custom resource consumer
         index_creation_custom_resource = CustomResource(
             self,
             "OSSIndexCreationCustomResource",
             service_token=oss_index_creation_provider.service_token,
-            properties={
-                "collection_endpoint": self.oss_stack.collection.attr_collection_endpoint,
-                "data_access_policy_name": self.data_access_policy.name,
-                "index_name": index_name,
-                "embedding_model_id": embedding_model_id,
-            },
+            properties=index_properties,
         )
 
         index_creation_custom_resource.node.add_dependency(oss_index_creation_provider)
@@ -1,3 +1,4 @@
+import json
 from dataclasses import asdict
 
 from aws_cdk import (
@@ -8,6 +9,7 @@ from aws_cdk import (
     CustomResource,
     custom_resources as cr,
     aws_s3 as s3,
+    aws_lambda_event_sources as lambda_events,
     aws_bedrock as bedrock, Stack, RemovalPolicy, CfnOutput
 )
 from aws_cdk.aws_bedrock import CfnAgent
@@ -44,6 +46,44 @@ class StandaloneGenAiLayer(Stack):
             "AiFactoryNoKBExistingVpc",
             vpc_id=vpc_id
         )
+        agent_loader = AgentLoader("stacks/configuration/agent_config.yaml")
+
+        # Shared by the agent tools and the pre-extraction Lambdas, they read and write the same caches
+        tools_environment = {
+            "ENVNAME": envname,
+            "LOG_LEVEL": "INFO",
+            "LOG_PAYLOAD_SAMPLE_RATE": "0.01",
+            "AI_FACTORY_REGION_NAME": self.region,
+            "BEDROCK_REGION_NAME": self.bedrock_engine_region,
+            "LLM_MODEL_AGENT": extra_configuration.get("AGENT_FOUNDATION_MODEL"),
+            "IMAGE_DESCRIPTION_CONCURRENCY": "4",
+            "IMAGE_DESCRIPTION_BATCH_SIZE": "1",
+            "IMAGE_DESCRIPTION_STREAMING": "true",
+            # Vector architecture diagrams are rendered at this DPI, within the vision pixel budget
+            "VECTOR_DIAGRAM_DPI": "150",
+            "BEDROCK_REQUESTS_PER_MINUTE": str(
+                extra_configuration.get("BEDROCK_RATE_LIMITS", {}).get("REQUESTS_PER_MINUTE", 0)),
+            "BEDROCK_TOKENS_PER_MINUTE": str(
+                extra_configuration.get("BEDROCK_RATE_LIMITS", {}).get("TOKENS_PER_MINUTE", 0)),
+            "DOCUMENT_PAGE_MAX_CHARS": "20000",
+            "TEXT_COMPACTION": "true",
+            # Tool functions answered by the model reading the PDF (Converse document block), e.g.
+            # "get_document_from_s3,analyse_images_documents". Empty keeps the local extraction
+            "DOCUMENT_BLOCK_FUNCTIONS": "",
+            # Sections and keywords each agent reads (document_view in agent_config.yaml)
+            "DOCUMENT_VIEWS": json.dumps(agent_loader.get_document_views(), separators=(",", ":")),
+            "DOWNLOAD_TO_DISK_MIN_BYTES": str(16 * 1024 * 1024),
+            "DOWNLOAD_MAX_BYTES": str(256 * 1024 * 1024),
+            "RETAINED_DOCUMENTS_MAX_BYTES": str(128 * 1024 * 1024),
+            # Digests and image descriptions are shared with the pre-extraction Lambda through S3
+            "EXTRACTION_CACHE_S3_SIDECAR": "true",
+            "EXTRACTION_CACHE_SIDECAR_PREFIX": "extracted_digest/",
+            "ANALYSE_AWS_DIAGRAM_AGENT_PROMPT": """
+                Describe this image Return the type and describe what it has as details
+                Identify any missing or misconfigured components.
+                Provide a list of potential improvements or modifications to enhance.
+                """
+        }
         self.sow_check_tools = _lambda.DockerImageFunction(
             self,
             f"HandleSoWRetrievalHandler{resource_prefix}",
@@ -69,18 +109,7 @@ class StandaloneGenAiLayer(Stack):
             ),
             memory_size=512 if prod_sizing else 256,
             timeout=Duration.seconds(MULTI_AGENT_TOOLS_TIMEOUT),
-            environment={
-                "ENVNAME": envname,
-                "LOG_LEVEL": "INFO",
-                "AI_FACTORY_REGION_NAME": self.region,
-                "BEDROCK_REGION_NAME": self.bedrock_engine_region,
-                "LLM_MODEL_AGENT": extra_configuration.get("AGENT_FOUNDATION_MODEL"),
-                "ANALYSE_AWS_DIAGRAM_AGENT_PROMPT": """
-                    Describe this image Return the type and describe what it has as details
-                    Identify any missing or misconfigured components.
-                    Provide a list of potential improvements or modifications to enhance.
-                    """
-            },
+            environment=tools_environment,
             tracing=_lambda.Tracing.ACTIVE,
         )
         self.sow_check_tools.add_permission(
@@ -132,6 +161,46 @@ class StandaloneGenAiLayer(Stack):
         )
         CfnOutput(self, "S3BucketDummy", value=dummy_s3_bucket.bucket_name)
 
+        # Extracts the SoWs as soon as they are uploaded, the first agent call then reads the cached digest
+        self.sow_pre_extraction = _lambda.DockerImageFunction(
+            self,
+            f"PreExtractSoWHandler{resource_prefix}",
+            function_name=ConventionNamingManager.get_lambda_name_convention(
+                resource_prefix=resource_prefix,
+                envname=envname,
+                lambda_name="sow-pre-extraction",
+            ),
+            description="Lambda responsible of extracting the statements of work uploaded to the S3 ahead of the agents",
+            role=IamManager.create_function_role(
+                self,
+                envname=envname,
+                resource_prefix=resource_prefix,
+                fn_name="pre-extract-sow",
+            ),
+            code=_lambda.DockerImageCode.from_image_asset(
+                directory="code/services/lambdas/multi_agent_handlers",
+                cmd=["agent_tools.pre_extraction.lambda_handler"],
+            ),
+            vpc=ai_factory_vpc,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            memory_size=512 if prod_sizing else 256,
+            timeout=Duration.seconds(MULTI_AGENT_TOOLS_TIMEOUT),
+            environment={
+                **tools_environment,
+                "PRE_EXTRACTION_DESCRIBE_IMAGES": "false",
+            },
+            tracing=_lambda.Tracing.ACTIVE,
+        )
+        self.sow_pre_extraction.add_event_source(
+            lambda_events.S3EventSourceV2(
+                dummy_s3_bucket,
+                events=[s3.EventType.OBJECT_CREATED],
+                filters=[s3.NotificationKeyFilter(prefix=extra_configuration.get("SOW_UPLOAD_PREFIX", "source_sow/"))],
+            )
+        )
+
         agent_get_s3_file = CfnAgent.AgentActionGroupProperty(
             action_group_name="lambda_processing_sow",
             action_group_executor=bedrock.CfnAgent.ActionGroupExecutorProperty(
@@ -148,6 +217,32 @@ class StandaloneGenAiLayer(Stack):
                             type="string",
                             description="the S3 uri of the document",
                             required=True
+                        ),
+                        "sections": bedrock.CfnAgent.ParameterDetailProperty(
+                            type="string",
+                            description="optional comma separated list of the sections to read instead of the whole "
+                                        "document, e.g. 'Milestones & Deliverables, Investment'. Known sections: "
+                                        "Project Overview, Executive Summary, Stakeholders & Team, Success Criteria, "
+                                        "Assumptions, Out of Scope, Scope of Work, Solution Architecture, "
+                                        "Milestones & Deliverables, Expected Cost Breakdown, Investment",
+                            required=False
+                        ),
+                        "cursor": bedrock.CfnAgent.ParameterDetailProperty(
+                            type="string",
+                            description="optional position to continue reading a large document from, use the "
+                                        "next_cursor value returned by the previous call",
+                            required=False
+                        ),
+                        "max_chars": bedrock.CfnAgent.ParameterDetailProperty(
+                            type="integer",
+                            description="optional maximum number of characters to return in this call",
+                            required=False
+                        ),
+                        "view": bedrock.CfnAgent.ParameterDetailProperty(
+                            type="string",
+                            description="optional document view, by default each agent receives only the parts of "
+                                        "the document it needs. Use 'full' to read the whole document",
+                            required=False
                         )
                     },
                     require_confirmation="DISABLED"
@@ -171,6 +266,11 @@ class StandaloneGenAiLayer(Stack):
                             type="string",
                             description="the S3 uri of the original document",
                             required=True
+                        ),
+                        "pages": bedrock.CfnAgent.ParameterDetailProperty(
+                            type="string",
+                            description="optional pages to analyse, e.g. '3-5,7'. All the pages by default",
+                            required=False
                         )
                     },
                     require_confirmation="DISABLED"
@@ -184,7 +284,6 @@ class StandaloneGenAiLayer(Stack):
 
         agent_resource_role = self.create_agent_execution_role()
 
-        agent_loader = AgentLoader("stacks/configuration/agent_config.yaml")
         self.sow_agents = agent_loader.load_agents(
             agent_resource_role=agent_resource_role,
             agent_available_tools=agent_available_tools
@@ -1,8 +1,21 @@
 # tests/conftest.py
+import io
+import os
+import sys
+
 import pytest
 from aws_cdk import App
 from aws_cdk import Environment
 
+# The Lambda sources are packaged as flat images, expose their roots the same way the images do
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _lambda_root in (
+        os.path.join(BACKEND_ROOT, "code", "services"),
+        os.path.join(BACKEND_ROOT, "code", "services", "lambdas", "multi_agent_handlers"),
+):
+    if _lambda_root not in sys.path:
+        sys.path.insert(0, _lambda_root)
+
 @pytest.fixture(scope="function")
 def app():
     return App()
@@ -38,4 +51,276 @@ def mock_agent_action_group_property():
             ]
         },
         'description': 'Mock action group for testing purposes'
-    }
\ No newline at end of file
+    }
+
+
+class ChunkedBody(io.BytesIO):
+    """S3 body recording the size of every read."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+class FakeS3Client:
+    """
+    In-memory S3 client of the tool tests, buckets are ignored. Records the calls, the downloads and their
+    IfMatch header; the ETag of an object is derived from its key.
+    """
+
+    def __init__(self, objects=None, content_length=True, storage_classes=None, metadata=None):
+        self.objects = dict(objects or {})
+        self.content_length = content_length
+        self.storage_classes = dict(storage_classes or {})
+        self.metadata = dict(metadata or {})
+        self.calls = []
+        self.bodies = []
+        self.if_match = []
+        self.copies = []
+
+    @property
+    def downloads(self):
+        return len(self.bodies)
+
+    def _existing(self, operation, Key):
+        self.calls.append((operation, Key))
+        if Key not in self.objects:
+            raise KeyError(Key)
+        return self.objects[Key]
+
+    def head_object(self, Bucket, Key):
+        self._existing("head_object", Key)
+        return {"ETag": '"etag-%s"' % Key, "ContentType": "application/pdf",
+                "Metadata": dict(self.metadata.get(Key, {}))}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        body = ChunkedBody(self._existing("get_object", Key))
+        self.bodies.append(body)
+        self.if_match.append(kwargs.get("IfMatch"))
+        response = {"Body": body}
+        if self.content_length:
+            response["ContentLength"] = len(body.getvalue())
+        return response
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append(("put_object", Key))
+        self.objects[Key] = Body
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken="0"):
+        """Pages of 2 objects, to go through the pagination."""
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        start = int(ContinuationToken)
+        page = [{"Key": key, "StorageClass": self.storage_classes.get(key, "STANDARD")}
+                for key in keys[start:start + 2]]
+        return {"Contents": page, "IsTruncated": start + 2 < len(keys), "NextContinuationToken": str(start + 2)}
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective, ContentType, Metadata, StorageClass):
+        assert CopySource == {"Bucket": Bucket, "Key": Key} and MetadataDirective == "REPLACE"
+        self.copies.append(Key)
+        self.metadata[Key] = Metadata
+        self.storage_classes[Key] = StorageClass
+
+
+class FakeClock:
+    """Clock advanced by the sleeps of the code under test, nothing really waits."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeSts:
+    arn = "arn:aws:sts::123456789012:assumed-role/oss-index-cr/session"
+
+    def get_caller_identity(self):
+        return {"Arn": self.arn}
+
+
+class FakeOssClient:
+    """opensearchserverless control plane: a policy update is visible after `visible_after` reads."""
+
+    def __init__(self, principals, visible_after=0):
+        self.principals = list(principals)
+        self.pending_principals = None
+        self.visible_after = visible_after
+        self.updates = 0
+
+    def get_access_policy(self, name, type):
+        if self.pending_principals is not None:
+            if self.visible_after == 0:
+                self.principals, self.pending_principals = self.pending_principals, None
+            self.visible_after -= 1
+        return {"accessPolicyDetail": {"policyVersion": "v1", "policy": [{"Principal": list(self.principals)}]}}
+
+    def update_access_policy(self, name, policyVersion, policy, description, type):
+        import json
+
+        self.updates += 1
+        self.pending_principals = json.loads(policy)[0]["Principal"]
+        return {}
+
+
+class FakeIndices:
+    """`indices` API of the opensearch-py client over a FakeCluster."""
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def exists(self, index):
+        self.cluster.answer("exists")
+        return index in self.cluster.indices or index in self.cluster.aliases
+
+    def exists_alias(self, name):
+        self.cluster.answer("exists_alias")
+        return name in self.cluster.aliases
+
+    def create(self, index_name, body):
+        self.cluster.answer("create")
+        self.cluster.indices[index_name] = []
+        self.cluster.changed()
+        return {"acknowledged": True, "index": index_name}
+
+    def get(self, index):
+        from opensearchpy import NotFoundError
+
+        self.cluster.answer("get")
+        if index not in self.cluster.indices:
+            raise NotFoundError(404, "index_not_found_exception")
+        return {index: {}}
+
+    def get_alias(self, name):
+        from opensearchpy import NotFoundError
+
+        self.cluster.answer("get_alias")
+        if name not in self.cluster.aliases:
+            raise NotFoundError(404, "alias_not_found")
+        return {self.cluster.aliases[name]: {"aliases": {name: {}}}}
+
+    def update_aliases(self, body):
+        self.cluster.answer("update_aliases")
+        # Atomic: the alias is resolved again only once every action is applied
+        for action in body["actions"]:
+            if "remove" in action:
+                del self.cluster.aliases[action["remove"]["alias"]]
+            else:
+                self.cluster.aliases[action["add"]["alias"]] = action["add"]["index"]
+        self.cluster.changed()
+        return {"acknowledged": True}
+
+    def delete(self, index):
+        from opensearchpy import NotFoundError
+
+        self.cluster.answer("delete")
+        if index not in self.cluster.indices:
+            raise NotFoundError(404, "index_not_found_exception")
+        self.cluster.pending_deletion = index
+        self.cluster.deleted_visible_after = self.cluster.delete_delay
+        return {"acknowledged": True}
+
+
+class FakeHttpClient:
+    """opensearch-py client of a FakeCluster."""
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.indices = FakeIndices(cluster)
+
+    def search(self, index, body):
+        from opensearchpy import NotFoundError
+
+        self.cluster.answer("search")
+        name = self.cluster.aliases.get(index, index)
+        if name not in self.cluster.indices:
+            raise NotFoundError(404, "index_not_found_exception")
+        return {"hits": {"hits": self.cluster.indices[name][:1]}}
+
+    def reindex(self, body, refresh, request_timeout):
+        self.cluster.answer("reindex")
+        source, dest = body["source"]["index"], body["dest"]["index"]
+        self.cluster.reindexed.append((source, dest))
+        self.cluster.indices[dest] = list(self.cluster.indices[source])
+        return {"total": len(self.cluster.indices[dest]), "failures": []}
+
+
+class FakeCluster:
+    """
+    In-memory OpenSearch collection: documents per index and aliases. Every call answers the next scripted error
+    of its operation, then succeeds; a deleted index is still listed by the next `delete_delay` `exists` calls.
+    Once `serving`, every moment the `watched_alias` queried by the knowledge base resolves to no index is
+    recorded in `query_gaps`.
+    """
+
+    def __init__(self, errors=None, delete_delay=0, watched_alias=None):
+        self.errors = {operation: list(scripted) for operation, scripted in (errors or {}).items()}
+        self.calls = []
+        self.indices = {}
+        self.aliases = {}
+        self.reindexed = []
+        self.delete_delay = delete_delay
+        self.pending_deletion = None
+        self.deleted_visible_after = 0
+        self.watched_alias = watched_alias
+        self.serving = False
+        self.query_gaps = []
+
+    def client(self):
+        return FakeHttpClient(self)
+
+    def answer(self, operation):
+        self.calls.append(operation)
+        if operation == "exists" and self.pending_deletion:
+            if self.deleted_visible_after == 0:
+                self._remove(self.pending_deletion)
+            self.deleted_visible_after -= 1
+        if self.errors.get(operation):
+            raise self.errors[operation].pop(0)
+
+    def _remove(self, index):
+        self.pending_deletion = None
+        del self.indices[index]
+        self.aliases = {alias: target for alias, target in self.aliases.items() if target != index}
+        self.changed()
+
+    def changed(self):
+        watched = self.watched_alias
+        if self.serving and self.aliases.get(watched) not in self.indices and watched not in self.indices:
+            self.query_gaps.append(dict(self.aliases))
+
+
+@pytest.fixture(scope="function")
+def make_s3_client():
+    """Factory of in-memory S3 clients: make_s3_client({"sow.pdf": pdf_bytes})."""
+    return FakeS3Client
+
+
+@pytest.fixture(scope="function")
+def fake_clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope="function")
+def fake_sts():
+    return FakeSts()
+
+
+@pytest.fixture(scope="function")
+def make_oss_client():
+    """Factory of opensearchserverless clients: make_oss_client(principals, visible_after=0)."""
+    return FakeOssClient
+
+
+@pytest.fixture(scope="function")
+def make_cluster():
+    """Factory of in-memory OpenSearch collections, `.client()` is their opensearch-py client."""
+    return FakeCluster
@@ -60,4 +60,26 @@ def test_load_agents(mock_agent_resource_role, mock_agent_available_tools):
         agent = agents["analyse_image_sow"]
         assert agent.agent_name == "TestProject-AnalyseImageSoW", "Agent name should be correctly constructed"
         assert agent.activate, "Agent should be active"
-        assert agent.agent_action_group[0] == mock_agent_available_tools["group1"], "Agent action group should be correctly resolved"
\ No newline at end of file
+        assert agent.agent_action_group[0] == mock_agent_available_tools["group1"], "Agent action group should be correctly resolved"
+
+def test_get_document_views():
+    yaml_with_views = mock_yaml_data + """
+    document_view:
+      sections: ["Investment"]
+      keywords: ["cost"]
+  supervisor:
+    agent_name: "${project_name}-SupervisorAgent"
+    instruction_file: "SupervisorAgent.xml"
+    activate: true
+    supervisor: true
+"""
+    with patch("stacks.agent_loader.open", mock_open(read_data=yaml_with_views)):
+        loader = AgentLoader("mock_agent_config.yaml")
+
+    assert loader.get_document_views() == {
+        "analyse_image_sow": {
+            "agent_name": "TestProject-AnalyseImageSoW",
+            "sections": ["Investment"],
+            "keywords": ["cost"],
+        }
+    }
@@ -0,0 +1,53 @@
+# tests/unit/test_aws_clients.py
+import os
+
+import pytest
+
+from lambdas import aws_clients
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REGISTRY_COPIES = [
+    "code/services/lambdas/aws_clients.py",
+    "code/services/lambdas/multi_agent_handlers/agent_tools/aws_clients.py",
+    "stacks/cr/aws_clients.py",
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setenv("AWS_REGION", "eu-west-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    aws_clients.clear_clients()
+    yield
+    aws_clients.clear_clients()
+
+
+def test_clients_are_created_once():
+    assert aws_clients.get_client("s3") is aws_clients.get_client("s3")
+    assert aws_clients.get_client("s3") is not aws_clients.get_client("s3", region_name="us-east-1")
+
+
+def test_region_comes_from_configuration(monkeypatch):
+    monkeypatch.setenv("BEDROCK_REGION_NAME", "us-west-2")
+
+    assert aws_clients.get_client("bedrock-runtime").meta.region_name == "us-west-2"
+    assert aws_clients.get_client("bedrock-agent").meta.region_name == "eu-west-1"
+
+
+def test_clients_are_tuned_per_service():
+    bedrock_config = aws_clients.get_client("bedrock-runtime").meta.config
+    s3_config = aws_clients.get_client("s3").meta.config
+
+    assert bedrock_config.retries["mode"] == "adaptive"
+    assert bedrock_config.read_timeout == 300
+    assert bedrock_config.tcp_keepalive is True
+    assert s3_config.max_pool_connections == 16
+
+
+def test_registry_copies_are_identical():
+    contents = set()
+    for path in REGISTRY_COPIES:
+        with open(os.path.join(BACKEND_ROOT, path), encoding="utf-8") as registry_file:
+            contents.add(registry_file.read())
+    assert len(contents) == 1
@@ -0,0 +1,18 @@
+# tests/unit/test_cold_start.py
+import os
+import subprocess
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TOOLS_ROOT = os.path.join(BACKEND_ROOT, "code", "services", "lambdas", "multi_agent_handlers")
+
+
+def test_handler_import_defers_document_libraries():
+    environment = {**os.environ, "PYTHONPATH": TOOLS_ROOT, "AWS_REGION": "us-east-1", "AWS_DEFAULT_REGION": "us-east-1"}
+    completed = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, agent_tools.sow_reader; print(sorted({'fitz', 'docx', 'PIL'} & set(sys.modules)))"],
+        env=environment, capture_output=True, text=True, check=True,
+    )
+
+    assert completed.stdout.strip() == "[]"
@@ -0,0 +1,129 @@
+# tests/unit/test_describe_images.py
+import json
+import random
+import time
+
+import pytest
+
+from agent_tools import tools_utils
+from agent_tools.image_dedup import DescriptionMemo
+
+
+@pytest.fixture(autouse=True)
+def tool_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image")
+    monkeypatch.setenv("LLM_MODEL_AGENT", "anthropic.claude-3-sonnet-20240229-v1:0")
+    monkeypatch.setattr(tools_utils, "description_memo", DescriptionMemo(str(tmp_path / "memo.sqlite3")))
+
+
+def _images(count):
+    return [{"page": 3 + index // 2, "image_index": index % 2, "image_base64": f"img-{index}"} for index in range(count)]
+
+
+def test_describe_images_keeps_order(monkeypatch):
+    def fake_describe(image_base64, media_type="image/jpeg"):
+        time.sleep(random.uniform(0, 0.01))
+        return f"description of {image_base64}"
+
+    monkeypatch.setattr(tools_utils, "llm_describe_image", fake_describe)
+    images = _images(10)
+
+    described = tools_utils.describe_images(images, max_workers=4)
+
+    assert [(image["page"], image["image_index"]) for image in described] == \
+           [(image["page"], image["image_index"]) for image in images]
+    assert described[7]["image_described"] == "description of img-7"
+
+
+def test_describe_images_isolates_failures(monkeypatch):
+    def fake_describe(image_base64, media_type="image/jpeg"):
+        if image_base64 == "img-1":
+            raise RuntimeError("ThrottlingException")
+        return "ok"
+
+    monkeypatch.setattr(tools_utils, "llm_describe_image", fake_describe)
+
+    described = tools_utils.describe_images(_images(3), max_workers=2)
+
+    assert [image["image_described"] for image in described] == ["ok", None, "ok"]
+    assert described[1]["error"] == "ThrottlingException"
+
+
+def test_describe_images_bounds_concurrency(monkeypatch):
+    in_flight = []
+    peak = []
+
+    def fake_describe(image_base64, media_type="image/jpeg"):
+        in_flight.append(image_base64)
+        peak.append(len(in_flight))
+        time.sleep(0.01)
+        in_flight.remove(image_base64)
+        return "ok"
+
+    monkeypatch.setattr(tools_utils, "llm_describe_image", fake_describe)
+    tools_utils.describe_images(_images(12), max_workers=3)
+
+    assert max(peak) <= 3
+
+
+def test_describe_images_reuses_memoised_descriptions(monkeypatch):
+    calls = []
+
+    def fake_describe(image_base64, media_type="image/jpeg"):
+        calls.append(image_base64)
+        return f"description of {image_base64}"
+
+    monkeypatch.setattr(tools_utils, "llm_describe_image", fake_describe)
+    images = [{**image, "content_hash": f"hash-{index}"} for index, image in enumerate(_images(2))]
+
+    tools_utils.describe_images(images)
+    described = tools_utils.describe_images(images)
+
+    assert calls == ["img-0", "img-1"]
+    assert described[1]["image_described"] == "description of img-1"
+
+
+def test_batched_descriptions_are_split_per_image(monkeypatch):
+    requests = []
+
+    def fake_invoke(content, max_tokens=1000, **kwargs):
+        requests.append(content)
+        if len(content) == 2:
+            return f"single description of {content[0]['source']['data']}"
+        identifiers = [block["text"][len("Image "):-1] for block in content[:-1] if block["type"] == "text"]
+        return "Here you go:\n" + json.dumps({identifier: f"description of {identifier}" for identifier in identifiers})
+
+    monkeypatch.setattr(tools_utils, "_invoke_vision_model", fake_invoke)
+
+    described = tools_utils.describe_images(_images(5), batch_size=4)
+
+    assert len(requests) == 2
+    assert [image["image_described"] for image in described] == [
+        "description of p3-i0", "description of p3-i1", "description of p4-i0", "description of p4-i1",
+        "single description of img-4"]
+
+
+def test_batched_answer_gaps_fall_back_to_single_calls(monkeypatch):
+    single_calls = []
+
+    def fake_invoke(content, max_tokens=1000, **kwargs):
+        if len(content) == 2:
+            single_calls.append(content[0]["source"]["data"])
+            return "single description"
+        return '{"p3-i0": "batched description"}'
+
+    monkeypatch.setattr(tools_utils, "_invoke_vision_model", fake_invoke)
+
+    described = tools_utils.describe_images(_images(3), batch_size=3)
+
+    assert [image["image_described"] for image in described] == [
+        "batched description", "single description", "single description"]
+    assert single_calls == ["img-1", "img-2"]
+
+
+def test_pack_batches_respects_the_byte_budget():
+    images = [{"page": 1, "image_index": index, "image_base64": "x" * 400} for index in range(5)]
+
+    batches = tools_utils.pack_batches(images, batch_size=4, max_bytes=1000)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
@@ -0,0 +1,174 @@
+# tests/unit/test_document_block.py
+import fitz
+import pytest
+
+from agent_tools import document_block, tools_utils
+from agent_tools.document_block import (
+    converse_document,
+    document_name,
+    format_page_ranges,
+    parse_page_ranges,
+    split_pdf_pages,
+    split_transcription,
+)
+from agent_tools.extraction_cache import ExtractionCache
+
+
+def build_pdf(page_count, headers=None):
+    document = fitz.open()
+    for page_number in range(1, page_count + 1):
+        page = document.new_page()
+        page.insert_text((72, 72), f"Section {page_number} content")
+        if page_number in (headers or {}):
+            page.insert_text((72, 100), headers[page_number])
+    pdf_bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+class StubBedrockClient:
+    """
+    Answers Converse calls with the pages of the received document, behind page markers when the prompt asks for
+    them, and records the requests. Documents above `max_pages` pages get an answer cut by the token limit.
+    """
+
+    def __init__(self, stop_reason="end_turn", max_pages=None):
+        self.requests = []
+        self.stop_reason = stop_reason
+        self.max_pages = max_pages
+
+    def converse(self, modelId, messages, inferenceConfig):
+        self.requests.append({"modelId": modelId, "messages": messages, "inferenceConfig": inferenceConfig})
+        document = fitz.open(stream=messages[0]["content"][0]["document"]["source"]["bytes"], filetype="pdf")
+        marked = "=== Page" in messages[0]["content"][1]["text"]
+        text = "\n".join((f"=== Page {number} ===\n" if marked else "") + page.get_text().strip()
+                         for number, page in enumerate(document, start=1))
+        truncated = self.max_pages is not None and document.page_count > self.max_pages
+        document.close()
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "usage": {"inputTokens": 1000, "outputTokens": 50},
+            "metrics": {"latencyMs": 12},
+            "stopReason": "max_tokens" if truncated else self.stop_reason,
+        }
+
+
+def test_page_ranges_round_trip():
+    assert parse_page_ranges("3-5, 7, 40", 10) == [3, 4, 5, 7]
+    assert parse_page_ranges(None, 3) == [1, 2, 3]
+    assert format_page_ranges([3, 4, 5, 7]) == "3-5,7"
+    with pytest.raises(ValueError):
+        parse_page_ranges("three", 10)
+
+
+def test_split_pdf_pages_bounds_every_call():
+    chunks = split_pdf_pages(build_pdf(25), pages_per_call=10)
+
+    assert [pages for pages, _ in chunks] == [list(range(1, 10)), list(range(10, 18)), list(range(18, 26))]
+    selected = split_pdf_pages(build_pdf(25), pages="2,20-21", pages_per_call=10)
+    assert [pages for pages, _ in selected] == [[2, 20, 21]]
+    document = fitz.open(stream=selected[0][1], filetype="pdf")
+    assert [page.get_text().strip() for page in document] == [
+        "Section 2 content", "Section 20 content", "Section 21 content"]
+
+
+def test_converse_request_carries_document_then_prompt():
+    client = StubBedrockClient()
+
+    text, metrics = converse_document(client, "model", build_pdf(2), "Transcribe", document_name("sow/My SoW_v2.pdf"),
+                                      page_count=2, max_tokens=512)
+
+    content = client.requests[0]["messages"][0]["content"]
+    assert content[0]["document"]["format"] == "pdf"
+    assert content[0]["document"]["name"] == "My SoW v2"
+    assert content[1] == {"text": "Transcribe"}
+    assert client.requests[0]["inferenceConfig"] == {"maxTokens": 512}
+    assert text == "Section 1 content\nSection 2 content"
+    assert metrics["input_tokens"] == 1000 and metrics["model_latency_ms"] == 12
+
+
+@pytest.fixture
+def document_block_mode(monkeypatch, tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": build_pdf(12)})
+    client = StubBedrockClient()
+    monkeypatch.setattr(tools_utils, "s3_client", s3)
+    monkeypatch.setattr(tools_utils, "extraction_cache", ExtractionCache(s3, tmp_dir=str(tmp_path), use_s3_sidecar=False))
+    monkeypatch.setattr(tools_utils, "get_bedrock_client", lambda: client)
+    monkeypatch.setattr(document_block, "DOCUMENT_BLOCK_FUNCTIONS", {"get_document_from_s3", "analyse_images_documents"})
+    monkeypatch.setenv("LLM_MODEL_AGENT", "model")
+    monkeypatch.setenv("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image")
+    return s3, client
+
+
+def test_read_in_document_block_mode_is_cached(document_block_mode):
+    s3, client = document_block_mode
+
+    text = tools_utils.read_s3_url("s3://bucket/sow.pdf")
+    assert "Section 1 content" in text and "Section 12 content" in text
+    assert len(client.requests) == 2  # 12 pages, at most 10 per call
+
+    assert tools_utils.read_s3_url("s3://bucket/sow.pdf") == text
+    assert len(client.requests) == 2 and s3.downloads == 1
+
+
+def test_images_in_document_block_mode_use_the_page_selection(document_block_mode):
+    _, client = document_block_mode
+
+    described = tools_utils.describe_document_images("s3://bucket/sow.pdf", pages="3-4")
+
+    assert described == [{"pages": "3-4", "image_described": "Section 3 content\nSection 4 content"}]
+    assert client.requests[0]["messages"][0]["content"][1]["text"].startswith("Describe this image")
+
+
+def test_transcription_is_split_on_the_page_markers():
+    text = "=== Page 1 ===\nIntro\n=== Page 2 ===\nINVESTMENT\nTotal | 10\n=== Page 3 ===\nAnnex"
+
+    assert split_transcription(text, [4, 5, 6]) == ["Intro", "INVESTMENT\nTotal | 10", "Annex"]
+    # Without markers the whole answer is kept, on the first page of the chunk
+    assert split_transcription("Intro\nAnnex", [4, 5]) == ["Intro\nAnnex", ""]
+
+
+def test_sections_read_in_document_block_mode_report_document_pages(document_block_mode):
+    s3, _ = document_block_mode
+    s3.objects["sow.pdf"] = build_pdf(12, headers={11: "INVESTMENT"})
+
+    text = tools_utils.read_s3_url("s3://bucket/sow.pdf", sections="Investment")
+
+    assert text.startswith("=== INVESTMENT (pages 11-12) ===")
+    assert "=== Page" not in tools_utils.read_s3_url("s3://bucket/sow.pdf")
+
+
+def test_too_large_documents_fall_back_to_local_extraction(document_block_mode, monkeypatch):
+    _, client = document_block_mode
+    monkeypatch.setattr(tools_utils, "DOCUMENT_BLOCK_MAX_BYTES", 10)
+
+    text = tools_utils.read_s3_url("s3://bucket/sow.pdf")
+
+    assert "Section 12 content" in text
+    assert client.requests == []
+
+
+def test_truncated_answers_are_read_again_in_halves(document_block_mode):
+    s3, client = document_block_mode
+    s3.objects["sow.pdf"] = build_pdf(12, headers={11: "INVESTMENT"})
+    client.max_pages = 3
+
+    text = tools_utils.read_s3_url("s3://bucket/sow.pdf", sections="Investment")
+
+    assert text.startswith("=== INVESTMENT (pages 11-12) ===")
+    # 2 truncated calls of 6 pages, then 4 calls of 3 pages
+    assert [len(fitz.open(stream=request["messages"][0]["content"][0]["document"]["source"]["bytes"]))
+            for request in client.requests] == [6, 6, 3, 3, 3, 3]
+    cached = tools_utils.read_document_with_model("bucket", "sow.pdf", "get_document_from_s3")
+    assert [part["pages"] for part in cached] == ["1-3", "4-6", "7-9", "10-12"]
+    assert len(client.requests) == 6
+
+
+def test_truncated_single_pages_are_not_cached(document_block_mode):
+    _, client = document_block_mode
+    client.max_pages = 0
+
+    assert "Section 12 content" in tools_utils.read_s3_url("s3://bucket/sow.pdf")
+    calls = len(client.requests)
+    tools_utils.read_s3_url("s3://bucket/sow.pdf")
+    assert len(client.requests) == 2 * calls
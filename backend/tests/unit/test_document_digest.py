@@ -0,0 +1,175 @@
+# tests/unit/test_document_digest.py
+import io
+import json
+
+import fitz
+import pytest
+from PIL import Image, ImageDraw
+
+from agent_tools import tools_utils
+from agent_tools.document_digest import build_document_digest, digest_text, select_section_images
+from agent_tools.document_download import RetainedDocuments
+from agent_tools.extraction_cache import ExtractionCache
+from agent_tools.image_dedup import DescriptionMemo
+from agent_tools.image_normalizer import normalize_image
+
+
+def _png(seed):
+    image = Image.new("RGB", (320, 200), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([10 + seed * 40, 10, 60 + seed * 40, 150], fill="navy")
+    for offset in range(0, 320, 7):
+        draw.line([offset, 160, (offset * (seed + 3)) % 320, 199], fill=(offset % 255, 40 * seed, 90))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_sow_pdf():
+    """Cover, table of contents citing the sections, architecture section with a diagram and a repeated logo."""
+    logo, diagram = _png(0), _png(3)
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), "Statement of Work")
+    document.new_page().insert_text((72, 72), "Solution Architecture / Architectural Diagram ..... 3")
+    page = document.new_page()
+    page.insert_text((72, 72), "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM")
+    page.insert_image(fitz.Rect(72, 100, 392, 300), stream=diagram)
+    page.insert_image(fitz.Rect(72, 700, 136, 740), stream=logo)
+    page = document.new_page()
+    page.insert_text((72, 72), "Architecture details")
+    page.insert_image(fitz.Rect(72, 700, 136, 740), stream=logo)
+    pdf_bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+def test_pdf_digest_content():
+    digest = build_document_digest(build_sow_pdf(), "pdf")
+
+    assert digest["page_count"] == 4
+    assert digest["pages"][0]["width"] == pytest.approx(595, abs=1)
+    # The table of contents entry (dot leaders and page number) is not a header line
+    assert [section["page"] for section in digest["sections"]] == [3]
+    assert [(image["page"], image["image_index"]) for image in digest["images"]] == [(3, 0), (3, 1), (4, 0)]
+    assert "Statement of Work" in digest_text(digest)
+    # The digest is serialised once and shared, it must stay JSON friendly
+    assert json.loads(json.dumps(digest)) == digest
+
+
+def test_section_images_skip_table_of_contents():
+    digest = build_document_digest(build_sow_pdf(), "pdf")
+
+    selected = select_section_images(digest)
+
+    assert [(image["page"], image["section"]) for image in selected] == [
+        (3, "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM"),
+        (3, "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM"),
+        (4, "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM"),
+    ]
+
+
+def test_section_images_follow_the_configured_headers(monkeypatch):
+    monkeypatch.setenv("SECTION_HEADER_PATTERNS", json.dumps({"ARCHITECTURE ANNEX": r"ARCHITECTURE\s+DETAILS"}))
+
+    digest = build_document_digest(build_sow_pdf(), "pdf")
+
+    assert digest["sections"] == [{"name": "ARCHITECTURE ANNEX", "page": 4}]
+    assert [(image["page"], image["section"]) for image in select_section_images(digest)] == [
+        (4, "ARCHITECTURE ANNEX")]
+
+
+def test_images_of_other_sections_are_not_selected():
+    document = fitz.open(stream=build_sow_pdf(), filetype="pdf")
+    page = document.new_page(pno=2)
+    page.insert_text((72, 72), "SCOPE OF WORK")
+    page.insert_image(fitz.Rect(72, 100, 392, 300), stream=_png(1))
+    page = document.new_page()
+    page.insert_text((72, 72), "INVESTMENT")
+    page.insert_image(fitz.Rect(72, 100, 392, 300), stream=_png(2))
+    pdf_bytes = document.tobytes()
+    document.close()
+
+    digest = build_document_digest(pdf_bytes, "pdf")
+
+    assert [section["name"] for section in digest["sections"]] == [
+        "SCOPE OF WORK - TECHNICAL PROJECT PLAN", "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM", "INVESTMENT"]
+    assert [(image["page"], image["section"]) for image in select_section_images(digest)] == [
+        (4, "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM"),
+        (4, "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM"),
+        (5, "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM"),
+    ]
+
+
+def test_both_tools_share_a_single_download(monkeypatch, tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": build_sow_pdf()})
+    monkeypatch.setattr(tools_utils, "s3_client", s3)
+    monkeypatch.setattr(tools_utils, "extraction_cache", ExtractionCache(s3, tmp_dir=str(tmp_path)))
+    monkeypatch.setattr(tools_utils, "image_descriptions_cache",
+                        ExtractionCache(s3, tmp_dir=str(tmp_path), use_s3_sidecar=False))
+    monkeypatch.setattr(tools_utils, "retained_documents", RetainedDocuments(tmp_dir=str(tmp_path / "retained")))
+    monkeypatch.setattr(tools_utils, "description_memo", DescriptionMemo(str(tmp_path / "memo.sqlite3")))
+    monkeypatch.setattr(tools_utils, "llm_describe_image", lambda image_base64, media_type: "a diagram")
+    monkeypatch.setenv("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image")
+    monkeypatch.setenv("LLM_MODEL_AGENT", "model")
+
+    assert "Architecture details" in tools_utils.read_s3_url("s3://bucket/sow.pdf")
+    described = tools_utils.describe_document_images("s3://bucket/sow.pdf")
+    # The image payloads are read from the PDF retained by the digest build
+    assert s3.downloads == 1
+    assert s3.if_match == ['"etag-sow.pdf"']
+    assert [image.get("image_described") for image in described] == ["a diagram", "a diagram", None]
+    assert described[2]["duplicate_of"] == {"page": 3, "image_index": 1}
+
+    # Every description is memoised now, the PDF is not downloaded again
+    tools_utils.describe_document_images("s3://bucket/sow.pdf")
+    assert s3.downloads == 1
+
+
+def test_image_payloads_are_downloaded_at_the_digest_version(monkeypatch, tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": build_sow_pdf()})
+    monkeypatch.setattr(tools_utils, "s3_client", s3)
+    # Nothing retained: the digest was built by another container
+    monkeypatch.setattr(tools_utils, "retained_documents", RetainedDocuments(max_bytes=0, tmp_dir=str(tmp_path)))
+    digest = build_document_digest(build_sow_pdf(), "pdf")
+
+    loader = tools_utils.PdfImageLoader("s3://bucket/sow.pdf", etag='"etag-sow.pdf"')
+    try:
+        payload = loader(digest["images"][0])
+    finally:
+        loader.close()
+
+    assert payload["image_base64"]
+    assert s3.if_match == ['"etag-sow.pdf"']
+
+
+def test_skipped_images_do_not_block_the_descriptions_cache(monkeypatch, tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": build_sow_pdf()})
+    calls = []
+    monkeypatch.setattr(tools_utils, "s3_client", s3)
+    monkeypatch.setattr(tools_utils, "extraction_cache", ExtractionCache(s3, tmp_dir=str(tmp_path)))
+    monkeypatch.setattr(tools_utils, "image_descriptions_cache",
+                        ExtractionCache(s3, tmp_dir=str(tmp_path), use_s3_sidecar=False))
+    monkeypatch.setattr(tools_utils, "retained_documents", RetainedDocuments(tmp_dir=str(tmp_path / "retained")))
+    monkeypatch.setattr(tools_utils, "description_memo", DescriptionMemo(str(tmp_path / "memo.sqlite3")))
+    monkeypatch.setattr(tools_utils, "llm_describe_image",
+                        lambda image_base64, media_type: calls.append(media_type) or "a diagram")
+    monkeypatch.setenv("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image")
+    monkeypatch.setenv("LLM_MODEL_AGENT", "model")
+
+    def normalize_or_skip_logo(image_bytes):
+        # The logo is the image with the navy bar on the left
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            if image.convert("RGB").getpixel((15, 15)) != (255, 255, 255):
+                return {"original_bytes": len(image_bytes), "normalized_bytes": 0,
+                        "skipped": "below size threshold (20x20, 300 bytes)"}
+        return normalize_image(image_bytes)
+
+    monkeypatch.setattr(tools_utils, "normalize_image", normalize_or_skip_logo)
+
+    described = tools_utils.describe_document_images("s3://bucket/sow.pdf")
+
+    assert described[1] == {"page": 3, "image_index": 1, "image_described": None,
+                            "skipped": "Image not sent to the LLM: below size threshold (20x20, 300 bytes)"}
+    assert not any("error" in image for image in described)
+    assert tools_utils.describe_document_images("s3://bucket/sow.pdf") == described
+    assert len(calls) == 1 and s3.downloads == 1
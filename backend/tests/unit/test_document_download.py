@@ -0,0 +1,61 @@
+# tests/unit/test_document_download.py
+import os
+
+import pytest
+
+from agent_tools.document_download import DocumentTooLargeError, RetainedDocuments, fetch_s3_document
+
+
+def test_small_documents_stay_in_memory(tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": b"small document"})
+
+    with fetch_s3_document(s3, "bucket", "sow.pdf", to_disk_min_bytes=1024, tmp_dir=str(tmp_path)) as document:
+        assert document == b"small document"
+    assert os.listdir(tmp_path) == []
+
+
+def test_large_documents_are_streamed_to_disk(tmp_path, make_s3_client):
+    data = os.urandom(10 * 1024)
+    s3 = make_s3_client({"sow.pdf": data})
+
+    with fetch_s3_document(s3, "bucket", "sow.pdf", to_disk_min_bytes=1024, tmp_dir=str(tmp_path),
+                           chunk_bytes=1024) as document:
+        assert document.endswith(".pdf")
+        with open(document, "rb") as document_file:
+            assert document_file.read() == data
+    # Never a single read of the whole body, and the file is removed once the document is processed
+    assert set(s3.bodies[0].reads) == {1024}
+    assert os.listdir(tmp_path) == []
+
+
+def test_documents_above_the_limit_are_rejected(tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": b"x" * 4096})
+
+    with pytest.raises(DocumentTooLargeError):
+        with fetch_s3_document(s3, "bucket", "sow.pdf", max_bytes=1024, tmp_dir=str(tmp_path)):
+            pass
+    assert s3.bodies[0].reads == []
+
+
+def test_limit_is_enforced_without_content_length(tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": b"x" * 4096}, content_length=False)
+
+    with pytest.raises(DocumentTooLargeError):
+        with fetch_s3_document(s3, "bucket", "sow.pdf", max_bytes=1024, tmp_dir=str(tmp_path), chunk_bytes=512):
+            pass
+    assert os.listdir(tmp_path) == []
+
+
+def test_retained_documents_are_kept_per_version_within_the_byte_budget(tmp_path, make_s3_client):
+    s3 = make_s3_client({"sow.pdf": b"x" * 4096})
+    retained = RetainedDocuments(max_bytes=6000, tmp_dir=str(tmp_path / "retained"))
+
+    with fetch_s3_document(s3, "bucket", "sow.pdf", to_disk_min_bytes=1024, tmp_dir=str(tmp_path)) as path:
+        retained_path = retained.put("bucket", "sow.pdf", '"v1"', path)
+    assert os.path.exists(retained_path)  # moved out of the download, not removed with it
+    assert retained.get("bucket", "sow.pdf", '"v1"') == retained_path
+    assert retained.get("bucket", "sow.pdf", '"v2"') is None
+
+    retained.put("bucket", "other.pdf", '"v1"', b"y" * 4096)
+    assert retained.get("bucket", "sow.pdf", '"v1"') is None  # evicted, both do not fit
+    assert not os.path.exists(retained_path)
@@ -0,0 +1,83 @@
+# tests/unit/test_document_views.py
+from agent_tools import document_views, sow_reader, tools_utils
+from agent_tools.document_views import apply_view, extract_keyword_slices, resolve_view
+
+PAGES = [
+    "Statement of Work\nTable of contents\nInvestment ... 4",
+    "1. Executive Summary\nThe customer wants to migrate 40 workloads.\nThe budget is approved by the CFO.",
+    "2. Summary of Milestones & Deliverables\nM1 Landing zone - week 2\nM2 Migration - week 6",
+    "3. Investment\nTotal: 120k USD\nFunded by the MAP program.",
+]
+
+VIEWS = {
+    "business_financial_validation": {
+        "agent_name": "sow-BusinessFinancialValidationAgent",
+        "sections": ["Investment"],
+        "keywords": ["budget", "USD"],
+    },
+    "delivery_milestones_validation": {
+        "agent_name": "sow-DeliveryMilestonesValidationAgent",
+        "sections": ["Milestones & Deliverables"],
+        "keywords": [],
+    },
+}
+
+
+def test_view_resolution_order():
+    assert resolve_view(agent_name="sow-DeliveryMilestonesValidationAgent", views=VIEWS)[0] == \
+        "delivery_milestones_validation"
+    # The session attribute and the parameter take precedence over the calling agent
+    assert resolve_view(agent_name="sow-DeliveryMilestonesValidationAgent",
+                        session_attributes={"document_view": "business_financial_validation"},
+                        views=VIEWS)[0] == "business_financial_validation"
+    assert resolve_view("full", agent_name="sow-DeliveryMilestonesValidationAgent", views=VIEWS) == (None, None)
+    assert resolve_view(agent_name="sow-SupervisorAgent", views=VIEWS) == (None, None)
+
+
+def test_view_returns_sections_and_keyword_matches():
+    text = apply_view(PAGES, "business_financial_validation", VIEWS["business_financial_validation"],
+                      context_lines=0)
+
+    assert "=== INVESTMENT (pages 4-4) ===\n3. Investment\nTotal: 120k USD" in text
+    assert "=== KEYWORD MATCHES (budget, USD) ===\nThe budget is approved by the CFO." in text
+    # The match inside the returned section is not repeated, the other sections are left out
+    assert text.count("120k USD") == 1
+    assert "Landing zone" not in text and "migrate" not in text
+    assert "view=full" in text
+
+
+def test_view_without_match_returns_none():
+    view = {"sections": ["Out of Scope"], "keywords": ["GDPR"]}
+
+    assert apply_view(PAGES, "risk_compliance", view) is None
+
+
+def test_keyword_slices_merge_overlapping_context():
+    text = "a\nbudget one\nb\nbudget two\nc\nd\ne\nf"
+
+    assert extract_keyword_slices(text, ["budget"], context_lines=1) == ["a\nbudget one\nb\nbudget two\nc"]
+    # Whole words only
+    assert extract_keyword_slices("AIRLINE\nAI model", ["AI"], context_lines=0) == ["AI model"]
+
+
+def test_handler_applies_the_view_of_the_calling_agent(monkeypatch):
+    monkeypatch.setattr(document_views, "DOCUMENT_VIEWS", VIEWS)
+    monkeypatch.setattr(tools_utils, "get_document_digest", lambda bucket_name, s3_key: {
+        "page_count": len(PAGES), "pages": [{"page": index + 1, "text": text} for index, text in enumerate(PAGES)]})
+
+    def call(**parameters):
+        event = {
+            "messageVersion": "1.0",
+            "agent": {"name": "sow-DeliveryMilestonesValidationAgent"},
+            "actionGroup": "lambda_processing_sow",
+            "function": "get_document_from_s3",
+            "parameters": [{"name": name, "type": "string", "value": value} for name, value in parameters.items()],
+        }
+        return sow_reader.lambda_handler(event, None)["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
+
+    scoped = call(s3_uri_path="s3://bucket/sow.pdf")
+    assert "M2 Migration - week 6" in scoped
+    assert "120k USD" not in scoped
+    assert "120k USD" in call(s3_uri_path="s3://bucket/sow.pdf", view="full")
+    # Explicit sections win over the view
+    assert "120k USD" in call(s3_uri_path="s3://bucket/sow.pdf", sections="Investment")
@@ -0,0 +1,77 @@
+# tests/unit/test_extraction_cache.py
+import json
+
+import pytest
+
+from agent_tools import tools_utils
+from agent_tools.extraction_cache import ExtractionCache, build_cache_key, SIDECAR_SUFFIX
+
+
+@pytest.fixture
+def fake_s3(monkeypatch, tmp_path, make_s3_client):
+    client = make_s3_client({"sow.txt": b"Statement of work"})
+    cache = ExtractionCache(client, tmp_dir=str(tmp_path), use_s3_sidecar=False)
+    monkeypatch.setattr(tools_utils, "s3_client", client)
+    monkeypatch.setattr(tools_utils, "extraction_cache", cache)
+    return client, cache
+
+
+def test_cache_key_changes_with_etag():
+    assert build_cache_key("bucket", "key", '"etag-1"') == build_cache_key("bucket", "key", "etag-1")
+    assert build_cache_key("bucket", "key", "etag-1") != build_cache_key("bucket", "key", "etag-2")
+
+
+def test_repeated_reads_skip_download(fake_s3):
+    client, cache = fake_s3
+
+    assert tools_utils.read_s3_url("s3://bucket/sow.txt") == "Statement of work"
+    assert tools_utils.read_s3_url("s3://bucket/sow.txt") == "Statement of work"
+
+    assert [call for call in client.calls if call[0] == "get_object"] == [("get_object", "sow.txt")]
+    stats = cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_tmp_tier_survives_new_container(fake_s3, tmp_path):
+    client, cache = fake_s3
+    tools_utils.read_s3_url("s3://bucket/sow.txt")
+
+    warm_cache = ExtractionCache(client, tmp_dir=str(tmp_path), use_s3_sidecar=False)
+    etag = client.head_object(Bucket="bucket", Key="sow.txt")["ETag"]
+    assert warm_cache.get("bucket", "sow.txt", etag)["pages"][0]["text"] == "Statement of work"
+    assert warm_cache.get_stats()["tmp_hits"] == 1
+
+
+def test_s3_sidecar_tier(tmp_path, make_s3_client):
+    client = make_s3_client()
+    writer = ExtractionCache(client, tmp_dir=str(tmp_path / "writer"), use_s3_sidecar=True)
+    writer.put("bucket", "sow.pdf", "etag-1", {"text": "hello"})
+
+    sidecar = json.loads(client.objects[f"sow.pdf{SIDECAR_SUFFIX}"])
+    assert sidecar["payload"] == {"text": "hello"}
+
+    reader = ExtractionCache(client, tmp_dir=str(tmp_path / "reader"), use_s3_sidecar=True)
+    assert reader.get("bucket", "sow.pdf", "etag-1") == {"text": "hello"}
+    assert reader.get("bucket", "sow.pdf", "etag-2") is None
+    assert reader.get_stats()["s3_hits"] == 1
+
+
+def test_s3_sidecar_per_variant(tmp_path, make_s3_client):
+    client = make_s3_client()
+    writer = ExtractionCache(client, tmp_dir=str(tmp_path / "writer"), use_s3_sidecar=True)
+    writer.put("bucket", "sow.pdf", "etag-1", {"sections": []})
+    writer.put("bucket", "sow.pdf", "etag-1", {"pages": []}, variant="document_block/all")
+
+    assert len([call for call in client.calls if call[0] == "put_object"]) == 2
+    reader = ExtractionCache(client, tmp_dir=str(tmp_path / "reader"), use_s3_sidecar=True)
+    assert reader.get("bucket", "sow.pdf", "etag-1") == {"sections": []}
+    assert reader.get("bucket", "sow.pdf", "etag-1", variant="document_block/all") == {"pages": []}
+    assert reader.get_stats()["s3_hits"] == 2
+
+
+def test_memory_tier_is_bounded(tmp_path, make_s3_client):
+    cache = ExtractionCache(make_s3_client(), max_entries=2, tmp_dir=str(tmp_path), use_s3_sidecar=False)
+    for index in range(3):
+        cache.put("bucket", f"doc-{index}.pdf", "etag", {"text": str(index)})
+    assert len(cache._memory) == 2
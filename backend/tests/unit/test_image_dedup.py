@@ -0,0 +1,66 @@
+# tests/unit/test_image_dedup.py
+import io
+
+from PIL import Image, ImageDraw
+
+from agent_tools.image_dedup import DescriptionMemo, content_hash, deduplicate_images
+
+
+def _diagram(size, boxes, image_format="PNG", labels=()):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle([int(coordinate * size[0] / 100) for coordinate in box], outline="black", width=3)
+    for box, label in zip(boxes, labels):
+        draw.text((int(box[0] * size[0] / 100) + 6, int(box[1] * size[0] / 100) + 6), label, fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def _entry(page, image_index, image_bytes, xref):
+    return {"page": page, "image_index": image_index, "xref": xref, "image_base64": "...",
+            "content_hash": content_hash(image_bytes)}
+
+
+def test_deduplicate_images_by_xref_and_content():
+    logo = _diagram((120, 40), [(5, 5, 30, 35)])
+    diagram = _diagram((400, 300), [(50, 5, 95, 70)])
+    images = [
+        _entry(3, 0, logo, xref=10),
+        _entry(3, 1, diagram, xref=11),
+        _entry(4, 0, logo, xref=10),
+        _entry(5, 0, logo, xref=20),
+    ]
+
+    deduplicated = deduplicate_images(images)
+
+    assert [image.get("duplicate_of") for image in deduplicated] == [
+        None,
+        None,
+        {"page": 3, "image_index": 0},
+        {"page": 3, "image_index": 0},
+    ]
+    assert "image_base64" not in deduplicated[2]
+
+
+def test_same_layout_with_other_labels_is_described():
+    boxes = [(5, 5, 35, 25), (60, 5, 95, 25), (30, 40, 70, 60)]
+    images = [
+        _entry(7, 0, _diagram((400, 300), boxes, labels=("ALB", "ECS", "RDS")), xref=30),
+        _entry(8, 0, _diagram((400, 300), boxes, labels=("API GW", "Lambda", "DynamoDB")), xref=31),
+        # Re-encoded copies are not merged either, they get their own description
+        _entry(9, 0, _diagram((400, 300), boxes, image_format="JPEG", labels=("ALB", "ECS", "RDS")), xref=32),
+    ]
+
+    assert [image.get("duplicate_of") for image in deduplicate_images(images)] == [None, None, None]
+
+
+def test_description_memo_is_persistent(tmp_path):
+    memo_path = str(tmp_path / "memo.sqlite3")
+    DescriptionMemo(memo_path).put("hash", "prompt", "model", "a logo")
+
+    memo = DescriptionMemo(memo_path)
+    assert memo.get("hash", "prompt", "model") == "a logo"
+    assert memo.get("hash", "another prompt", "model") is None
+    assert (memo.hits, memo.misses) == (1, 1)
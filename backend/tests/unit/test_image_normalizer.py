@@ -0,0 +1,62 @@
+# tests/unit/test_image_normalizer.py
+import base64
+import io
+import os
+
+from PIL import Image
+
+from agent_tools.image_normalizer import normalize_image, summarize_normalization
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def test_large_image_is_downscaled_and_reencoded():
+    noisy = Image.frombytes("RGB", (3000, 2000), os.urandom(3000 * 2000 * 3))
+    png_bytes = _encode(noisy, "PNG")
+
+    normalized = normalize_image(png_bytes, max_edge=1000, max_pixels=10_000_000)
+
+    decoded = Image.open(io.BytesIO(base64.b64decode(normalized["image_base64"])))
+    assert decoded.format == "JPEG"
+    assert normalized["media_type"] == "image/jpeg"
+    assert max(decoded.size) == 1000
+    assert normalized["normalized_bytes"] < normalized["original_bytes"]
+
+
+def test_pixel_budget_is_enforced():
+    image = Image.new("RGB", (1500, 1500), "white")
+
+    normalized = normalize_image(_encode(image, "PNG"), max_edge=4000, max_pixels=1_000_000, min_bytes=0)
+
+    assert normalized["width"] * normalized["height"] <= 1_000_000
+
+
+def test_real_format_is_reported_when_original_is_kept():
+    small_png = _encode(Image.new("RGB", (200, 100), "white"), "PNG")
+
+    normalized = normalize_image(small_png, min_bytes=0)
+
+    assert normalized["media_type"] == "image/png"
+    assert base64.b64decode(normalized["image_base64"]) == small_png
+
+
+def test_tiny_images_are_skipped():
+    icon = _encode(Image.new("RGB", (16, 16), "black"), "PNG")
+
+    normalized = normalize_image(icon)
+
+    assert normalized["skipped"].startswith("below size threshold")
+    assert "image_base64" not in normalized
+
+
+def test_summarize_normalization():
+    summary = summarize_normalization([
+        {"original_bytes": 1000, "normalized_bytes": 400, "skipped": None},
+        {"original_bytes": 50, "normalized_bytes": 0, "skipped": "below size threshold"},
+    ])
+    assert summary == {"images": 2, "skipped_images": 1, "original_bytes": 1050,
+                       "normalized_bytes": 400, "bytes_saved": 650}
@@ -0,0 +1,77 @@
+# tests/unit/test_index_templates.py
+import pytest
+
+from lambdas.bedrock_kb_lambda.index_templates import VECTOR_FIELD_NAME, build_index_request, validate_index_settings
+
+# Index request hardcoded per model before the settings were configurable
+LEGACY_TITAN_V2_REQUEST = {
+    "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
+    "mappings": {
+        "properties": {
+            "bedrock-knowledge-base-default-vector": {
+                "type": "knn_vector",
+                "dimension": 1024,
+                "method": {
+                    "name": "hnsw",
+                    "engine": "faiss",
+                    "parameters": {"ef_construction": 512, "m": 16},
+                    "space_type": "l2",
+                },
+            },
+            "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
+            "AMAZON_BEDROCK_TEXT_CHUNK": {"type": "text", "index": "true"},
+        }
+    },
+}
+
+
+def test_defaults_reproduce_the_former_index_request():
+    # Same request, so the versioned index name of existing deployments does not change
+    assert build_index_request("amazon.titan-embed-text-v2:0") == LEGACY_TITAN_V2_REQUEST
+    assert build_index_request("amazon.titan-embed-text-v1")["mappings"]["properties"][VECTOR_FIELD_NAME][
+        "dimension"] == 1536
+
+
+def test_settings_are_read_from_the_custom_resource_props():
+    request = build_index_request(
+        "amazon.titan-embed-text-v2:0",
+        '{"M": "32", "EF_CONSTRUCTION": 256, "EF_SEARCH": 128, "ENCODER": "fp16", "SPACE_TYPE": "innerproduct"}')
+
+    vector_field = request["mappings"]["properties"][VECTOR_FIELD_NAME]
+    assert vector_field["method"]["parameters"] == {
+        "ef_construction": 256, "m": 32, "encoder": {"name": "sq", "parameters": {"type": "fp16"}}}
+    assert vector_field["method"]["space_type"] == "innerproduct"
+    assert request["settings"]["index"]["knn.algo_param.ef_search"] == 128
+
+
+def test_cosine_similarity_on_lucene():
+    request = build_index_request("cohere.embed-english-v3", {"ENGINE": "lucene", "SPACE_TYPE": "cosinesimil"})
+
+    vector_field = request["mappings"]["properties"][VECTOR_FIELD_NAME]
+    assert vector_field["method"]["engine"] == "lucene" and vector_field["method"]["space_type"] == "cosinesimil"
+    assert "data_type" not in vector_field
+
+
+@pytest.mark.parametrize("embedding_model_id, settings, message", [
+    ("amazon.titan-embed-text-v2:0", {"SPACE_TYPE": "cosinesimil"}, "not supported by the faiss engine"),
+    ("amazon.titan-embed-text-v2:0", {"ENGINE": "lucene", "ENCODER": "fp16"}, "ENCODER fp16 is not supported"),
+    # Knowledge bases only write float32 embeddings
+    ("cohere.embed-english-v3", {"ENGINE": "lucene", "ENCODER": "byte"}, "ENCODER must be one of"),
+    ("amazon.titan-embed-text-v2:0", {"M": 0}, "M must be at least 2"),
+    ("amazon.titan-embed-text-v2:0", {"EF_SEARCH": 10}, "EF_SEARCH must be at least 100"),
+    ("amazon.titan-embed-text-v2:0", {"M": 64, "EF_CONSTRUCTION": 32}, "EF_CONSTRUCTION (32) must be at least M"),
+    ("amazon.titan-embed-text-v2:0", {"EF_SEARCH": "high"}, "EF_SEARCH must be an integer"),
+    ("amazon.titan-embed-text-v2:0", {"ENGINES": "faiss"}, "Unknown index settings"),
+    ("unknown-model", {}, "Unknown embedding model"),
+])
+def test_invalid_combinations_are_rejected(embedding_model_id, settings, message):
+    with pytest.raises(ValueError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        validate_index_settings(embedding_model_id, settings)
+
+
+def test_every_error_is_reported_at_once():
+    with pytest.raises(ValueError) as error:
+        validate_index_settings("amazon.titan-embed-text-v2:0", {"ENGINE": "hnswlib", "M": 500, "EF_SEARCH": 1})
+
+    assert "ENGINE must be one of" in str(error.value)
+    assert "M must be at most 100" in str(error.value) and "EF_SEARCH must be at least 100" in str(error.value)
@@ -0,0 +1,186 @@
+# tests/unit/test_ingestion_trigger.py
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("KNOWLEDGE_BASE_ID", "KB123")
+os.environ.setdefault("DATA_SOURCE_ID", "DS123")
+os.environ.setdefault("AWS_REGION", "eu-west-1")
+
+from lambdas.IngestJob import ingestJobLambda  # noqa: E402
+
+QUEUE_URL = "https://sqs.eu-west-1.amazonaws.com/123456789012/ingestion-events"
+
+
+class ConflictException(Exception):
+    pass
+
+
+class FakeBedrockAgent:
+    """Data source with at most one running job, like Bedrock."""
+
+    exceptions = SimpleNamespace(ConflictException=ConflictException)
+
+    def __init__(self, running_job=None, started_concurrently=False):
+        self.running_job = running_job
+        self.started_concurrently = started_concurrently
+        self.started = []
+
+    def list_ingestion_jobs(self, knowledgeBaseId, dataSourceId, filters, maxResults):
+        return {"ingestionJobSummaries": [self.running_job] if self.running_job else []}
+
+    def start_ingestion_job(self, knowledgeBaseId, dataSourceId, clientToken):
+        if self.started_concurrently:
+            raise ConflictException("An ingestion job is already running")
+        self.started.append(clientToken)
+        self.running_job = {"ingestionJobId": "job-{}".format(len(self.started)), "status": "STARTING"}
+        return {"ingestionJob": self.running_job}
+
+
+class FakeSqs:
+    """Queue with 3 S3 events waiting, follow-ups stay delayed until `deliver_follow_ups`."""
+
+    def __init__(self):
+        self.sent = []
+        self.delayed = 0
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds):
+        self.sent.append({"body": MessageBody, "delay": DelaySeconds})
+        self.delayed += 1
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames):
+        return {"Attributes": {"ApproximateNumberOfMessages": "3",
+                               "ApproximateNumberOfMessagesDelayed": str(self.delayed)}}
+
+    def deliver_follow_ups(self):
+        delivered = [{"messageId": "follow-up-{}".format(index), "body": message["body"]}
+                     for index, message in enumerate(self.sent[len(self.sent) - self.delayed:])]
+        self.delayed = 0
+        return delivered
+
+
+@pytest.fixture
+def clients(monkeypatch, make_s3_client):
+    bedrock_agent, sqs = FakeBedrockAgent(), FakeSqs()
+    keys = ["rag_input_document/a.pdf", "rag_input_document/b.pdf", "rag_input_document/c.pdf",
+            "rag_input_document/old.pdf", "source_sow/sow.pdf"]
+    s3 = make_s3_client(
+        {key: b"%PDF" for key in keys},
+        storage_classes={"rag_input_document/b.pdf": "STANDARD_IA", "rag_input_document/old.pdf": "GLACIER"},
+        metadata={"rag_input_document/a.pdf": {"author": "jane"}},
+    )
+    monkeypatch.setattr(ingestJobLambda, "bedrock_agent_client", bedrock_agent)
+    monkeypatch.setattr(ingestJobLambda, "sqs_client", sqs)
+    monkeypatch.setattr(ingestJobLambda, "s3_client", s3)
+    monkeypatch.setattr(ingestJobLambda, "INGESTION_QUEUE_URL", QUEUE_URL)
+    monkeypatch.setattr(ingestJobLambda, "DATA_SOURCE_BUCKET", "kb-docs")
+    return SimpleNamespace(bedrock_agent=bedrock_agent, sqs=sqs, s3=s3)
+
+
+def s3_message(*keys):
+    records = [{"eventSource": "aws:s3", "eventName": "ObjectCreated:Put", "s3": {"object": {"key": key}}}
+               for key in keys]
+    return {"messageId": keys[0], "body": json.dumps({"Records": records})}
+
+
+def invoke(*records):
+    return ingestJobLambda.lambda_handler({"Records": list(records)}, SimpleNamespace(aws_request_id="request-1"))
+
+
+def test_bulk_upload_starts_a_single_job(clients, capsys):
+    uploads = [s3_message("rag_input_document/doc-{}.pdf".format(index)) for index in range(300)]
+
+    response = invoke(*uploads)
+
+    assert response["ingestionJob"]["ingestionJobId"] == "job-1"
+    assert clients.bedrock_agent.started == ["request-1"]
+    assert clients.sqs.sent == []
+    emitted = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    # Embedded metric format: one list of values per metric
+    assert emitted["DocumentChanges"] == [300.0] and emitted["CoalescedTriggers"] == [300.0]
+    assert emitted["IngestionJobsStarted"] == [1.0]
+    assert emitted["QueueDepth"] == [3.0]
+
+
+def test_running_job_schedules_one_follow_up(clients):
+    clients.bedrock_agent.running_job = {"ingestionJobId": "job-0", "status": "IN_PROGRESS"}
+
+    response = invoke(s3_message("rag_input_document/a.pdf", "rag_input_document/b.pdf"))
+
+    assert response["ingestionJob"] is None
+    assert clients.bedrock_agent.started == []
+    assert len(clients.sqs.sent) == 1
+    assert json.loads(clients.sqs.sent[0]["body"]) == {"type": ingestJobLambda.FOLLOW_UP_MESSAGE_TYPE}
+    assert clients.sqs.sent[0]["delay"] == ingestJobLambda.FOLLOW_UP_DELAY_SECONDS
+
+
+def test_batches_during_one_running_job_keep_a_single_follow_up(clients):
+    clients.bedrock_agent.running_job = {"ingestionJobId": "job-0", "status": "IN_PROGRESS"}
+
+    invoke(s3_message("rag_input_document/a.pdf"))
+    invoke(s3_message("rag_input_document/b.pdf"))
+    assert len(clients.sqs.sent) == 1
+
+    # The follow-up comes back while the job still runs: it is sent again, still alone
+    invoke(*clients.sqs.deliver_follow_ups())
+    assert len(clients.sqs.sent) == 2 and clients.sqs.delayed == 1
+
+    clients.bedrock_agent.running_job = None
+    invoke(*clients.sqs.deliver_follow_ups())
+    assert len(clients.bedrock_agent.started) == 1 and clients.sqs.delayed == 0
+
+
+def test_follow_ups_are_coalesced_into_the_next_job(clients):
+    follow_up = {"messageId": "f", "body": json.dumps({"type": ingestJobLambda.FOLLOW_UP_MESSAGE_TYPE})}
+
+    response = invoke(follow_up, dict(follow_up, messageId="g"))
+
+    assert response["ingestionJob"] is not None
+    assert len(clients.bedrock_agent.started) == 1 and clients.sqs.sent == []
+
+
+def index_follow_up(requires_reingestion):
+    body = {"type": ingestJobLambda.FOLLOW_UP_MESSAGE_TYPE, "index_name": "kb-input-doc-2b7e",
+            "requires_reingestion": requires_reingestion}
+    return {"messageId": "index", "body": json.dumps(body)}
+
+
+def test_new_empty_index_marks_every_document_before_the_sync(clients):
+    response = invoke(index_follow_up("True"))
+
+    assert response["ingestionJob"] is not None
+    assert clients.s3.copies == ["rag_input_document/a.pdf", "rag_input_document/b.pdf", "rag_input_document/c.pdf"]
+    assert clients.s3.metadata["rag_input_document/a.pdf"] == {
+        "author": "jane", "reingested-for-index": "kb-input-doc-2b7e"}
+    assert clients.s3.storage_classes["rag_input_document/a.pdf"] == "STANDARD"
+    assert clients.s3.storage_classes["rag_input_document/b.pdf"] == "STANDARD_IA"
+
+    # A retried message does not copy the documents again
+    invoke(index_follow_up("True"))
+    assert len(clients.s3.copies) == 3
+
+
+def test_reindexed_index_only_syncs(clients):
+    response = invoke(index_follow_up("False"))
+
+    assert response["ingestionJob"] is not None
+    assert clients.s3.copies == []
+
+
+def test_job_started_concurrently_becomes_a_follow_up(clients):
+    clients.bedrock_agent.started_concurrently = True
+
+    response = invoke(s3_message("rag_input_document/a.pdf"))
+
+    assert response["ingestionJob"] is None
+    assert len(clients.sqs.sent) == 1
+
+
+def test_s3_test_event_starts_nothing(clients, recwarn):
+    response = invoke({"messageId": "t", "body": json.dumps({"Service": "Amazon S3", "Event": "s3:TestEvent"})})
+
+    assert response == {"ingestionJob": None}
+    assert clients.bedrock_agent.started == [] and clients.sqs.sent == []
+    assert not [warning for warning in recwarn if "No application metrics" in str(warning.message)]
@@ -0,0 +1,151 @@
+# tests/unit/test_oss_index_migration.py
+import pytest
+
+from lambdas.bedrock_kb_lambda import oss_handler, readiness
+from lambdas.bedrock_kb_lambda.index_templates import build_index_request
+from lambdas.bedrock_kb_lambda.oss_utils import get_versioned_index_name, vectors_are_compatible
+
+ALIAS = "kb-index"
+TITAN_V1, TITAN_V2 = "amazon.titan-embed-text-v1", "amazon.titan-embed-text-v2:0"
+COHERE_V3 = "cohere.embed-english-v3"  # same 1024 dimension as Titan v2
+# A new ef_search changes the index definition, not its vectors
+TUNED_INDEX_SETTINGS = '{"EF_SEARCH": 256}'
+
+
+def props(embedding_model_id=TITAN_V2, policy_name="policy", **extra):
+    return {"collection_endpoint": "https://collection.eu-west-1.aoss.amazonaws.com",
+            "data_access_policy_name": policy_name, "index_name": ALIAS,
+            "embedding_model_id": embedding_model_id, **extra}
+
+
+def versioned(embedding_model_id):
+    return get_versioned_index_name(ALIAS, embedding_model_id, build_index_request(embedding_model_id))
+
+
+@pytest.fixture
+def collection(monkeypatch, fake_sts, make_oss_client, make_cluster):
+    cluster = make_cluster(watched_alias=ALIAS)
+    monkeypatch.setenv("AWS_REGION", "eu-west-1")
+    monkeypatch.setattr(readiness.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(oss_handler, "get_session", lambda: None)
+    monkeypatch.setattr(oss_handler, "get_sts_client", lambda session, region: fake_sts)
+    monkeypatch.setattr(oss_handler, "get_oss_client", lambda session, region: make_oss_client([fake_sts.arn]))
+    monkeypatch.setattr(oss_handler, "get_oss_http_client", lambda session, region, host: cluster.client())
+    return cluster
+
+
+def create(collection, resource_props):
+    response = oss_handler.on_create({"RequestType": "Create", "ResourceProperties": resource_props})
+    collection.indices[response["PhysicalResourceId"]].append({"chunk": "ingested document"})
+    collection.serving = True
+    return response["PhysicalResourceId"]
+
+
+def update(physical_id, resource_props, old_props):
+    return oss_handler.on_update({"RequestType": "Update", "PhysicalResourceId": physical_id,
+                                  "ResourceProperties": resource_props, "OldResourceProperties": old_props})
+
+
+def delete(physical_id, resource_props):
+    return oss_handler.on_delete({"RequestType": "Delete", "PhysicalResourceId": physical_id,
+                                  "ResourceProperties": resource_props})
+
+
+def test_create_puts_a_versioned_index_behind_the_alias(collection):
+    physical_id = create(collection, props())
+
+    assert physical_id == versioned(TITAN_V2) and physical_id.startswith(ALIAS + "-")
+    assert collection.aliases == {ALIAS: physical_id}
+
+
+def test_unchanged_props_keep_the_index_attributes(collection):
+    blue = create(collection, props())
+
+    response = update(blue, props(), props())
+
+    # The stack reads IndexName and RequiresReingestion after every update
+    assert response["Data"] == {"IndexName": blue, "AliasName": ALIAS, "RequiresReingestion": "False"}
+
+
+def test_compatible_update_copies_the_documents_then_swaps_the_alias(collection):
+    blue = create(collection, props())
+
+    response = update(blue, props(index_settings=TUNED_INDEX_SETTINGS), props())
+    green = response["PhysicalResourceId"]
+
+    assert green != blue
+    assert collection.reindexed == [(blue, green)]
+    assert collection.aliases == {ALIAS: green}
+    assert collection.indices[green] == [{"chunk": "ingested document"}]
+    assert blue in collection.indices  # deleted by the cleanup delete event only
+    assert response["Data"]["RequiresReingestion"] == "False"
+
+    delete(blue, props())
+    assert list(collection.indices) == [green]
+    assert collection.query_gaps == []
+
+
+def test_new_embedding_model_starts_an_empty_index_to_reingest(collection):
+    blue = create(collection, props(TITAN_V2))
+
+    response = update(blue, props(TITAN_V1), props(TITAN_V2))
+
+    assert collection.reindexed == []
+    assert response["Data"]["RequiresReingestion"] == "True"
+    assert collection.aliases == {ALIAS: versioned(TITAN_V1)}
+    assert collection.query_gaps == []
+
+
+def test_same_dimension_model_change_is_not_reindexed(collection):
+    blue = create(collection, props(TITAN_V2))
+
+    response = update(blue, props(COHERE_V3), props(TITAN_V2))
+
+    assert collection.reindexed == []
+    assert response["Data"]["RequiresReingestion"] == "True"
+    assert collection.indices[versioned(COHERE_V3)] == []
+
+
+def test_space_type_change_is_not_compatible():
+    l2_request = build_index_request(TITAN_V2)
+
+    assert vectors_are_compatible(l2_request, build_index_request(TITAN_V2, TUNED_INDEX_SETTINGS))
+    assert not vectors_are_compatible(l2_request, build_index_request(TITAN_V2, '{"SPACE_TYPE": "innerproduct"}'))
+
+
+def test_rollback_swaps_back_to_the_previous_index(collection):
+    blue = create(collection, props(TITAN_V2))
+    green = update(blue, props(TITAN_V1), props(TITAN_V2))["PhysicalResourceId"]
+
+    # Another resource of the stack failed: CloudFormation sends the update with the props reversed
+    rolled_back = update(green, props(TITAN_V2), props(TITAN_V1))["PhysicalResourceId"]
+    delete(green, props(TITAN_V1))
+
+    assert rolled_back == blue
+    assert collection.aliases == {ALIAS: blue}
+    assert collection.indices == {blue: [{"chunk": "ingested document"}]}
+    assert collection.query_gaps == []
+
+
+def test_failed_update_deletes_its_index_and_keeps_the_alias(collection):
+    blue = create(collection, props())
+
+    collection.errors["reindex"] = [RuntimeError("reindex failed")]
+    with pytest.raises(RuntimeError):
+        update(blue, props(index_settings=TUNED_INDEX_SETTINGS), props())
+
+    assert collection.aliases == {ALIAS: blue}
+    assert list(collection.indices) == [blue]
+
+
+def test_index_created_before_the_alias_is_migrated(collection):
+    collection.indices[ALIAS] = [{"chunk": "ingested document"}]
+    collection.serving = True
+
+    green = update(ALIAS, props(TITAN_V2, policy_name="new-policy"), props(TITAN_V2))["PhysicalResourceId"]
+    delete(ALIAS, props(TITAN_V2))  # the previous physical id is the alias now, it is kept
+
+    assert collection.aliases == {ALIAS: green}
+    assert collection.indices == {green: [{"chunk": "ingested document"}]}
+    # Only the one-time replacement of the legacy index by the alias is not covered
+    assert len(collection.query_gaps) == 1
@@ -0,0 +1,107 @@
+# tests/unit/test_oss_readiness.py
+import pytest
+from opensearchpy import AuthorizationException, NotFoundError, RequestError
+
+from lambdas.bedrock_kb_lambda import oss_handler, oss_utils, readiness
+from lambdas.bedrock_kb_lambda.index_templates import build_index_request
+from lambdas.bedrock_kb_lambda.readiness import ReadinessTimeout, wait_until
+
+INDEX_REQUEST = build_index_request("amazon.titan-embed-text-v2:0")
+
+
+@pytest.fixture
+def clock(monkeypatch, fake_clock):
+    monkeypatch.setattr(readiness.time, "sleep", fake_clock.sleep)
+    monkeypatch.setattr(readiness.time, "monotonic", fake_clock)
+    return fake_clock
+
+
+def forbidden():
+    return AuthorizationException(403, "security_exception")
+
+
+def test_wait_until_stops_as_soon_as_the_condition_is_met(clock):
+    answers = iter([False, False, True])
+
+    probes = wait_until(lambda: next(answers), "condition", timeout=60, initial_delay=1, max_delay=4)
+
+    assert probes == 3
+    assert len(clock.sleeps) == 2
+    assert 0.5 <= clock.sleeps[0] <= 1 and 1 <= clock.sleeps[1] <= 2
+
+
+def test_wait_until_raises_at_the_deadline(clock):
+    with pytest.raises(ReadinessTimeout, match="forbidden"):
+        wait_until(lambda: (_ for _ in ()).throw(forbidden()), "forbidden", timeout=30, initial_delay=1, max_delay=4)
+
+    assert clock.now == pytest.approx(30)
+    assert all(delay <= 4 for delay in clock.sleeps)
+
+
+def test_policy_wait_ends_once_visible_and_no_longer_forbidden(clock, fake_sts, make_oss_client, make_cluster):
+    oss_client = make_oss_client(["arn:aws:iam::123456789012:role/kb"], visible_after=1)
+    cluster = make_cluster(errors={"exists": [forbidden(), forbidden()]})
+
+    oss_handler.update_access_policy_with_caller_arn_if_applicable(
+        fake_sts, oss_client, cluster.client(), "policy", "index")
+
+    assert oss_client.updates == 1
+    assert fake_sts.arn in oss_client.principals
+    # 1 probe before the policy is visible, 2 forbidden, then 2 successes in a row: far from the former 120 s
+    assert cluster.calls.count("exists") == 4
+    assert clock.now < 30
+
+
+def test_policy_already_granted_is_not_updated(clock, fake_sts, make_oss_client, make_cluster):
+    oss_client = make_oss_client([fake_sts.arn])
+
+    oss_handler.update_access_policy_with_caller_arn_if_applicable(
+        fake_sts, oss_client, make_cluster().client(), "policy", "index")
+
+    assert oss_client.updates == 0
+    assert clock.sleeps == [pytest.approx(readiness.PROBE_INITIAL_DELAY_SECONDS)]  # confirmation probe only
+
+
+def test_index_creation_retries_then_waits_for_knn_queries(clock, make_cluster):
+    cluster = make_cluster(errors={
+        "create": [ConnectionResetError("connection reset")],
+        "search": [forbidden(), NotFoundError(404, "no such index")],
+    })
+
+    response = oss_utils.create_index_with_retries(cluster.client(), "index", INDEX_REQUEST)
+
+    assert response == {"acknowledged": True, "index": "index"}
+    assert cluster.calls.count("create") == 2
+    assert cluster.calls.count("search") == 4
+    assert clock.now < 60
+
+
+def test_index_created_by_a_timed_out_attempt_is_accepted(clock, make_cluster):
+    cluster = make_cluster(errors={
+        "create": [RequestError(400, "resource_already_exists_exception", {})],
+    })
+    cluster.indices["index"] = []
+
+    oss_utils.create_index_with_retries(cluster.client(), "index", INDEX_REQUEST)
+
+    assert cluster.calls.count("create") == 1
+
+
+def test_knn_probe_query_targets_the_vector_field():
+    query = oss_utils.get_knn_probe_query(INDEX_REQUEST)
+
+    knn = query["query"]["knn"]["bedrock-knowledge-base-default-vector"]
+    assert len(knn["vector"]) == 1024 and knn["k"] == 1
+    # A zero vector is rejected by the cosinesimil space
+    assert sum(value * value for value in knn["vector"]) == 1.0
+
+
+def test_delete_waits_until_the_index_is_gone(clock, make_cluster):
+    cluster = make_cluster(delete_delay=2)
+    cluster.indices["index"] = []
+
+    oss_utils.delete_index_if_present(cluster.client(), "index")
+
+    assert cluster.calls.count("exists") == 3
+    assert len(clock.sleeps) == 2 and clock.now < 10
+
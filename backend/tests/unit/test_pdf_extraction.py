@@ -0,0 +1,38 @@
+# tests/unit/test_pdf_extraction.py
+import fitz
+import pytest
+
+from agent_tools.pdf_extraction import extract_page_texts, partition_pages
+
+
+@pytest.fixture
+def synthetic_pdf():
+    document = fitz.open()
+    for page_number in range(1, 12):
+        document.new_page().insert_text((72, 72), f"Page marker {page_number}")
+    pdf_bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+def test_partition_pages_is_contiguous_and_balanced():
+    assert partition_pages(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert partition_pages(2, 8) == [(0, 1), (1, 2)]
+
+
+def test_parallel_extraction_matches_serial(synthetic_pdf):
+    serial = extract_page_texts(synthetic_pdf, workers=1)
+    parallel = extract_page_texts(synthetic_pdf, workers=3, min_pages=0)
+
+    assert parallel == serial
+    assert [text.strip() for text in parallel][:2] == ["Page marker 1", "Page marker 2"]
+
+
+def test_small_documents_stay_serial(synthetic_pdf, monkeypatch):
+    from agent_tools import pdf_extraction
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parallel path must not be used below the threshold")
+
+    monkeypatch.setattr(pdf_extraction, "_extract_parallel", fail)
+    assert len(extract_page_texts(synthetic_pdf, workers=4, min_pages=100)) == 11
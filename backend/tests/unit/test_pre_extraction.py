@@ -0,0 +1,56 @@
+# tests/unit/test_pre_extraction.py
+import pytest
+
+from agent_tools import pre_extraction, tools_utils
+from agent_tools.extraction_cache import ExtractionCache
+
+
+def _use_caches(monkeypatch, client, tmp_dir):
+    """Fresh memory and /tmp tiers, as in a new Lambda container, sharing the S3 sidecars of `client`."""
+    monkeypatch.setattr(tools_utils, "extraction_cache", ExtractionCache(
+        client, tmp_dir=str(tmp_dir), use_s3_sidecar=True, sidecar_prefix="extracted_digest/"))
+
+
+@pytest.fixture
+def fake_s3(monkeypatch, make_s3_client):
+    client = make_s3_client({"source_sow/jane doe/sow.txt": b"Statement of work"})
+    monkeypatch.setattr(tools_utils, "s3_client", client)
+    return client
+
+
+def test_upload_event_writes_digest_under_prefix(monkeypatch, tmp_path, fake_s3):
+    _use_caches(monkeypatch, fake_s3, tmp_path / "pre_extraction")
+    event = {"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": "source_sow/jane+doe/sow.txt"}}}]}
+
+    response = pre_extraction.lambda_handler(event, None)
+
+    assert response == {"documents": [{"s3_key": "source_sow/jane doe/sow.txt", "format": "text", "pages": 1,
+                                       "images": 0}]}
+    sidecars = [call[1] for call in fake_s3.calls if call[0] == "put_object"]
+    assert len(sidecars) == 1
+    # Outside of the upload prefix, the sidecar does not trigger a new pre-extraction
+    assert sidecars[0].startswith("extracted_digest/source_sow/jane doe/sow.txt")
+
+
+def test_tool_reads_pre_extracted_digest(monkeypatch, tmp_path, fake_s3):
+    _use_caches(monkeypatch, fake_s3, tmp_path / "pre_extraction")
+    pre_extraction.pre_extract_document("bucket", "source_sow/jane doe/sow.txt")
+
+    _use_caches(monkeypatch, fake_s3, tmp_path / "tools")
+    fake_s3.calls.clear()
+
+    assert tools_utils.read_s3_url("s3://bucket/source_sow/jane doe/sow.txt") == "Statement of work"
+    assert ("get_object", "source_sow/jane doe/sow.txt") not in fake_s3.calls
+
+
+def test_failed_record_does_not_stop_the_batch(monkeypatch, tmp_path, fake_s3):
+    _use_caches(monkeypatch, fake_s3, tmp_path)
+    event = {"Records": [
+        {"s3": {"bucket": {"name": "bucket"}, "object": {"key": "source_sow/missing.txt"}}},
+        {"s3": {"bucket": {"name": "bucket"}, "object": {"key": "source_sow/jane+doe/sow.txt"}}},
+    ]}
+
+    documents = pre_extraction.lambda_handler(event, None)["documents"]
+
+    assert "error" in documents[0]
+    assert documents[1]["format"] == "text"
@@ -0,0 +1,139 @@
+# tests/unit/test_rate_limiter.py
+import io
+import json
+import threading
+
+import pytest
+
+from agent_tools import tools_utils
+from agent_tools.rate_limiter import (
+    BedrockRateLimiter,
+    InMemoryRateLimitBackend,
+    IMAGE_TOKEN_ESTIMATE,
+    RateLimitExceeded,
+    SqliteRateLimitBackend,
+    estimate_request_tokens,
+)
+
+
+def _limiter(clock, backend=None, **budgets):
+    return BedrockRateLimiter(backend or InMemoryRateLimitBackend(), clock=clock, sleep=clock.sleep, **budgets)
+
+
+def test_token_estimate_counts_text_images_and_answer():
+    request_body = {
+        "max_tokens": 1000,
+        "messages": [{"role": "user", "content": [
+            {"type": "image", "source": {"data": "..."}},
+            {"type": "text", "text": "x" * 400},
+        ]}],
+    }
+
+    assert estimate_request_tokens(request_body) == 1000 + IMAGE_TOKEN_ESTIMATE + 100
+
+
+def test_requests_per_minute_budget_spaces_the_calls(fake_clock):
+    limiter = _limiter(fake_clock, requests_per_minute=60)
+
+    for _ in range(61):
+        limiter.acquire("model", 10)
+
+    assert fake_clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_tokens_per_minute_budget_and_release(fake_clock):
+    limiter = _limiter(fake_clock, tokens_per_minute=6000)
+
+    limiter.acquire("model", 6000)
+    limiter.release("model", 3000)
+    limiter.acquire("model", 3000)
+    assert fake_clock.sleeps == []
+
+    limiter.acquire("model", 600)
+    assert fake_clock.sleeps == [pytest.approx(6.0)]
+
+
+def test_release_keeps_the_requests_budget(fake_clock):
+    limiter = _limiter(fake_clock, requests_per_minute=2, tokens_per_minute=6000)
+
+    limiter.acquire("model", 1000)
+    limiter.release("model", 500)
+    limiter.acquire("model", 1000)
+    limiter.release("model", 500)
+    assert fake_clock.sleeps == []
+
+    limiter.acquire("model", 1000)
+    assert fake_clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_budgets_are_per_model(fake_clock):
+    limiter = _limiter(fake_clock, requests_per_minute=1)
+
+    limiter.acquire("model-a", 10)
+    limiter.acquire("model-b", 10)
+
+    assert fake_clock.sleeps == []
+
+
+def test_waits_above_the_maximum_fail(fake_clock):
+    limiter = _limiter(fake_clock, requests_per_minute=1, max_wait_seconds=10)
+
+    limiter.acquire("model", 10)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("model", 10)
+
+
+def test_sqlite_backend_is_shared(tmp_path, fake_clock):
+    path = str(tmp_path / "buckets.sqlite3")
+    first = _limiter(fake_clock, SqliteRateLimitBackend(path), requests_per_minute=2)
+    second = _limiter(fake_clock, SqliteRateLimitBackend(path), requests_per_minute=2)
+
+    first.acquire("model", 10)
+    second.acquire("model", 10)
+    assert fake_clock.sleeps == []
+    second.acquire("model", 10)
+    assert fake_clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_sqlite_backend_grants_each_request_once(tmp_path):
+    backend = SqliteRateLimitBackend(str(tmp_path / "buckets.sqlite3"))
+    granted = []
+
+    def take():
+        for _ in range(10):
+            granted.append(backend.take("model", {"requests": (1, 20)}, 1000.0) == 0.0)
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert granted.count(True) == 20
+
+
+def test_vision_calls_go_through_the_limiter(monkeypatch):
+    acquired = []
+    released = []
+
+    class RecordingLimiter:
+        def acquire(self, model_id, tokens):
+            acquired.append((model_id, tokens))
+
+        def release(self, model_id, unused_tokens):
+            released.append((model_id, unused_tokens))
+
+    class FakeBedrock:
+        def invoke_model(self, **kwargs):
+            answer = {"content": [{"text": "a diagram"}], "usage": {"input_tokens": 1500, "output_tokens": 200}}
+            return {"body": io.BytesIO(json.dumps(answer).encode("utf-8"))}
+
+    monkeypatch.setenv("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image")
+    monkeypatch.setenv("LLM_MODEL_AGENT", "model")
+    monkeypatch.setattr(tools_utils, "rate_limiter", RecordingLimiter())
+    monkeypatch.setattr(tools_utils, "get_bedrock_client", lambda: FakeBedrock())
+
+    assert tools_utils.llm_describe_image("aW1hZ2U=") == "a diagram"
+    estimated = acquired[0][1]
+    assert acquired == [("model", estimated)]
+    assert released == [("model", estimated - 1700)]
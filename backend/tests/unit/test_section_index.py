@@ -0,0 +1,56 @@
+# tests/unit/test_section_index.py
+import json
+
+from agent_tools.section_index import (
+    build_section_index,
+    extract_sections,
+    load_section_patterns,
+    parse_requested_sections,
+)
+
+PAGES = [
+    "Statement of Work\nTable of contents\nExecutive Summary ........ 2\nMilestones & Deliverables ........ 3",
+    "1. Executive Summary\nThe customer wants to migrate.",
+    "2. Summary of Milestones & Deliverables\nM1 Landing zone - week 2\nM2 Migration - week 6",
+    "3. Investment\nTotal: 120k USD",
+]
+
+
+def test_section_index_skips_table_of_contents():
+    index = build_section_index(PAGES)
+
+    assert [(section["name"], section["page_start"], section["page_end"]) for section in index] == [
+        ("EXECUTIVE SUMMARY", 2, 2),
+        ("SUMMARY OF MILESTONES & DELIVERABLES", 3, 3),
+        ("INVESTMENT", 4, 4),
+    ]
+    full_text = "\n".join(PAGES)
+    assert full_text[index[1]["char_start"]:].startswith("2. Summary of Milestones")
+
+
+def test_extract_requested_sections_only():
+    full_text = "\n".join(PAGES)
+    scoped = extract_sections(full_text, build_section_index(PAGES), ["milestones"])
+
+    assert scoped.startswith("=== SUMMARY OF MILESTONES & DELIVERABLES (pages 3-3) ===")
+    assert "M2 Migration" in scoped
+    assert "120k" not in scoped and "migrate" not in scoped
+
+
+def test_unknown_section_returns_none():
+    assert extract_sections("\n".join(PAGES), build_section_index(PAGES), ["risks"]) is None
+
+
+def test_section_patterns_are_configurable(monkeypatch):
+    monkeypatch.setenv("SECTION_HEADER_PATTERNS", json.dumps({"PRICING": r"PRICING|INVESTMENT"}))
+
+    index = build_section_index(PAGES, patterns=load_section_patterns())
+
+    assert [section["name"] for section in index] == ["PRICING"]
+
+
+def test_parse_requested_sections():
+    assert parse_requested_sections("Investment, Milestones & Deliverables") == ["Investment", "Milestones & Deliverables"]
+    assert parse_requested_sections('["Investment"]') == ["Investment"]
+    assert parse_requested_sections("[Investment, Assumptions]") == ["Investment", "Assumptions"]
+    assert parse_requested_sections(None) == []
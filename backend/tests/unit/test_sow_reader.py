@@ -0,0 +1,77 @@
+# tests/unit/test_sow_reader.py
+import json
+
+import pytest
+
+from agent_tools import sow_reader, tools_utils
+from agent_tools.tools_utils import paginate_text
+
+
+def _event(function, **parameters):
+    return {
+        "messageVersion": "1.0",
+        "agent": {"name": "sowchecker-DeliveryMilestonesValidationAgent", "id": "A", "alias": "B", "version": "1"},
+        "actionGroup": "lambda_processing_sow",
+        "function": function,
+        "parameters": [{"name": name, "type": "string", "value": value} for name, value in parameters.items()],
+    }
+
+
+def _body(response):
+    return response["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
+
+
+def test_paginate_text_walks_the_whole_text():
+    text = "\n".join(f"line {index:04d}" for index in range(1000))
+
+    slices = []
+    cursor = None
+    while True:
+        page = paginate_text(text, cursor=cursor, max_chars=1000)
+        slices.append(page["content"])
+        assert page["returned_chars"] <= 1000
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert "".join(slices) == text
+    assert all(part.endswith("\n") for part in slices[:-1])
+
+
+def test_small_documents_are_returned_as_is(monkeypatch):
+    monkeypatch.setattr(sow_reader, "read_s3_url", lambda s3_uri_path, **kwargs: "short SoW")
+
+    response = sow_reader.lambda_handler(_event("get_document_from_s3", s3_uri_path="s3://bucket/sow.pdf"), None)
+
+    assert _body(response) == "short SoW"
+
+
+@pytest.mark.parametrize("cursor, max_chars, message", [
+    ("10", "-5", "max_chars must be at least 1"),
+    ("10", "0", "max_chars must be at least 1"),
+    ("10", "a lot", "max_chars must be an integer"),
+    ("-3", "100", "cursor must be at least 0"),
+])
+def test_paginate_text_rejects_invalid_windows(cursor, max_chars, message):
+    with pytest.raises(ValueError, match=message):
+        paginate_text("x" * 500, cursor=cursor, max_chars=max_chars)
+
+
+def test_large_documents_are_paginated(monkeypatch):
+    document = "x" * (tools_utils.DOCUMENT_PAGE_MAX_CHARS + 10)
+    monkeypatch.setattr(sow_reader, "read_s3_url", lambda s3_uri_path, **kwargs: document)
+
+    first = json.loads(_body(sow_reader.lambda_handler(
+        _event("get_document_from_s3", s3_uri_path="s3://bucket/sow.pdf"), None)))
+    second = json.loads(_body(sow_reader.lambda_handler(
+        _event("get_document_from_s3", s3_uri_path="s3://bucket/sow.pdf", cursor=first["next_cursor"]), None)))
+
+    assert first["returned_chars"] == tools_utils.DOCUMENT_PAGE_MAX_CHARS
+    assert "cursor=" in first["instructions"]
+    assert second["next_cursor"] is None
+    assert first["content"] + second["content"] == document
+
+
+def test_missing_s3_uri_is_rejected():
+    with pytest.raises(Exception, match="s3_uri_path"):
+        sow_reader.lambda_handler(_event("get_document_from_s3"), None)
@@ -0,0 +1,127 @@
+# tests/unit/test_text_compaction.py
+import re
+
+from agent_tools.text_compaction import collapse_table_lines, compact_pages, estimate_tokens
+
+
+def build_pages(page_count=6):
+    """Synthetic SoW pages with a running header, a footer with the page number and a copyright line."""
+    pages = []
+    for page_number in range(1, page_count + 1):
+        pages.append("\n".join([
+            "ACME Corp   -   Statement of Work",
+            "",
+            f"Section {page_number}",
+            f"Body  of  part {page_number}\twith   irregular    spacing.",
+            f"Workstream {page_number} follows the AWS multi account strategy.",
+            f"Phase {page_number} of the landing zone relies on the infra-",
+            "structure provisioned in phase one.",
+            "",
+            "",
+            "",
+            f"Workload account {page_number} is created through the account factory.",
+            f"Deliverable {page_number} is accepted by the customer.",
+            "© 2024 ACME Corp. All rights reserved.",
+            f"Page {page_number} of {page_count}",
+        ]))
+    return pages
+
+
+def test_running_headers_footers_and_page_numbers_are_removed():
+    compacted, report = compact_pages(build_pages())
+
+    full_text = "\n".join(compacted)
+    # The running header is kept once, on the first page
+    assert full_text.count("ACME Corp - Statement of Work") == 1
+    assert compacted[0].startswith("ACME Corp - Statement of Work")
+    assert not re.search(r"Page \d of 6", full_text)
+    assert "All rights reserved" not in full_text
+    # Header and copyright line kept once then removed as repeats, the copyright once more as boilerplate
+    assert report["repeated_lines"] == 10
+    assert report["page_numbers"] == 6
+    assert report["boilerplate_lines"] == 1
+    # Content is untouched, one compacted text per page
+    assert len(compacted) == 6
+    assert [f"Section {n}" in page for n, page in enumerate(compacted, start=1)] == [True] * 6
+
+
+def test_whitespace_and_hyphenation_are_normalised():
+    compacted, _ = compact_pages(build_pages())
+
+    page = compacted[1]
+    assert "Body of part 2 with irregular spacing." in page
+    assert "relies on the infrastructure provisioned in phase one." in page
+    assert "\n\n\n" not in page
+    assert page == page.strip()
+
+
+def test_report_measures_token_reduction():
+    pages = build_pages()
+    compacted, report = compact_pages(pages)
+
+    assert report["chars_before"] == len("\n".join(pages))
+    assert report["chars_after"] == len("\n".join(compacted))
+    assert report["estimated_tokens_after"] == estimate_tokens("\n".join(compacted))
+    assert report["estimated_tokens_after"] < report["estimated_tokens_before"]
+    assert report["token_reduction_pct"] > 20
+
+
+def test_compaction_is_deterministic():
+    pages = build_pages()
+
+    assert compact_pages(pages) == compact_pages(list(pages))
+    # Compacting twice changes nothing more
+    compacted, _ = compact_pages(pages)
+    assert compact_pages(compacted)[0] == compacted
+
+
+def test_lines_repeated_in_the_body_are_kept():
+    pages = [f"{name} intro\n{name} context\nYes\nYes\nYes\n{name} details\n{name} end"
+             for name in ["Alpha", "Beta", "Gamma", "Delta", "Epsilon"]]
+
+    compacted, report = compact_pages(pages, edge_lines=2)
+
+    assert all(page.count("Yes") == 3 for page in compacted)
+    assert report["repeated_lines"] == 0
+
+
+def test_short_documents_are_not_stripped():
+    pages = ["Header\nFirst page", "Header\nSecond page"]
+
+    compacted, report = compact_pages(pages)
+
+    assert compacted == pages
+    assert report["token_reduction_pct"] == 0.0
+
+
+def test_table_of_contents_dot_leaders_are_shortened():
+    compacted, _ = compact_pages(["Executive Summary .................... 2\nInvestment . . . . . . . . 7"])
+
+    assert compacted == ["Executive Summary ... 2\nInvestment ... 7"]
+
+
+def test_tables_collapse_when_enabled():
+    cells = ["Milestone", "Week", "Owner", "Landing zone", "2", "ACME", "Migration", "6", "Partner"]
+    page = "Delivery plan of the project phases agreed with the customer:\n" + "\n".join(cells) + "\nThe plan is reviewed every week by both parties."
+
+    kept, _ = compact_pages([page])
+    collapsed, _ = compact_pages([page], collapse_tables=True)
+
+    assert kept == [page]
+    assert collapsed[0].split("\n")[1] == " | ".join(cells)
+    assert collapse_table_lines(["a", "b"]) == ["a", "b"]
+
+
+def test_bare_numbers_are_page_numbers_only_when_they_follow_the_page_index():
+    amounts = ["{} amounts\nLicences\n{}".format(name, value)
+               for name, value in zip(["Alpha", "Beta", "Gamma", "Delta", "Epsilon", "Zeta"], range(15, 75, 10))]
+    # Unnumbered cover page: the printed numbers are one behind the page index
+    numbered = ["Cover"] + ["Part {}\nDetails\n{}".format(page, page) for page in range(1, 6)]
+
+    kept, kept_report = compact_pages(amounts)
+    stripped, stripped_report = compact_pages(numbered)
+
+    assert [page.split("\n")[-1] for page in kept] == ["15", "25", "35", "45", "55", "65"]
+    assert kept_report["page_numbers"] == 0
+    assert stripped_report["page_numbers"] == 5
+    assert stripped[1] == "Part 1\nDetails"
@@ -0,0 +1,61 @@
+# tests/unit/test_tool_logging.py
+import json
+
+from agent_tools import sow_reader
+from agent_tools.tool_logging import payload_size, summarize_event, truncate_value
+
+DOCUMENT = "Statement of work " * 1000
+
+
+def _event():
+    return {
+        "messageVersion": "1.0",
+        "agent": {"name": "sowchecker-StructuralComplianceAgent"},
+        "actionGroup": "lambda_processing_sow",
+        "function": "get_document_from_s3",
+        "parameters": [{"name": "s3_uri_path", "type": "string", "value": "s3://bucket/sow.pdf"}],
+        "inputText": "x" * 5000,
+    }
+
+
+def _log_records(caplog):
+    return [{"message": record.getMessage(), **record.__dict__} for record in caplog.records]
+
+
+def test_truncate_value_caps_every_string():
+    truncated = truncate_value({"text": "a" * 300, "items": ["b" * 10, 3]}, max_chars=100)
+
+    assert truncated["text"] == "a" * 100 + "... [300 chars]"
+    assert truncated["items"] == ["b" * 10, 3]
+
+
+def test_event_summary_has_sizes_not_payloads():
+    summary = summarize_event(_event())
+
+    assert summary["function"] == "get_document_from_s3"
+    assert summary["parameters"] == {"s3_uri_path": "s3://bucket/sow.pdf"}
+    assert summary["event_bytes"] == payload_size(_event())
+    assert "inputText" not in json.dumps(summary)
+
+
+def test_handler_logs_sizes_only(monkeypatch, caplog):
+    monkeypatch.setattr(sow_reader, "read_s3_url", lambda s3_uri_path, **kwargs: DOCUMENT)
+    monkeypatch.setattr(sow_reader, "should_sample_payload", lambda: False)
+
+    sow_reader.lambda_handler(_event(), None)
+
+    records = _log_records(caplog)
+    assert [record["message"] for record in records] == ["Tool invocation", "Tool response"]
+    assert records[1]["response_bytes"] > 18000
+    assert "Statement of work Statement of work" not in json.dumps(records, default=str)
+
+
+def test_sampled_invocations_log_the_full_payloads(monkeypatch, caplog):
+    monkeypatch.setattr(sow_reader, "read_s3_url", lambda s3_uri_path, **kwargs: DOCUMENT)
+    monkeypatch.setattr(sow_reader, "should_sample_payload", lambda: True)
+
+    sow_reader.lambda_handler(_event(), None)
+
+    messages = [record["message"] for record in _log_records(caplog)]
+    assert "Sampled tool event" in messages
+    assert "Sampled tool response" in messages
@@ -0,0 +1,109 @@
+# tests/unit/test_vector_diagrams.py
+import base64
+import io
+
+import fitz
+from PIL import Image
+
+from agent_tools import tools_utils
+from agent_tools.document_digest import build_document_digest, select_section_images
+from agent_tools.extraction_cache import ExtractionCache
+from agent_tools.image_dedup import DescriptionMemo
+from agent_tools.vector_diagrams import detect_vector_regions, render_region
+
+
+def draw_architecture(page, top=150):
+    """Boxes linked by arrows, as exported by a diagramming tool: drawings only, labels as text."""
+    for row in range(3):
+        for column in range(4):
+            box = fitz.Rect(72 + column * 120, top + row * 90, 152 + column * 120, top + 40 + row * 90)
+            page.draw_rect(box, color=(0, 0, 0.5), fill=(0.85, 0.9, 1))
+            page.insert_text((box.x0 + 6, box.y0 + 24), f"Service {row}{column}", fontsize=8)
+            if column:
+                page.draw_line((box.x0 - 40, box.y0 + 20), (box.x0, box.y0 + 20))
+                page.draw_polyline([(box.x0 - 6, box.y0 + 16), (box.x0, box.y0 + 20), (box.x0 - 6, box.y0 + 24)])
+            if row and column in (0, 3):
+                page.draw_line((box.x0 + 40, box.y0 - 50), (box.x0 + 40, box.y0))
+
+
+def draw_table(page, top=150):
+    """Ruled table: only thin horizontal and vertical rules."""
+    for row in range(12):
+        page.draw_line((72, top + row * 20), (520, top + row * 20), width=0.5)
+        page.insert_text((78, top + row * 20 + 14), f"Milestone {row} | Week {row * 2}", fontsize=8)
+    for column in range(5):
+        page.draw_line((72 + column * 112, top), (72 + column * 112, top + 220), width=0.5)
+
+
+def build_vector_sow_pdf():
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), "Statement of Work")
+    page = document.new_page()
+    page.insert_text((72, 72), "Scope of work")
+    draw_architecture(page)  # before any section, not searched
+    page = document.new_page()
+    page.insert_text((72, 72), "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM")
+    draw_architecture(page)
+    page = document.new_page()
+    page.insert_text((72, 72), "SUMMARY OF MILESTONES & DELIVERABLES")
+    draw_architecture(page)  # other section, not searched
+    pdf_bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+def test_diagrams_are_detected_and_tables_are_not():
+    document = fitz.open()
+    draw_architecture(document.new_page())
+    draw_table(document.new_page())
+
+    regions = detect_vector_regions(document[0])
+
+    assert len(regions) == 1
+    assert regions[0].contains(fitz.Rect(72, 150, 512, 370))
+    assert detect_vector_regions(document[1]) == []
+
+
+def test_rendering_respects_the_pixel_budget():
+    document = fitz.open()
+    page = document.new_page()
+    draw_architecture(page)
+
+    _, width, height = render_region(page, page.rect, dpi=300, max_pixels=200000)
+    assert width * height <= 200000
+
+    image_bytes, width, height = render_region(page, fitz.Rect(72, 150, 172, 250), dpi=144)
+    assert (width, height) == (200, 200)
+    assert Image.open(io.BytesIO(image_bytes)).format == "PNG"
+
+
+def test_only_architecture_pages_are_inventoried():
+    digest = build_document_digest(build_vector_sow_pdf(), "pdf")
+
+    diagrams = [image for image in digest["images"] if image["xref"] is None]
+    assert [(image["page"], image["image_index"]) for image in diagrams] == [(3, 0)]
+    assert [(image["page"], image["section"]) for image in select_section_images(digest)] == [
+        (3, "SOLUTION ARCHITECTURE / ARCHITECTURAL DIAGRAM")]
+
+
+def test_vector_diagrams_go_through_the_description_path(monkeypatch, tmp_path, make_s3_client):
+    described_payloads = []
+
+    def llm_describe_image(image_base64, media_type):
+        described_payloads.append(Image.open(io.BytesIO(base64.b64decode(image_base64))).size)
+        return "an architecture diagram"
+
+    s3 = make_s3_client({"sow.pdf": build_vector_sow_pdf()})
+    monkeypatch.setattr(tools_utils, "s3_client", s3)
+    monkeypatch.setattr(tools_utils, "extraction_cache", ExtractionCache(s3, tmp_dir=str(tmp_path), use_s3_sidecar=False))
+    monkeypatch.setattr(tools_utils, "image_descriptions_cache",
+                        ExtractionCache(s3, tmp_dir=str(tmp_path), use_s3_sidecar=False))
+    monkeypatch.setattr(tools_utils, "description_memo", DescriptionMemo(str(tmp_path / "memo.sqlite3")))
+    monkeypatch.setattr(tools_utils, "llm_describe_image", llm_describe_image)
+    monkeypatch.setenv("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image")
+    monkeypatch.setenv("LLM_MODEL_AGENT", "model")
+
+    described = tools_utils.describe_document_images("s3://bucket/sow.pdf")
+
+    assert [(image["page"], image["image_described"]) for image in described] == [(3, "an architecture diagram")]
+    assert len(described_payloads) == 1 and min(described_payloads[0]) > 300
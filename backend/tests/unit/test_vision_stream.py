@@ -0,0 +1,88 @@
+# tests/unit/test_vision_stream.py
+import json
+
+from agent_tools import tools_utils
+from agent_tools.vision_stream import read_vision_stream
+
+
+def _event(payload):
+    return {"chunk": {"bytes": json.dumps(payload).encode("utf-8")}}
+
+
+class FakeEventStream:
+    """Anthropic response stream yielding one text delta per word."""
+
+    def __init__(self, words):
+        self.events = [_event({"type": "message_start", "message": {"usage": {"input_tokens": 1500}}})]
+        self.events += [_event({"type": "content_block_delta", "delta": {"type": "text_delta", "text": f"{word} "}})
+                        for word in words]
+        self.events += [_event({"type": "message_delta", "usage": {"output_tokens": len(words)}}),
+                        _event({"type": "message_stop"})]
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for event in self.events:
+            self.consumed += 1
+            yield event
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.1
+        return self.now
+
+
+def test_full_stream_is_gathered_with_metrics():
+    stream = FakeEventStream(["An", "AWS", "architecture", "diagram."])
+
+    text, metrics = read_vision_stream(stream, started_at=0.0, clock=FakeClock())
+
+    assert text == "An AWS architecture diagram. "
+    assert metrics["time_to_first_token_ms"] == 100.0
+    assert metrics["total_latency_ms"] == 200.0
+    assert (metrics["input_tokens"], metrics["output_tokens"]) == (1500, 4)
+    assert metrics["stopped_early"] is False
+
+
+def test_character_budget_stops_the_stream():
+    stream = FakeEventStream(["word"] * 100)
+
+    text, metrics = read_vision_stream(stream, max_chars=22)
+
+    assert text == "word word word word"
+    assert metrics["stopped_early"] is True
+    assert stream.closed
+    assert stream.consumed < len(stream.events) / 2
+
+
+def test_stop_sequence_stops_the_stream():
+    stream = FakeEventStream(["Components:", "S3,", "Lambda.", "Improvements:", "add", "WAF"])
+
+    text, metrics = read_vision_stream(stream, stop_sequences=["Improvements:"])
+
+    assert text == "Components: S3, Lambda. "
+    assert metrics["stopped_early"] is True
+
+
+def test_llm_describe_image_streams_when_enabled(monkeypatch):
+    class FakeBedrock:
+        def invoke_model_with_response_stream(self, **kwargs):
+            self.request = json.loads(kwargs["body"])
+            return {"body": FakeEventStream(["A", "diagram."])}
+
+    bedrock = FakeBedrock()
+    monkeypatch.setenv("ANALYSE_AWS_DIAGRAM_AGENT_PROMPT", "Describe this image")
+    monkeypatch.setenv("LLM_MODEL_AGENT", "model")
+    monkeypatch.setattr(tools_utils, "IMAGE_DESCRIPTION_STREAMING", True)
+    monkeypatch.setattr(tools_utils, "IMAGE_DESCRIPTION_STOP_SEQUENCES", ["###"])
+    monkeypatch.setattr(tools_utils, "get_bedrock_client", lambda: bedrock)
+
+    assert tools_utils.llm_describe_image("aW1hZ2U=") == "A diagram. "
+    assert bedrock.request["stop_sequences"] == ["###"]